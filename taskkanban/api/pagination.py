@@ -0,0 +1,111 @@
+"""
+API分页
+默认使用页码分页；请求带 pagination=cursor 或 cursor 参数时改用按 (updated_at, id)
+升序的游标分页，不统计总数、不使用 OFFSET，适合集成方全量或增量同步
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """按 (updated_at, id) 的游标分页，只支持向后翻页"""
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = _('无效的游标')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, obj):
+        """obj 为模型实例或 .values() 字典"""
+        if isinstance(obj, dict):
+            updated_at, pk = obj['updated_at'], obj['id']
+        else:
+            updated_at, pk = obj.updated_at, obj.pk
+        value = f'{updated_at.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, request):
+        """解析游标，返回 (updated_at, id)，未提供时返回None"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            updated_at, pk = base64.urlsafe_b64decode(encoded.encode()).decode().rsplit('|', 1)
+            return datetime.fromisoformat(updated_at), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by('updated_at', 'pk')
+        cursor = self.decode_cursor(request)
+        if cursor:
+            updated_at, pk = cursor
+            queryset = queryset.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk)
+            )
+
+        # 多取一行判断是否还有下一页
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def use_keyset_pagination(request):
+    """请求是否选择游标分页"""
+    params = request.query_params
+    return params.get('pagination') == 'cursor' or KeysetPagination.cursor_query_param in params
+
+
+class SelectablePaginationMixin:
+    """视图集按请求选择页码分页或游标分页"""
+
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        request = getattr(self, 'request', None)
+        if not hasattr(self, '_paginator') and request is not None and use_keyset_pagination(request):
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
@@ -3,7 +3,7 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
 from drf_spectacular.utils import extend_schema_field
 
-from tasks.models import Task
+from tasks.models import Task, TaskAssignment
 from boards.models import Board, BoardList, BoardMember
 from teams.models import Team, TeamMembership
 from reports.models import Report
@@ -11,6 +11,49 @@ from reports.models import Report
 User = get_user_model()
 
 
+def get_query_fields(request, param):
+    """解析逗号分隔的字段参数，未提供时返回None"""
+    if request is None:
+        return None
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetsMixin:
+    """按请求参数裁剪输出字段
+
+    GET 请求带 ?fields=a,b 时只返回指定字段（始终包含id），
+    expandable_fields 中的关联字段只有在 ?expand= 中列出时才嵌套完整对象，否则只返回ID。
+    未指定 fields 时保持完整输出。只作用于顶层序列化器。
+    """
+
+    # {字段名: 是否多值}
+    expandable_fields = {}
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        requested = get_query_fields(request, 'fields')
+        if requested is None or request.method != 'GET' or not self._is_root():
+            return fields
+
+        requested.add('id')
+        expand = get_query_fields(request, 'expand') or set()
+        fields = {name: field for name, field in fields.items() if name in requested}
+        for name, many in self.expandable_fields.items():
+            if name in fields and name not in expand:
+                source = fields[name].source
+                kwargs = {'source': source} if source else {}
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many, **kwargs)
+        return fields
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -38,46 +81,90 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
 
 class BoardListSerializer(serializers.ModelSerializer):
-    task_count = serializers.SerializerMethodField()
-    
     class Meta:
         model = BoardList
         fields = ['id', 'name', 'position', 'task_count']
-    
-    @extend_schema_field(serializers.IntegerField)
-    def get_task_count(self, obj):
-        return obj.tasks.count()
+        read_only_fields = ['task_count']
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     assignees = UserSerializer(many=True, read_only=True)
     creator = UserSerializer(read_only=True)
     
+    expandable_fields = {'creator': False, 'assignees': True}
+    
     class Meta:
         model = Task
         fields = ['id', 'title', 'description', 'status', 'priority', 'board', 'board_list', 'creator', 'assignees', 'due_date', 'created_at', 'updated_at']
         read_only_fields = ['id', 'creator', 'created_at', 'updated_at']
 
 
+class TaskValuesSerializer:
+    """由 .values() 字典构建任务列表，不创建模型实例，也不使用嵌套序列化器
+
+    用于只请求部分字段且不展开关联对象的列表请求，输出与 TaskSerializer 的稀疏字段一致：
+    外键和创建者输出ID，受理人批量查询后输出ID列表，其余字段沿用 TaskSerializer 的格式。
+    """
+
+    many_fields = ('assignees',)
+
+    def __init__(self, requested, context=None):
+        requested = set(requested) | {'id'}
+        self.fields = [name for name in TaskSerializer.Meta.fields if name in requested]
+        self.columns = [name for name in self.fields if name not in self.many_fields]
+
+        # 非关联字段使用 TaskSerializer 的字段格式化
+        serializer_fields = TaskSerializer(context=context).fields
+        self.formatters = {
+            name: serializer_fields[name].to_representation
+            for name in self.columns
+            if not isinstance(serializer_fields[name], (serializers.RelatedField, serializers.BaseSerializer))
+        }
+
+    def get_queryset(self, queryset):
+        """只查询需要的列，id 和 updated_at 供游标分页使用"""
+        columns = list(dict.fromkeys(self.columns + ['id', 'updated_at']))
+        return queryset.select_related(None).prefetch_related(None).values(*columns)
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        assignees = {}
+        if 'assignees' in self.fields and rows:
+            for task_id, user_id in TaskAssignment.objects.filter(
+                task_id__in=[row['id'] for row in rows]
+            ).values_list('task_id', 'user_id'):
+                assignees.setdefault(task_id, []).append(user_id)
+
+        data = []
+        for row in rows:
+            item = {}
+            for name in self.fields:
+                if name == 'assignees':
+                    item[name] = assignees.get(row['id'], [])
+                    continue
+                value = row[name]
+                formatter = self.formatters.get(name)
+                item[name] = formatter(value) if formatter and value is not None else value
+            data.append(item)
+        return data
+
+
 class TaskCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = ['title', 'description', 'status', 'priority', 'board', 'board_list', 'assignees', 'due_date']
 
 
-class BoardSerializer(serializers.ModelSerializer):
+class BoardSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
-    boardlist_set = BoardListSerializer(many=True, read_only=True)
-    task_count = serializers.SerializerMethodField()
+    boardlist_set = BoardListSerializer(source='lists', many=True, read_only=True)
+    
+    expandable_fields = {'owner': False, 'boardlist_set': True}
     
     class Meta:
         model = Board
         fields = ['id', 'name', 'description', 'visibility', 'owner', 'boardlist_set', 'task_count', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'owner', 'created_at', 'updated_at']
-    
-    @extend_schema_field(serializers.IntegerField)
-    def get_task_count(self, obj):
-        return obj.tasks.count()
+        read_only_fields = ['id', 'owner', 'task_count', 'created_at', 'updated_at']
 
 
 class BoardCreateSerializer(serializers.ModelSerializer):
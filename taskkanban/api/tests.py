@@ -1,3 +1,121 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from boards.models import Board, BoardList, BoardMember
+from tasks.models import Task
+
+User = get_user_model()
+
+
+class TaskCursorPaginationTest(TestCase):
+    """任务API游标分页测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        BoardMember.objects.create(board=self.board, user=self.user, role='admin')
+        self.board_list = BoardList.objects.create(name='待办', board=self.board, position=1024)
+        self.tasks = [
+            Task.objects.create(
+                title=f'任务{i}', board=self.board, board_list=self.board_list, creator=self.user
+            )
+            for i in range(5)
+        ]
+        # 被分配的任务同时满足多个访问条件，不应重复返回
+        self.tasks[0].assignees.add(self.user)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('api:task-list')
+
+    def test_cursor_pages_cover_all_tasks(self):
+        """测试游标分页按更新时间依次返回所有任务，且不返回总数"""
+        # 相同的更新时间由ID区分先后
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks[:3]]).update(
+            updated_at=self.tasks[0].updated_at
+        )
+
+        ids = []
+        response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(ids, [task.pk for task in self.tasks])
+
+    def test_page_number_pagination_by_default(self):
+        """测试默认仍使用页码分页"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+
+    def test_invalid_cursor(self):
+        """测试无效游标返回404"""
+        response = self.client.get(self.url, {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsetsTest(TestCase):
+    """API稀疏字段测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        BoardMember.objects.create(board=self.board, user=self.user, role='admin')
+        self.board_list = BoardList.objects.create(name='待办', board=self.board, position=1024)
+        for i in range(3):
+            task = Task.objects.create(
+                title=f'任务{i}', board=self.board, board_list=self.board_list, creator=self.user
+            )
+            task.assignees.add(self.user)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_task_fields_values_path(self):
+        """测试只请求部分字段时返回指定字段，查询次数与任务数无关"""
+        # 总数、当前页、受理人
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api:task-list'), {'fields': 'title,assignees,created_at'})
+
+        self.assertEqual(response.status_code, 200)
+        item = response.data['results'][0]
+        self.assertEqual(set(item), {'id', 'title', 'assignees', 'created_at'})
+        self.assertEqual(item['assignees'], [self.user.id])
+        self.assertIsInstance(item['created_at'], str)
+
+    def test_task_fields_with_expand(self):
+        """测试 expand 展开关联对象"""
+        response = self.client.get(reverse('api:task-list'), {'fields': 'title,creator', 'expand': 'creator'})
+
+        self.assertEqual(response.status_code, 200)
+        item = response.data['results'][0]
+        self.assertEqual(set(item), {'id', 'title', 'creator'})
+        self.assertEqual(item['creator']['username'], 'testuser')
+
+    def test_board_fields(self):
+        """测试看板列表使用存储的任务数"""
+        response = self.client.get(reverse('api:board-list'), {'fields': 'name,task_count,boardlist_set'})
+
+        self.assertEqual(response.status_code, 200)
+        item = response.data['results'][0]
+        self.assertEqual(item, {
+            'id': self.board.id, 'name': '测试看板', 'task_count': 3, 'boardlist_set': [self.board_list.id]
+        })
+
+        response = self.client.get(reverse('api:board-detail', args=[self.board.pk]))
+        self.assertEqual(response.data['boardlist_set'][0]['task_count'], 3)
@@ -12,14 +12,16 @@ from django.contrib.auth import get_user_model
 from django.db.models import Q
 from drf_spectacular.utils import extend_schema, extend_schema_view
 
+from .pagination import SelectablePaginationMixin
 from .serializers import (
     UserSerializer, UserCreateSerializer,
     TaskSerializer, TaskCreateSerializer,
-    BoardSerializer, BoardCreateSerializer, BoardListSerializer,
+    TaskValuesSerializer, get_query_fields,
+    BoardSerializer, BoardCreateSerializer,
     TeamSerializer, TeamCreateSerializer, TeamMembershipSerializer,
     ReportSerializer, CustomTokenObtainPairSerializer
 )
-from tasks.models import Task
+from tasks.models import Task, TaskAssignment
 from boards.models import Board, BoardMember, BoardList
 from teams.models import Team, TeamMembership
 from reports.models import Report
@@ -84,8 +86,11 @@ class UserViewSet(viewsets.ModelViewSet):
     partial_update=extend_schema(summary="部分更新任务"),
     destroy=extend_schema(summary="删除任务"),
 )
-class TaskViewSet(viewsets.ModelViewSet):
-    """任务管理API"""
+class TaskViewSet(SelectablePaginationMixin, viewsets.ModelViewSet):
+    """任务管理API
+
+    列表默认按页码分页，传 pagination=cursor 时按 (updated_at, id) 游标分页。
+    """
     queryset = Task.objects.select_related('board_list', 'creator').prefetch_related('assignees')
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
@@ -100,11 +105,12 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         # 只返回用户有权限访问的任务
         user = self.request.user
+        # 使用子查询而非连接，结果无重复行，不需要 distinct
         queryset = queryset.filter(
-            Q(board_list__board__members__user=user) |
+            Q(board_list__board__in=BoardMember.objects.filter(user=user).values('board')) |
             Q(creator=user) |
-            Q(assignees=user)
-        ).distinct()
+            Q(pk__in=TaskAssignment.objects.filter(user=user).values('task'))
+        )
         
         # 支持筛选参数
         board_id = self.request.query_params.get('board', None)
@@ -121,6 +127,20 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        """只请求部分字段且不展开关联对象时，直接由 .values() 构建响应"""
+        fields = get_query_fields(request, 'fields')
+        if fields is None or get_query_fields(request, 'expand'):
+            return super().list(request, *args, **kwargs)
+
+        builder = TaskValuesSerializer(fields, context=self.get_serializer_context())
+        queryset = builder.get_queryset(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(builder.to_representation(page))
+        return Response(builder.to_representation(queryset))
+    
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
     
@@ -163,25 +183,26 @@ class TaskViewSet(viewsets.ModelViewSet):
     partial_update=extend_schema(summary="部分更新看板"),
     destroy=extend_schema(summary="删除看板"),
 )
-class BoardViewSet(viewsets.ModelViewSet):
-    """看板管理API"""
-    queryset = Board.objects.select_related('owner').prefetch_related('members', 'boardlist_set')
+class BoardViewSet(SelectablePaginationMixin, viewsets.ModelViewSet):
+    """看板管理API
+
+    列表默认按页码分页，传 pagination=cursor 时按 (updated_at, id) 游标分页。
+    """
+    queryset = Board.objects.select_related('owner').prefetch_related('lists')
     serializer_class = BoardSerializer
     permission_classes = [IsAuthenticated]
     
     def get_serializer_class(self):
         if self.action == 'create':
             return BoardCreateSerializer
-        elif self.action == 'list':
-            return BoardListSerializer
         return BoardSerializer
     
     def get_queryset(self):
         """只返回用户有权限访问的看板"""
         user = self.request.user
         return super().get_queryset().filter(
-            Q(members__user=user) | Q(owner=user)
-        ).distinct()
+            Q(pk__in=BoardMember.objects.filter(user=user).values('board')) | Q(owner=user)
+        )
     
     def perform_create(self, serializer):
         board = serializer.save(owner=self.request.user)
@@ -3,12 +3,16 @@
 包含Team和Report的完整实现
 """
 
+import os
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
 from django.db.models import Q
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta
 from drf_spectacular.utils import extend_schema, extend_schema_view
@@ -20,7 +24,8 @@ from .serializers import (
 from tasks.models import Task
 from boards.models import Board
 from teams.models import Team, TeamMembership
-from reports.models import Report
+from reports.executions import open_result, serialize_execution, start_execution
+from reports.models import Report, ReportExecution
 
 User = get_user_model()
 
@@ -332,22 +337,38 @@ class ReportViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def export(self, request, pk=None):
-        """导出报表"""
+        """导出报表
+
+        在后台生成导出文件，返回执行记录，通过 executions/<id>/ 查询状态、
+        executions/<id>/download/ 下载结果。相同参数的重复导出复用已有执行。
+        """
         report = self.get_object()
-        export_format = request.data.get('format', 'json')
-        
-        # 获取报表数据
-        data_response = self.data(request, pk)
-        data = data_response.data
-        
-        if export_format == 'json':
-            return Response({
-                'report_name': report.name,
-                'generated_at': timezone.now(),
-                'data': data
-            })
-        else:
-            return Response(
-                {'error': '暂不支持该导出格式'}, 
-                status=status.HTTP_400_BAD_REQUEST
+        try:
+            execution, created = start_execution(
+                report, request.user, request.data.get('format', 'json'), request.data
             )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(
+            serialize_execution(execution),
+            status=status.HTTP_202_ACCEPTED if execution.status != 'completed' else status.HTTP_200_OK
+        )
+    
+    def _get_execution(self, execution_id):
+        report = self.get_object()
+        return get_object_or_404(ReportExecution, report=report, pk=execution_id)
+    
+    @action(detail=True, methods=['get'], url_path=r'executions/(?P<execution_id>\d+)')
+    def execution(self, request, pk=None, execution_id=None):
+        """查询报表执行状态"""
+        return Response(serialize_execution(self._get_execution(execution_id)))
+    
+    @action(detail=True, methods=['get'], url_path=r'executions/(?P<execution_id>\d+)/download')
+    def download(self, request, pk=None, execution_id=None):
+        """下载报表执行结果"""
+        execution = self._get_execution(execution_id)
+        result = open_result(execution)
+        if result is None:
+            return Response({'error': '报表尚未生成完成'}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(result, as_attachment=True, filename=os.path.basename(execution.file_path))
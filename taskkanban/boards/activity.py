@@ -0,0 +1,206 @@
+"""
+看板活动记录
+任务、列表、成员变更时追加 BoardActivity 事件。事件在事务提交后才进入本进程的缓冲区，
+回滚的事务不会留下活动记录；缓冲区在请求结束、Celery 任务结束、积累到 ACTIVITY_BUFFER_SIZE
+条或进程退出时整体交给 write_activities 后台任务，以一次 bulk_create 写入，
+请求路径上只有一次内存追加。
+
+操作用户由 ActivityActorMiddleware 在请求开始时设置；没有请求上下文时（后台任务、管理命令）
+使用调用方传入的用户（如任务的创建者），都没有时不记录。
+
+活动流按 (created_at, id) 倒序做键集分页，使用 (board, -created_at, -id) 索引，
+翻页的代价与已翻过的页数无关。超过 BOARD_ACTIVITY_RETENTION_DAYS 的记录由
+purge_old_activities 按 created_at 索引分批删除，表的大小与保留期内的活动量成正比。
+"""
+import atexit
+import contextvars
+import logging
+import threading
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Board, BoardActivity
+
+logger = logging.getLogger(__name__)
+
+# 缓冲区达到该条数时立即写入
+ACTIVITY_BUFFER_SIZE = 500
+
+# 活动流每页条数
+FEED_PAGE_SIZE = 50
+MAX_FEED_PAGE_SIZE = 200
+
+# 默认保留天数和清理时每批删除的条数
+DEFAULT_RETENTION_DAYS = 180
+PURGE_BATCH_SIZE = 5000
+
+# 当前请求的操作用户，可以是尚未求值的 request.user
+_actor = contextvars.ContextVar('board_activity_actor', default=None)
+
+_buffer = []
+_buffer_lock = threading.Lock()
+
+
+def set_actor(user):
+    """设置当前上下文的操作用户，返回用于 reset_actor 的令牌"""
+    return _actor.set(user)
+
+
+def reset_actor(token):
+    _actor.reset(token)
+
+
+def get_actor_id():
+    """当前上下文中已登录的操作用户ID"""
+    user = _actor.get()
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def _make_event(board_id, user_id, action, description, target_type, target_id, metadata, created_at):
+    return {
+        'board_id': board_id,
+        'user_id': user_id,
+        'action': action,
+        'description': description[:500],
+        'target_type': target_type,
+        'target_id': target_id,
+        'metadata': metadata or {},
+        'created_at': created_at.isoformat(),
+    }
+
+
+def record_activities(board_id, action, target_type, targets, user_id=None, metadata=None):
+    """事务提交后记录一批同类活动，targets 为 [(目标ID, 描述)]"""
+    user_id = get_actor_id() or user_id
+    if not board_id or not user_id:
+        return
+
+    now = timezone.now()
+    events = [
+        _make_event(board_id, user_id, action, description, target_type, target_id, metadata, now)
+        for target_id, description in targets
+    ]
+    if events:
+        transaction.on_commit(lambda: _append(events))
+
+
+def record_activity(board_id, action, description, target_type=None, target_id=None, user_id=None, metadata=None):
+    """事务提交后记录单条活动"""
+    record_activities(board_id, action, target_type, [(target_id, description)], user_id=user_id, metadata=metadata)
+
+
+def _append(events):
+    with _buffer_lock:
+        _buffer.extend(events)
+        full = len(_buffer) >= ACTIVITY_BUFFER_SIZE
+    if full:
+        flush_activities()
+
+
+def flush_activities():
+    """将缓冲区中的活动交给后台写入，返回交出的条数"""
+    with _buffer_lock:
+        if not _buffer:
+            return 0
+        events = _buffer[:]
+        _buffer.clear()
+
+    try:
+        write_activities.delay(events)
+    except Exception as e:
+        # 消息队列不可用时直接写入，不丢弃活动
+        logger.warning(f"Failed to schedule activity write, writing synchronously: {e}")
+        write_activities(events)
+    return len(events)
+
+
+atexit.register(flush_activities)
+
+
+@shared_task
+def write_activities(events):
+    """批量写入活动记录，忽略看板或操作用户已删除的活动，返回写入条数"""
+    from django.contrib.auth import get_user_model
+
+    board_ids = set(Board.objects.filter(
+        pk__in={event['board_id'] for event in events}
+    ).values_list('id', flat=True))
+    user_ids = set(get_user_model().objects.filter(
+        pk__in={event['user_id'] for event in events}
+    ).values_list('id', flat=True))
+
+    activities = [
+        BoardActivity(**{**event, 'created_at': parse_datetime(event['created_at'])})
+        for event in events
+        if event['board_id'] in board_ids and event['user_id'] in user_ids
+    ]
+    try:
+        with transaction.atomic():
+            BoardActivity.objects.bulk_create(activities, batch_size=ACTIVITY_BUFFER_SIZE)
+    except IntegrityError as e:
+        # 写入期间看板或用户被删除
+        logger.warning(f"Skipped {len(activities)} board activities: {e}")
+        return 0
+    return len(activities)
+
+
+def get_activity_feed(board, before=None, before_id=None, limit=FEED_PAGE_SIZE):
+    """按时间倒序取出 (before, before_id) 之前的活动，返回 (活动, 是否还有更多)"""
+    activities = BoardActivity.objects.filter(board=board).select_related('user')
+    if before is not None:
+        older = Q(created_at__lt=before)
+        if before_id is not None:
+            older |= Q(created_at=before, id__lt=before_id)
+        activities = activities.filter(older)
+
+    # 多取一条判断是否还有更多
+    activities = list(activities.order_by('-created_at', '-id')[:limit + 1])
+    return activities[:limit], len(activities) > limit
+
+
+def serialize_activity(activity):
+    """活动的JSON表示"""
+    return {
+        'id': activity.id,
+        'action': activity.action,
+        'action_display': activity.get_action_display(),
+        'description': activity.description,
+        'target_type': activity.target_type,
+        'target_id': activity.target_id,
+        'metadata': activity.metadata,
+        'user': {
+            'id': activity.user_id,
+            'username': activity.user.username,
+            'display_name': activity.user.get_display_name(),
+        },
+        'created_at': activity.created_at.isoformat(),
+    }
+
+
+@shared_task
+def purge_old_activities(retention_days=None):
+    """分批删除超过保留期的活动记录，返回删除条数"""
+    retention_days = retention_days or getattr(settings, 'BOARD_ACTIVITY_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    deleted = 0
+    while True:
+        ids = list(BoardActivity.objects.filter(
+            created_at__lt=cutoff
+        ).order_by('created_at').values_list('id', flat=True)[:PURGE_BATCH_SIZE])
+        if not ids:
+            break
+        deleted += BoardActivity.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < PURGE_BATCH_SIZE:
+            break
+
+    logger.info(f"Purged {deleted} board activities older than {retention_days} days")
+    return deleted
@@ -40,7 +40,7 @@ class BoardAdmin(admin.ModelAdmin):
     list_display = ('name', 'owner', 'team', 'template', 'visibility', 'is_closed', 'member_count', 'list_count', 'created_at')
     list_filter = ('template', 'visibility', 'is_closed', 'enable_calendar', 'enable_timeline', 'created_at')
     search_fields = ('name', 'description', 'owner__email', 'owner__username', 'team__name')
-    readonly_fields = ('slug', 'created_at', 'updated_at', 'member_count', 'list_count', 'task_count')
+    readonly_fields = ('slug', 'created_at', 'updated_at', 'member_count', 'list_count', 'task_count', 'open_task_count', 'done_task_count')
     inlines = [BoardListInline, BoardMemberInline, BoardLabelInline]
     fieldsets = (
         (_('基本信息'), {'fields': ('name', 'slug', 'description')}),
@@ -49,7 +49,7 @@ class BoardAdmin(admin.ModelAdmin):
         (_('配置'), {'fields': ('template', 'visibility')}),
         (_('功能设置'), {'fields': ('enable_calendar', 'enable_timeline', 'enable_comments', 'enable_attachments')}),
         (_('状态'), {'fields': ('is_closed',)}),
-        (_('统计'), {'fields': ('member_count', 'list_count', 'task_count')}),
+        (_('统计'), {'fields': ('member_count', 'list_count', 'task_count', 'open_task_count', 'done_task_count')}),
         (_('时间'), {'fields': ('created_at', 'updated_at')}),
     )
     
@@ -65,13 +65,13 @@ class BoardListAdmin(admin.ModelAdmin):
     list_display = ('name', 'board', 'position', 'color', 'is_archived', 'is_done_list', 'wip_limit', 'task_count')
     list_filter = ('is_archived', 'is_done_list', 'created_at')
     search_fields = ('name', 'board__name')
-    readonly_fields = ('created_at', 'updated_at', 'task_count', 'is_wip_exceeded')
+    readonly_fields = ('created_at', 'updated_at', 'task_count', 'open_task_count', 'done_task_count', 'is_wip_exceeded')
     fieldsets = (
         (_('基本信息'), {'fields': ('board', 'name', 'position')}),
         (_('样式'), {'fields': ('color',)}),
         (_('设置'), {'fields': ('is_done_list', 'wip_limit')}),
         (_('状态'), {'fields': ('is_archived',)}),
-        (_('统计'), {'fields': ('task_count', 'is_wip_exceeded')}),
+        (_('统计'), {'fields': ('task_count', 'open_task_count', 'done_task_count', 'is_wip_exceeded')}),
         (_('时间'), {'fields': ('created_at', 'updated_at')}),
     )
     
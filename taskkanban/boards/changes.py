@@ -0,0 +1,151 @@
+"""
+看板变更日志服务
+记录任务、列表、任务分配的变更，并按游标返回增量数据
+
+游标即 BoardChange 的自增ID。变更在事务提交后写入，保证客户端读到某个游标时，
+该游标之前的变更数据已经可见。
+
+自增ID在插入时分配、在提交时可见，并发写入同一看板时较小的ID可能晚于较大的ID提交，
+客户端越过未提交的ID后会永远错过它。写入前先锁定看板行，同一看板的变更按ID顺序提交，
+读取方按看板过滤，游标之前的ID不会再出现新的记录。
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+
+from .models import Board, BoardChange, BoardList
+
+logger = logging.getLogger(__name__)
+
+# 单次返回的最大变更条数，超出时 has_more 为 True，客户端继续拉取
+CHANGES_LIMIT = 500
+
+
+def _write_changes(board_id, changes):
+    """锁定看板后写入变更记录，看板已被删除时忽略"""
+    try:
+        with transaction.atomic():
+            if not Board.objects.select_for_update().filter(pk=board_id).values_list('pk', flat=True):
+                return
+            BoardChange.objects.bulk_create(changes)
+    except IntegrityError:
+        logger.debug("Skipped board changes for a deleted board")
+
+
+def record_changes(board_id, entity_type, entity_ids, action, user_id=None, user_ids=None):
+    """在事务提交后批量记录同类变更
+
+    user_ids 与 entity_ids 一一对应时，每条变更记录各自的用户，否则都记录 user_id。
+    """
+    if not board_id:
+        return
+
+    entity_ids = list(entity_ids)
+    if user_ids is None:
+        user_ids = [user_id] * len(entity_ids)
+    changes = [
+        BoardChange(
+            board_id=board_id,
+            entity_type=entity_type,
+            entity_id=entity_id,
+            user_id=change_user_id,
+            action=action,
+        )
+        for entity_id, change_user_id in zip(entity_ids, user_ids)
+    ]
+    if changes:
+        transaction.on_commit(lambda: _write_changes(board_id, changes))
+
+
+def record_change(board_id, entity_type, entity_id, action, user_id=None):
+    """在事务提交后记录单条变更"""
+    record_changes(board_id, entity_type, [entity_id], action, user_id=user_id)
+
+
+def get_latest_cursor(board_id):
+    """获取看板最新的变更游标"""
+    return BoardChange.objects.filter(
+        board_id=board_id
+    ).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _empty_section():
+    return {'created': [], 'updated': [], 'deleted': []}
+
+
+def get_changes_since(board, since, limit=CHANGES_LIMIT):
+    """获取游标之后的增量数据
+
+    同一对象的多次变更合并为一次，返回对象的当前状态；
+    对象已不存在（或已移出看板）时放入 deleted。
+    """
+    from tasks.models import TaskAssignment
+    from .snapshots import get_task_queryset, serialize_task
+
+    changes = list(BoardChange.objects.filter(
+        board=board,
+        id__gt=since
+    ).order_by('id').values('id', 'entity_type', 'entity_id', 'user_id', 'action')[:limit + 1])
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    touched = {'task': {}, 'list': {}, 'assignment': {}}
+    for change in changes:
+        if change['entity_type'] == 'assignment':
+            key = (change['entity_id'], change['user_id'])
+        else:
+            key = change['entity_id']
+        # 窗口内出现过创建的对象视为新建
+        created = touched[change['entity_type']].get(key, False)
+        touched[change['entity_type']][key] = created or change['action'] == 'created'
+
+    result = {
+        'cursor': changes[-1]['id'] if changes else since,
+        'has_more': has_more,
+        'tasks': _empty_section(),
+        'lists': _empty_section(),
+        'assignments': _empty_section(),
+    }
+
+    if touched['task']:
+        tasks = {
+            task.id: task
+            for task in get_task_queryset().filter(board=board, id__in=touched['task'])
+        }
+        for task_id, created in touched['task'].items():
+            if task_id in tasks:
+                section = 'created' if created else 'updated'
+                result['tasks'][section].append(serialize_task(tasks[task_id]))
+            else:
+                result['tasks']['deleted'].append(task_id)
+
+    if touched['list']:
+        lists = {
+            board_list['id']: board_list
+            for board_list in BoardList.objects.filter(
+                board=board, id__in=touched['list']
+            ).values('id', 'name', 'position')
+        }
+        for list_id, created in touched['list'].items():
+            if list_id in lists:
+                section = 'created' if created else 'updated'
+                result['lists'][section].append(lists[list_id])
+            else:
+                result['lists']['deleted'].append(list_id)
+
+    if touched['assignment']:
+        task_ids = {task_id for task_id, _ in touched['assignment']}
+        existing = set(TaskAssignment.objects.filter(
+            task__board=board,
+            task_id__in=task_ids
+        ).values_list('task_id', 'user_id'))
+        # 分配关系没有可更新的字段，存在即视为新建
+        for task_id, user_id in touched['assignment']:
+            item = {'task_id': task_id, 'user_id': user_id}
+            if (task_id, user_id) in existing:
+                result['assignments']['created'].append(item)
+            else:
+                result['assignments']['deleted'].append(item)
+
+    return result
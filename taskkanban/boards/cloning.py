@@ -0,0 +1,278 @@
+"""
+看板复制服务
+按 标签 → 列表 → 任务 → 多对多关联 → 子任务/依赖 → 成员 的顺序分阶段 bulk_create，
+每阶段记录 原ID → 新对象 的映射供下一阶段引用，查询次数与任务数量基本无关
+
+批量插入不触发模型信号，复制完成后统一重新统计任务和看板计数、更新检索向量、
+失效权限缓存。任务数超过 SYNC_CLONE_LIMIT 时由 Celery 在后台复制，
+进度写入缓存（见 get_clone_progress）。
+"""
+import logging
+
+from celery import shared_task
+from django.core.cache import cache
+from django.db import transaction
+
+from .changes import record_changes
+from .counters import recount_board_counters
+from .models import Board, BoardLabel, BoardList, BoardMember
+from .permissions import invalidate_board_roles
+from .snapshots import bump_board_version_on_commit
+
+logger = logging.getLogger(__name__)
+
+# 超过该任务数时后台复制
+SYNC_CLONE_LIMIT = 500
+
+BATCH_SIZE = 500
+
+PROGRESS_KEY = 'boards:clone:{board_id}'
+PROGRESS_TIMEOUT = 60 * 60
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# 复制的任务字段，状态、进度等执行信息不复制
+TASK_COPY_FIELDS = (
+    'title', 'description', 'priority', 'position', 'due_date', 'start_date', 'estimated_hours',
+)
+SUBTASK_COPY_FIELDS = ('title', 'description', 'position', 'due_date')
+
+
+def set_clone_progress(board_id, status, stage=None, done=0, total=0):
+    cache.set(PROGRESS_KEY.format(board_id=board_id), {
+        'status': status,
+        'stage': stage,
+        'done': done,
+        'total': total,
+    }, PROGRESS_TIMEOUT)
+
+
+def get_clone_progress(board_id):
+    """获取后台复制进度，没有进行中的复制时返回None"""
+    return cache.get(PROGRESS_KEY.format(board_id=board_id))
+
+
+class BoardCloner:
+    """将源看板的内容批量复制到已创建的新看板"""
+
+    def __init__(self, source, target, user, copy_lists=True, copy_tasks=True,
+                 copy_labels=True, copy_members=False, progress=None):
+        self.source = source
+        self.target = target
+        self.user = user
+        self.copy_lists = copy_lists
+        self.copy_tasks = copy_tasks and copy_lists
+        self.copy_labels = copy_labels
+        self.copy_members = copy_members
+        # progress(stage, done, total)
+        self.progress = progress or (lambda stage, done, total: None)
+
+        self.label_map = {}
+        self.list_map = {}
+        self.task_map = {}
+
+    def run(self):
+        """执行复制，返回复制的任务数"""
+        if self.copy_labels:
+            self.clone_labels()
+        if self.copy_lists:
+            self.clone_lists()
+        if self.copy_tasks:
+            self.clone_tasks()
+            self.clone_task_relations()
+        if self.copy_members:
+            self.clone_members()
+        self.finish()
+        return len(self.task_map)
+
+    def clone_labels(self):
+        labels = list(BoardLabel.objects.filter(board=self.source))
+        created = BoardLabel.objects.bulk_create([
+            BoardLabel(board=self.target, name=label.name, color=label.color)
+            for label in labels
+        ])
+        self.label_map = {label.id: new.id for label, new in zip(labels, created)}
+
+    def clone_lists(self):
+        lists = list(self.source.lists.all())
+        created = BoardList.objects.bulk_create([
+            BoardList(
+                board=self.target,
+                name=board_list.name,
+                position=board_list.position,
+                color=board_list.color,
+                is_done_list=board_list.is_done_list,
+                wip_limit=board_list.wip_limit,
+                is_archived=board_list.is_archived,
+            )
+            for board_list in lists
+        ])
+        self.list_map = {board_list.id: new.id for board_list, new in zip(lists, created)}
+
+    def clone_tasks(self):
+        from tasks.models import Task
+
+        tasks = Task.objects.filter(board_list__in=list(self.list_map)).order_by('pk').values(
+            'id', 'board_list_id', *TASK_COPY_FIELDS
+        )
+        total = tasks.count()
+
+        batch = []
+        for row in tasks.iterator(chunk_size=BATCH_SIZE):
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                self._create_tasks(batch)
+                batch = []
+                self.progress('tasks', len(self.task_map), total)
+        if batch:
+            self._create_tasks(batch)
+        self.progress('tasks', len(self.task_map), total)
+
+    def _create_tasks(self, rows):
+        from tasks.models import Task
+
+        created = Task.objects.bulk_create([
+            Task(
+                board=self.target,
+                board_list_id=self.list_map[row['board_list_id']],
+                creator=self.user,
+                **{field: row[field] for field in TASK_COPY_FIELDS}
+            )
+            for row in rows
+        ])
+        for row, task in zip(rows, created):
+            self.task_map[row['id']] = task.id
+
+    def _source_task_chunks(self):
+        source_ids = list(self.task_map)
+        for start in range(0, len(source_ids), BATCH_SIZE):
+            yield source_ids[start:start + BATCH_SIZE]
+
+    def clone_task_relations(self):
+        """复制任务标签、受理人、子任务和任务间依赖"""
+        from tasks.models import SubTask, Task, TaskAssignment, TaskDependency
+
+        LabelThrough = Task.labels.through
+        for source_ids in self._source_task_chunks():
+            if self.label_map:
+                LabelThrough.objects.bulk_create([
+                    LabelThrough(task_id=self.task_map[task_id], boardlabel_id=self.label_map[label_id])
+                    for task_id, label_id in LabelThrough.objects.filter(
+                        task_id__in=source_ids, boardlabel_id__in=list(self.label_map)
+                    ).values_list('task_id', 'boardlabel_id')
+                ], ignore_conflicts=True)
+
+            # 受理人只在复制成员时保留，否则新看板中可能出现无权访问的受理人
+            if self.copy_members:
+                TaskAssignment.objects.bulk_create([
+                    TaskAssignment(task_id=self.task_map[task_id], user_id=user_id, assigned_by=self.user)
+                    for task_id, user_id in TaskAssignment.objects.filter(
+                        task_id__in=source_ids
+                    ).values_list('task_id', 'user_id')
+                ], ignore_conflicts=True)
+
+            SubTask.objects.bulk_create([
+                SubTask(
+                    parent_task_id=self.task_map[row['parent_task_id']],
+                    assignee_id=row['assignee_id'] if self.copy_members else None,
+                    **{field: row[field] for field in SUBTASK_COPY_FIELDS}
+                )
+                for row in SubTask.objects.filter(parent_task_id__in=source_ids).values(
+                    'parent_task_id', 'assignee_id', *SUBTASK_COPY_FIELDS
+                )
+            ])
+
+            # 只复制两端都在本看板内的依赖
+            TaskDependency.objects.bulk_create([
+                TaskDependency(
+                    from_task_id=self.task_map[from_id],
+                    to_task_id=self.task_map[to_id],
+                    dependency_type=dependency_type,
+                    created_by=self.user,
+                )
+                for from_id, to_id, dependency_type in TaskDependency.objects.filter(
+                    from_task_id__in=source_ids, to_task_id__in=list(self.task_map)
+                ).values_list('from_task_id', 'to_task_id', 'dependency_type')
+            ], ignore_conflicts=True)
+
+    def clone_members(self):
+        BoardMember.objects.bulk_create([
+            BoardMember(board=self.target, user_id=user_id, role='member', invited_by=self.user)
+            for user_id in self.source.members.filter(is_active=True).exclude(
+                user=self.target.owner_id
+            ).values_list('user_id', flat=True)
+        ], ignore_conflicts=True)
+
+    def finish(self):
+        """批量插入不触发信号，统一维护计数、检索向量、权限缓存和变更日志"""
+        from tasks.counters import recount_task_counters
+        from tasks.search import update_search_vectors
+
+        task_ids = list(self.task_map.values())
+        if task_ids:
+            recount_task_counters(task_ids)
+            update_search_vectors(task_ids)
+            record_changes(self.target.id, 'task', task_ids, 'created')
+        if self.list_map:
+            record_changes(self.target.id, 'list', list(self.list_map.values()), 'created')
+        recount_board_counters([self.target.id])
+        invalidate_board_roles([self.target.id])
+        bump_board_version_on_commit(self.target.id)
+
+
+def clone_board(source, target, user, **options):
+    """同步复制看板内容，返回复制的任务数"""
+    with transaction.atomic():
+        return BoardCloner(source, target, user, **options).run()
+
+
+def count_source_tasks(source, copy_lists=True, copy_tasks=True, **options):
+    from tasks.models import Task
+
+    if not (copy_lists and copy_tasks):
+        return 0
+    return Task.objects.filter(board_list__board=source).count()
+
+
+def start_clone(source, target, user, **options):
+    """复制看板内容，任务较多时安排后台复制
+
+    返回 True 表示已安排后台复制。
+    """
+    if count_source_tasks(source, **options) <= SYNC_CLONE_LIMIT:
+        clone_board(source, target, user, **options)
+        return False
+
+    set_clone_progress(target.id, STATUS_RUNNING)
+    transaction.on_commit(
+        lambda: clone_board_task.delay(source.id, target.id, user.id, options)
+    )
+    return True
+
+
+@shared_task
+def clone_board_task(source_id, target_id, user_id, options):
+    """后台复制看板内容"""
+    from django.contrib.auth import get_user_model
+
+    source = Board.objects.filter(pk=source_id).first()
+    target = Board.objects.filter(pk=target_id).first()
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if source is None or target is None or user is None:
+        return 0
+
+    def progress(stage, done, total):
+        set_clone_progress(target_id, STATUS_RUNNING, stage, done, total)
+
+    try:
+        with transaction.atomic():
+            count = BoardCloner(source, target, user, progress=progress, **options).run()
+    except Exception as e:
+        logger.error(f"Failed to clone board {source_id} into {target_id}: {e}")
+        set_clone_progress(target_id, STATUS_FAILED)
+        raise
+
+    set_clone_progress(target_id, STATUS_DONE, done=count, total=count)
+    return count
@@ -0,0 +1,53 @@
+"""
+Boards应用WebSocket消费者
+"""
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .models import Board
+from .permissions import can_view_board
+from .realtime import get_board_group_name
+
+
+class BoardConsumer(AsyncJsonWebsocketConsumer):
+    """
+    看板实时频道
+    连接 ws/boards/<slug>/ 后加入看板通道组，接收卡片移动、状态、标签、评论事件
+    """
+    
+    async def connect(self):
+        self.group_name = None
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        
+        board_id = await self.get_accessible_board_id(self.scope['url_route']['kwargs']['slug'], user)
+        if board_id is None:
+            await self.close()
+            return
+        
+        self.group_name = get_board_group_name(board_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+    
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def receive_json(self, content, **kwargs):
+        # 频道只用于服务端推送，客户端只发送心跳
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+    
+    async def board_event(self, message):
+        """转发看板事件给客户端"""
+        await self.send_json(message['event'])
+    
+    @database_sync_to_async
+    def get_accessible_board_id(self, slug, user):
+        """获取用户有权访问的看板ID"""
+        board = Board.objects.filter(slug=slug).only('id', 'owner_id').first()
+        if board and can_view_board(user, board):
+            return board.id
+        return None
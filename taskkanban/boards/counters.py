@@ -0,0 +1,112 @@
+"""
+看板计数字段维护
+任务数、未完成/已完成任务数、成员数冗余保存在 Board 和 BoardList 上，
+看板列表页无需再按 列表×任务×成员 连接统计
+
+任务保存、删除时按保存前与保存后的状态差异用 F() 增减（见 boards.signals），
+保存前的状态在 Task.save 中锁定任务行后从数据库读取，并发保存同一任务不会重复计数；
+批量 UPDATE 不触发信号，由调用方对涉及的看板重新统计。
+计数出现偏差时可运行 recount_board_counters 命令修复。
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+TASK_COUNTER_FIELDS = ('task_count', 'open_task_count', 'done_task_count')
+BOARD_COUNTER_FIELDS = TASK_COUNTER_FIELDS + ('member_count',)
+
+# 计入统计的任务条件，与 get_task_counts 保持一致
+COUNTED_TASKS = Q(is_archived=False)
+DONE_TASKS = Q(status='done')
+
+
+def get_task_counts(status, is_archived):
+    """单个任务对各计数字段的贡献"""
+    if is_archived:
+        return {}
+    done = status == 'done'
+    return {
+        'task_count': 1,
+        'open_task_count': 0 if done else 1,
+        'done_task_count': 1 if done else 0,
+    }
+
+
+def _count_subquery(model, fk_field, condition):
+    queryset = model.objects.filter(condition, **{fk_field: OuterRef('pk')})
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(fk_field).annotate(total=Count('pk')).values('total')[:1]
+        ),
+        0
+    )
+
+
+def _task_count_expressions(fk_field):
+    from tasks.models import Task
+
+    return {
+        'task_count': _count_subquery(Task, fk_field, COUNTED_TASKS),
+        'open_task_count': _count_subquery(Task, fk_field, COUNTED_TASKS & ~DONE_TASKS),
+        'done_task_count': _count_subquery(Task, fk_field, COUNTED_TASKS & DONE_TASKS),
+    }
+
+
+def recount_board_counters(board_ids=None, fields=BOARD_COUNTER_FIELDS):
+    """重新统计看板及其列表的计数，board_ids 为 None 时统计所有看板"""
+    from .models import Board, BoardList, BoardMember
+
+    boards = Board.objects.all()
+    lists = BoardList.objects.all()
+    if board_ids is not None:
+        boards = boards.filter(pk__in=board_ids)
+        lists = lists.filter(board_id__in=board_ids)
+
+    expressions = _task_count_expressions('board')
+    expressions['member_count'] = _count_subquery(BoardMember, 'board', Q(is_active=True))
+    updated = boards.update(**{field: expressions[field] for field in fields})
+
+    list_fields = [field for field in fields if field in TASK_COUNTER_FIELDS]
+    if list_fields:
+        expressions = _task_count_expressions('board_list')
+        lists.update(**{field: expressions[field] for field in list_fields})
+    return updated
+
+
+def _apply_deltas(model, deltas):
+    for pk, fields in deltas.items():
+        changes = {
+            field: Greatest(F(field) + delta, 0)
+            for field, delta in fields.items() if delta
+        }
+        if pk and changes:
+            model.objects.filter(pk=pk).update(**changes)
+
+
+def apply_task_change(old_state, new_state):
+    """按任务变更前后的状态增减看板和列表的计数
+
+    状态为 Task.get_counted_state() 的返回值，None 表示不存在（新建或删除）。
+    """
+    from .models import Board, BoardList
+
+    board_deltas = defaultdict(lambda: defaultdict(int))
+    list_deltas = defaultdict(lambda: defaultdict(int))
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is None:
+            continue
+        board_id, board_list_id, status, is_archived = state
+        for field, count in get_task_counts(status, is_archived).items():
+            board_deltas[board_id][field] += sign * count
+            list_deltas[board_list_id][field] += sign * count
+
+    _apply_deltas(Board, board_deltas)
+    _apply_deltas(BoardList, list_deltas)
+
+
+def increment_member_count(board_id, delta=1):
+    """增减看板成员数，结果不小于0"""
+    from .models import Board
+
+    Board.objects.filter(pk=board_id).update(member_count=Greatest(F('member_count') + delta, 0))
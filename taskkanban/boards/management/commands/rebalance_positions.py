@@ -0,0 +1,37 @@
+"""
+重排看板列表和任务的排序位置
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from boards.models import Board
+from boards.ordering import rebalance_board_lists, rebalance_list_tasks
+
+
+class Command(BaseCommand):
+    help = '按当前顺序为列表和任务重新分配间隔位置'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--board',
+            type=str,
+            help='只处理指定slug的看板',
+        )
+
+    def handle(self, *args, **options):
+        boards = Board.objects.all()
+        if options['board']:
+            boards = boards.filter(slug=options['board'])
+            if not boards.exists():
+                raise CommandError(f"看板不存在: {options['board']}")
+
+        list_count = task_count = 0
+        for board in boards.iterator():
+            with transaction.atomic():
+                list_count += rebalance_board_lists(board)
+                for board_list in board.lists.all():
+                    task_count += rebalance_list_tasks(board_list)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'重排完成：更新 {list_count} 个列表，{task_count} 个任务'
+        ))
@@ -0,0 +1,28 @@
+"""
+重新统计看板和列表的计数字段
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.counters import recount_board_counters
+from boards.models import Board
+
+
+class Command(BaseCommand):
+    help = '重新统计看板和列表的任务数、成员数'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--board',
+            type=str,
+            help='只处理指定slug的看板',
+        )
+
+    def handle(self, *args, **options):
+        board_ids = None
+        if options['board']:
+            board_ids = list(Board.objects.filter(slug=options['board']).values_list('id', flat=True))
+            if not board_ids:
+                raise CommandError(f"看板不存在: {options['board']}")
+
+        updated = recount_board_counters(board_ids)
+        self.stdout.write(self.style.SUCCESS(f'重新统计完成：更新 {updated} 个看板'))
@@ -0,0 +1,21 @@
+"""
+Boards应用中间件
+"""
+from .activity import reset_actor, set_actor
+
+
+class ActivityActorMiddleware:
+    """将当前请求的用户设为看板活动的操作用户
+
+    需放在 AuthenticationMiddleware 之后；request.user 在记录活动时才求值。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = set_actor(getattr(request, 'user', None))
+        try:
+            return self.get_response(request)
+        finally:
+            reset_actor(token)
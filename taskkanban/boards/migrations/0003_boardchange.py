@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boards", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BoardChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "entity_type",
+                    models.CharField(
+                        choices=[
+                            ("task", "任务"),
+                            ("list", "列表"),
+                            ("assignment", "任务分配"),
+                        ],
+                        max_length=20,
+                        verbose_name="对象类型",
+                    ),
+                ),
+                ("entity_id", models.PositiveBigIntegerField(verbose_name="对象ID")),
+                (
+                    "user_id",
+                    models.PositiveBigIntegerField(
+                        blank=True, null=True, verbose_name="用户ID"
+                    ),
+                ),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "创建"),
+                            ("updated", "更新"),
+                            ("deleted", "删除"),
+                        ],
+                        max_length=10,
+                        verbose_name="变更类型",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "board",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="changes",
+                        to="boards.board",
+                        verbose_name="看板",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "看板变更",
+                "verbose_name_plural": "看板变更",
+                "db_table": "boards_change",
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["board", "id"], name="boards_chan_board_i_7c3adb_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# 与 boards.ordering.POSITION_GAP 保持一致，迁移中不引用业务代码
+POSITION_GAP = 1024
+
+
+def renumber(queryset, model):
+    objects = list(queryset)
+    for index, obj in enumerate(objects, start=1):
+        obj.position = index * POSITION_GAP
+    model.objects.bulk_update(objects, ['position'], batch_size=500)
+
+
+def forwards(apps, schema_editor):
+    Board = apps.get_model('boards', 'Board')
+    BoardList = apps.get_model('boards', 'BoardList')
+    Task = apps.get_model('tasks', 'Task')
+
+    for board_id in Board.objects.values_list('id', flat=True):
+        renumber(BoardList.objects.filter(board_id=board_id).order_by('position', 'id'), BoardList)
+
+    for list_id in BoardList.objects.values_list('id', flat=True):
+        renumber(Task.objects.filter(board_list_id=list_id).order_by('position', '-created_at'), Task)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0003_boardchange'),
+        ('tasks', '0003_workflowrule_workflowruleexecution_workflowstatus_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, fk_field, condition):
+    queryset = model.objects.filter(condition, **{fk_field: OuterRef('pk')})
+    return Coalesce(
+        Subquery(queryset.order_by().values(fk_field).annotate(total=Count('pk')).values('total')[:1]),
+        0
+    )
+
+
+def task_count_expressions(Task, fk_field):
+    counted = Q(is_archived=False)
+    done = Q(status='done')
+    return {
+        'task_count': count_subquery(Task, fk_field, counted),
+        'open_task_count': count_subquery(Task, fk_field, counted & ~done),
+        'done_task_count': count_subquery(Task, fk_field, counted & done),
+    }
+
+
+def populate_counters(apps, schema_editor):
+    Board = apps.get_model('boards', 'Board')
+    BoardList = apps.get_model('boards', 'BoardList')
+    BoardMember = apps.get_model('boards', 'BoardMember')
+    Task = apps.get_model('tasks', 'Task')
+
+    Board.objects.update(
+        member_count=count_subquery(BoardMember, 'board', Q(is_active=True)),
+        **task_count_expressions(Task, 'board')
+    )
+    BoardList.objects.update(**task_count_expressions(Task, 'board_list'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boards", "0004_gapped_positions"),
+        ("tasks", "0004_task_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="board",
+            name="done_task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="已完成任务数量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="board",
+            name="member_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="成员数量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="board",
+            name="open_task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="未完成任务数量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="board",
+            name="task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="任务数量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="boardlist",
+            name="done_task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="已完成任务数量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="boardlist",
+            name="open_task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="未完成任务数量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="boardlist",
+            name="task_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="任务数量"
+            ),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
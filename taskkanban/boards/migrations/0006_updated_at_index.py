@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boards", "0005_board_counters"),
+        ("teams", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="board",
+            index=models.Index(
+                fields=["updated_at", "id"], name="boards_boar_updated_c20d69_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:14
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boards", "0006_updated_at_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="boardactivity",
+            name="boards_acti_board_i_c65638_idx",
+        ),
+        migrations.AlterField(
+            model_name="boardactivity",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="创建时间",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="boardactivity",
+            index=models.Index(
+                fields=["board", "-created_at", "-id"],
+                name="boards_acti_board_i_568f16_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="boardactivity",
+            index=models.Index(
+                fields=["created_at"], name="boards_acti_created_479223_idx"
+            ),
+        ),
+    ]
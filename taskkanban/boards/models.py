@@ -1,13 +1,24 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.core.validators import MinLengthValidator
-from django.utils.text import slugify
-import uuid
+
+from .counters import BOARD_COUNTER_FIELDS, TASK_COUNTER_FIELDS
+from .slugs import save_with_unique_slug
 
 User = get_user_model()
 
 
+def exclude_counter_fields(instance, counter_fields, args, kwargs):
+    """更新已有对象时不写回内存中可能过期的计数字段，计数只由信号以 F() 更新"""
+    if not instance._state.adding and kwargs.get('update_fields') is None and not args:
+        kwargs['update_fields'] = [
+            field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name not in counter_fields
+        ]
+
+
 class Board(models.Model):
     """
     看板模型
@@ -66,6 +77,12 @@ class Board(models.Model):
         verbose_name=_('所属团队')
     )
     
+    # 统计计数（由 boards.signals 维护）
+    task_count = models.PositiveIntegerField(_('任务数量'), default=0, editable=False)
+    open_task_count = models.PositiveIntegerField(_('未完成任务数量'), default=0, editable=False)
+    done_task_count = models.PositiveIntegerField(_('已完成任务数量'), default=0, editable=False)
+    member_count = models.PositiveIntegerField(_('成员数量'), default=0, editable=False)
+    
     # 系统字段
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
     updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
@@ -77,34 +94,19 @@ class Board(models.Model):
         indexes = [
             models.Index(fields=['owner', '-updated_at']),
             models.Index(fields=['team', '-updated_at']),
-            models.Index(fields=['visibility', '-updated_at']),        ]
+            models.Index(fields=['visibility', '-updated_at']),
+            # API 游标分页
+            models.Index(fields=['updated_at', 'id']),
+        ]
     
     def __str__(self):
         return self.name
     
     def save(self, *args, **kwargs):
+        exclude_counter_fields(self, BOARD_COUNTER_FIELDS, args, kwargs)
         if not self.slug:
-            # 使用名称生成slug，如果为空则使用UUID
-            base_slug = slugify(self.name)
-            if not base_slug:
-                # 对于中文等无法slugify的名称，使用名称拼音或UUID
-                import uuid
-                base_slug = str(uuid.uuid4())[:8]
-            
-            slug = base_slug
-            counter = 1
-            # 排除自己（更新时）
-            queryset = Board.objects.filter(slug=slug)
-            if self.pk:
-                queryset = queryset.exclude(pk=self.pk)
-            
-            while queryset.exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-                queryset = Board.objects.filter(slug=slug)
-                if self.pk:
-                    queryset = queryset.exclude(pk=self.pk)
-            self.slug = slug
+            # 由名称分配不重复的slug，并发冲突时自动重试
+            return save_with_unique_slug(self, super().save, *args, **kwargs)
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
@@ -116,20 +118,10 @@ class Board(models.Model):
             return self.background_image.url
         return None
     
-    @property
-    def member_count(self):
-        """看板成员数量"""
-        return self.members.filter(is_active=True).count()
-    
     @property
     def list_count(self):
         """列表数量"""
         return self.lists.filter(is_archived=False).count()
-    
-    @property
-    def task_count(self):
-        """任务数量"""
-        return sum(list_obj.tasks.filter(is_archived=False).count() for list_obj in self.lists.all())
 
 
 class BoardList(models.Model):
@@ -156,6 +148,11 @@ class BoardList(models.Model):
     # 限制设置
     wip_limit = models.PositiveIntegerField(_('在制品限制'), null=True, blank=True)
     
+    # 统计计数（由 boards.signals 维护）
+    task_count = models.PositiveIntegerField(_('任务数量'), default=0, editable=False)
+    open_task_count = models.PositiveIntegerField(_('未完成任务数量'), default=0, editable=False)
+    done_task_count = models.PositiveIntegerField(_('已完成任务数量'), default=0, editable=False)
+    
     # 系统字段
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
     updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
@@ -167,13 +164,19 @@ class BoardList(models.Model):
         ordering = ['position']
         unique_together = ('board', 'name')
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记下加载时的归档状态，用于区分归档和普通更新的活动记录
+        instance._loaded_is_archived = None if 'is_archived' in instance.get_deferred_fields() else instance.is_archived
+        return instance
+    
     def __str__(self):
         return f"{self.board.name} - {self.name}"
     
-    @property
-    def task_count(self):
-        """任务数量"""
-        return self.tasks.filter(is_archived=False).count()
+    def save(self, *args, **kwargs):
+        exclude_counter_fields(self, TASK_COUNTER_FIELDS, args, kwargs)
+        super().save(*args, **kwargs)
     
     @property
     def is_wip_exceeded(self):
@@ -309,7 +312,8 @@ class BoardActivity(models.Model):
     # 元数据
     metadata = models.JSONField(_('附加数据'), default=dict, blank=True)
     
-    created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
+    # 活动先缓冲后批量写入，创建时间取事件发生的时间
+    created_at = models.DateTimeField(_('创建时间'), default=timezone.now, editable=False)
     
     class Meta:
         verbose_name = _('看板活动')
@@ -317,9 +321,55 @@ class BoardActivity(models.Model):
         db_table = 'boards_activity'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['board', '-created_at']),
+            models.Index(fields=['board', '-created_at', '-id']),
             models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
         return f"{self.user.get_display_name()} {self.get_action_display()} - {self.board.name}"
+
+
+class BoardChange(models.Model):
+    """
+    看板变更日志模型
+    按自增ID顺序追加记录，供客户端增量同步使用
+    """
+    ENTITY_CHOICES = [
+        ('task', _('任务')),
+        ('list', _('列表')),
+        ('assignment', _('任务分配')),
+    ]
+    
+    ACTION_CHOICES = [
+        ('created', _('创建')),
+        ('updated', _('更新')),
+        ('deleted', _('删除')),
+    ]
+    
+    board = models.ForeignKey(
+        Board,
+        on_delete=models.CASCADE,
+        related_name='changes',
+        verbose_name=_('看板')
+    )
+    
+    entity_type = models.CharField(_('对象类型'), max_length=20, choices=ENTITY_CHOICES)
+    # 任务分配以任务ID作为对象ID，用户ID记录在 user_id 中
+    entity_id = models.PositiveBigIntegerField(_('对象ID'))
+    user_id = models.PositiveBigIntegerField(_('用户ID'), null=True, blank=True)
+    action = models.CharField(_('变更类型'), max_length=10, choices=ACTION_CHOICES)
+    
+    created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('看板变更')
+        verbose_name_plural = _('看板变更')
+        db_table = 'boards_change'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['board', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.board_id} {self.entity_type}:{self.entity_id} {self.action}"
@@ -0,0 +1,167 @@
+"""
+看板排序位置服务
+任务和列表使用带间隔的整数位置，拖拽时取相邻两项的中间值，只写入被移动的一行
+
+相邻位置之间没有可用间隔时，同步重排该列表后再计算；
+间隔过小时在事务提交后通过 Celery 后台重排，避免后续拖拽触发同步重排。
+拖拽和重排都先锁定所属列表（重排列表时锁定看板），重排期间提交的拖拽不会被覆盖。
+"""
+import logging
+
+from celery import shared_task
+from django.db import transaction
+from django.db.models import Max
+
+from .changes import record_changes
+from .snapshots import bump_board_version_on_commit
+
+logger = logging.getLogger(__name__)
+
+# 相邻两项之间的默认间隔
+POSITION_GAP = 1024
+
+# 插入后剩余间隔小于该值时安排后台重排
+MIN_GAP = 8
+
+
+def get_next_position(queryset):
+    """获取追加到末尾的位置"""
+    max_position = queryset.aggregate(Max('position'))['position__max']
+    if max_position is None:
+        return POSITION_GAP
+    return max_position + POSITION_GAP
+
+
+def _get_neighbours(queryset, index):
+    """获取插入到 index 处时前后相邻两项的位置"""
+    if index == 0:
+        following = queryset.values_list('position', flat=True).first()
+        return None, following
+
+    neighbours = list(queryset.values_list('position', flat=True)[index - 1:index + 1])
+    if not neighbours:
+        # 索引超出列表长度时追加到末尾
+        return queryset.aggregate(Max('position'))['position__max'], None
+    if len(neighbours) == 1:
+        return neighbours[0], None
+    return neighbours[0], neighbours[1]
+
+
+def _position_between(previous, following):
+    """计算两项之间的位置，没有可用间隔时返回None"""
+    if previous is None and following is None:
+        return POSITION_GAP
+    if following is None:
+        return previous + POSITION_GAP
+    lower = -1 if previous is None else previous
+    if following - lower < 2:
+        return None
+    return (lower + following) // 2
+
+
+def _needs_rebalance(previous, following):
+    if following is None:
+        return False
+    lower = 0 if previous is None else previous
+    return following - lower < MIN_GAP
+
+
+def _lock(model, pk):
+    """锁定一行直到事务结束，须在事务中调用"""
+    list(model.objects.select_for_update().filter(pk=pk).values_list('pk', flat=True))
+
+
+def rebalance_queryset(queryset):
+    """按当前顺序重新分配间隔位置，返回位置发生变化的对象ID
+
+    读取时锁定这些行，读取和写入之间其他事务不能修改它们的位置。
+    """
+    with transaction.atomic():
+        objects = list(queryset.select_for_update().only('id', 'position'))
+        changed = []
+        for index, obj in enumerate(objects, start=1):
+            position = index * POSITION_GAP
+            if obj.position != position:
+                obj.position = position
+                changed.append(obj)
+
+        if changed:
+            queryset.model.objects.bulk_update(changed, ['position'], batch_size=500)
+    return [obj.id for obj in changed]
+
+
+def rebalance_list_tasks(board_list):
+    """重排列表内的任务位置"""
+    from .models import BoardList
+
+    with transaction.atomic():
+        _lock(BoardList, board_list.pk)
+        task_ids = rebalance_queryset(board_list.tasks.all())
+    if task_ids:
+        bump_board_version_on_commit(board_list.board_id)
+        record_changes(board_list.board_id, 'task', task_ids, 'updated')
+    return len(task_ids)
+
+
+def rebalance_board_lists(board):
+    """重排看板内的列表位置"""
+    from .models import Board
+
+    with transaction.atomic():
+        _lock(Board, board.pk)
+        list_ids = rebalance_queryset(board.lists.all())
+    if list_ids:
+        bump_board_version_on_commit(board.id)
+        record_changes(board.id, 'list', list_ids, 'updated')
+    return len(list_ids)
+
+
+def _schedule_task_rebalance(board_list_id):
+    def schedule():
+        try:
+            rebalance_list_tasks_task.delay(board_list_id)
+        except Exception as e:
+            logger.warning(f"Failed to schedule position rebalance for list {board_list_id}: {e}")
+
+    transaction.on_commit(schedule)
+
+
+def place_task(task, board_list, index):
+    """将任务放到目标列表的第 index 个位置（不计任务自身）
+
+    只设置 task.board_list 和 task.position，由调用方在同一事务中保存。
+    计算位置前锁定目标列表，与后台重排互斥。
+    看板页面不显示已归档的任务，index 只按未归档的任务计算。
+    """
+    from .models import BoardList
+
+    index = max(int(index), 0)
+    _lock(BoardList, board_list.pk)
+    siblings = board_list.tasks.filter(is_archived=False).exclude(pk=task.pk)
+
+    previous, following = _get_neighbours(siblings, index)
+    position = _position_between(previous, following)
+    if position is None:
+        # 没有可用间隔，先同步重排再计算
+        record_changes(board_list.board_id, 'task', rebalance_queryset(siblings), 'updated')
+        previous, following = _get_neighbours(siblings, index)
+        position = _position_between(previous, following)
+    elif _needs_rebalance(previous, following):
+        _schedule_task_rebalance(board_list.id)
+
+    task.board_list = board_list
+    task.position = position
+    return position
+
+
+@shared_task
+def rebalance_list_tasks_task(board_list_id):
+    """后台重排列表内的任务位置"""
+    from .models import BoardList
+
+    board_list = BoardList.objects.filter(pk=board_list_id).first()
+    if board_list is None:
+        return 0
+
+    with transaction.atomic():
+        return rebalance_list_tasks(board_list)
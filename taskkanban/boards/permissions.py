@@ -0,0 +1,239 @@
+"""
+看板权限服务
+统一计算用户在看板中的有效角色，供看板、任务的访问检查使用
+
+有效角色来自看板所有者、看板成员（BoardMember）和团队成员（TeamMembership），
+一次查询即可得到多个看板的角色。结果以看板权限版本号为键写入缓存，
+成员关系或看板本身变更时递增版本号使其失效（见 boards.signals）。
+角色不保存在用户对象上，长期存在的用户对象（如 WebSocket 连接、后台任务中）
+每次检查都读取当前版本的缓存。
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+ROLE_OWNER = 'owner'
+ROLE_ADMIN = 'admin'
+ROLE_MEMBER = 'member'
+ROLE_OBSERVER = 'observer'
+# 非成员访问公开看板
+ROLE_VIEWER = 'viewer'
+
+ROLE_RANK = {
+    ROLE_VIEWER: 1,
+    ROLE_OBSERVER: 2,
+    ROLE_MEMBER: 3,
+    ROLE_ADMIN: 4,
+    ROLE_OWNER: 5,
+}
+
+# 团队角色对应的看板角色，团队管理员不因团队角色获得看板管理权限
+TEAM_ROLE_MAP = {
+    'owner': ROLE_MEMBER,
+    'admin': ROLE_MEMBER,
+    'member': ROLE_MEMBER,
+    'guest': ROLE_OBSERVER,
+}
+
+# 可管理看板、编辑任意任务的角色
+BOARD_EDIT_ROLES = (ROLE_OWNER, ROLE_ADMIN)
+
+ROLE_TIMEOUT = 60 * 60
+
+VERSION_KEY = 'boards:acl:version:{board_id}'
+ROLE_KEY = 'boards:acl:{board_id}:{version}:{user_id}'
+
+# 缓存中表示“无权限”，与缓存未命中区分
+NO_ROLE = ''
+
+
+def _initial_version():
+    return int(time.time() * 1000)
+
+
+def _get_versions(board_ids):
+    """批量获取看板权限版本号"""
+    keys = {board_id: VERSION_KEY.format(board_id=board_id) for board_id in board_ids}
+    cached = cache.get_many(keys.values())
+
+    versions = {}
+    for board_id, key in keys.items():
+        version = cached.get(key)
+        if version is None:
+            version = _initial_version()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+        versions[board_id] = version
+    return versions
+
+
+def bump_acl_version(board_id):
+    """递增看板权限版本号，使该看板所有用户的角色缓存失效"""
+    key = VERSION_KEY.format(board_id=board_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), timeout=None)
+
+
+def invalidate_board_roles(board_ids):
+    """使看板的角色缓存失效
+
+    立即失效当前缓存，并在事务提交后再次失效，
+    避免提交前的并发请求把旧角色写回缓存。
+    """
+    board_ids = [board_id for board_id in board_ids if board_id]
+    for board_id in board_ids:
+        bump_acl_version(board_id)
+
+    def bump_after_commit():
+        for board_id in board_ids:
+            bump_acl_version(board_id)
+
+    if board_ids:
+        transaction.on_commit(bump_after_commit)
+
+
+def _resolve_role(user_id, owner_id, visibility, member_role, team_role):
+    """根据成员关系计算有效角色"""
+    if owner_id == user_id:
+        return ROLE_OWNER
+
+    roles = [role for role in (member_role, TEAM_ROLE_MAP.get(team_role)) if role]
+    if roles:
+        return max(roles, key=ROLE_RANK.get)
+
+    if visibility == 'public':
+        return ROLE_VIEWER
+    return None
+
+
+def _query_roles(user, board_ids):
+    """一次查询计算多个看板的角色"""
+    from teams.models import TeamMembership
+    from .models import Board, BoardMember
+
+    member_role = BoardMember.objects.filter(
+        board=OuterRef('pk'), user=user, is_active=True
+    ).values('role')[:1]
+    team_role = TeamMembership.objects.filter(
+        team=OuterRef('team'), user=user, status='active'
+    ).values('role')[:1]
+
+    rows = Board.objects.filter(id__in=board_ids).annotate(
+        member_role=Subquery(member_role),
+        team_role=Subquery(team_role)
+    ).values_list('id', 'owner_id', 'visibility', 'member_role', 'team_role')
+
+    roles = {board_id: None for board_id in board_ids}
+    for board_id, owner_id, visibility, member, team in rows:
+        roles[board_id] = _resolve_role(user.id, owner_id, visibility, member, team)
+    return roles
+
+
+def roles_for(user, board_ids):
+    """批量获取用户在多个看板中的角色
+
+    返回 {board_id: role}，无权限时角色为 None。
+    """
+    board_ids = list(dict.fromkeys(board_ids))
+    if not user or not user.is_authenticated or not board_ids:
+        return {board_id: None for board_id in board_ids}
+
+    versions = _get_versions(board_ids)
+    keys = {
+        board_id: ROLE_KEY.format(board_id=board_id, version=versions[board_id], user_id=user.id)
+        for board_id in board_ids
+    }
+    cached = cache.get_many(keys.values())
+
+    result = {}
+    uncached = []
+    for board_id, key in keys.items():
+        if key in cached:
+            result[board_id] = cached[key] or None
+        else:
+            uncached.append(board_id)
+
+    if uncached:
+        roles = _query_roles(user, uncached)
+        result.update(roles)
+        cache.set_many(
+            {keys[board_id]: role or NO_ROLE for board_id, role in roles.items()},
+            ROLE_TIMEOUT
+        )
+
+    return {board_id: result[board_id] for board_id in board_ids}
+
+
+def get_viewable_board_ids(user, extra_board_ids=()):
+    """用户可查看的看板ID：所有者、成员和团队看板，以及 extra_board_ids 中可查看的看板（如公开看板）
+
+    候选看板由一次查询取出，是否可查看以 roles_for 的结果为准。
+    """
+    from django.db.models import Q
+    from .models import Board
+
+    if not user or not user.is_authenticated:
+        return []
+
+    candidates = set(Board.objects.filter(
+        Q(owner=user) |
+        Q(members__user=user, members__is_active=True) |
+        Q(team__memberships__user=user, team__memberships__status='active')
+    ).values_list('id', flat=True))
+    candidates.update(extra_board_ids)
+    return [board_id for board_id, role in roles_for(user, candidates).items() if role is not None]
+
+
+def get_board_role(user, board):
+    """获取用户在看板中的角色，board 可以是看板对象或ID"""
+    if board is None or not user or not user.is_authenticated:
+        return None
+    if isinstance(board, int):
+        board_id = board
+    elif board.owner_id == user.id:
+        # 已有看板对象时，所有者无需查询
+        return ROLE_OWNER
+    else:
+        board_id = board.pk
+    return roles_for(user, [board_id])[board_id]
+
+
+def can_view_board(user, board):
+    """检查用户是否有看板访问权限"""
+    return get_board_role(user, board) is not None
+
+
+def can_edit_board(user, board):
+    """检查用户是否有看板管理权限"""
+    return get_board_role(user, board) in BOARD_EDIT_ROLES
+
+
+def is_task_assignee(user, task):
+    from tasks.models import TaskAssignment
+
+    return TaskAssignment.objects.filter(task_id=task.pk, user_id=user.id).exists()
+
+
+def can_view_task(user, task):
+    """检查用户是否有任务访问权限：任务创建者、受理人或可访问看板的用户"""
+    if not user or not user.is_authenticated:
+        return False
+    if task.creator_id == user.id or can_view_board(user, task.board_id):
+        return True
+    return is_task_assignee(user, task)
+
+
+def can_edit_task(user, task, roles=BOARD_EDIT_ROLES):
+    """检查用户是否有任务编辑权限
+
+    任务创建者、受理人，以及看板角色在 roles 中的用户可以编辑任务。
+    """
+    if not user or not user.is_authenticated:
+        return False
+    if task.creator_id == user.id or get_board_role(user, task.board_id) in roles:
+        return True
+    return is_task_assignee(user, task)
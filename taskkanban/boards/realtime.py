@@ -0,0 +1,67 @@
+"""
+看板实时事件服务
+通过 Channels 通道层向订阅同一看板的 WebSocket 客户端推送精简事件
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def get_board_group_name(board_id):
+    """看板对应的通道组名"""
+    return f'board_{board_id}'
+
+
+def _send_board_event(board_id, event):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    try:
+        async_to_sync(channel_layer.group_send)(
+            get_board_group_name(board_id),
+            {'type': 'board.event', 'event': event}
+        )
+    except Exception as e:
+        # 推送失败不影响业务请求，客户端会在下次同步时获取最新数据
+        logger.warning(f"Failed to publish board event to board {board_id}: {e}")
+
+
+def publish_board_event(board_id, event_type, **data):
+    """在事务提交后推送看板事件
+
+    事件格式: {'type': event_type, 'board_id': board_id, ...data}
+    """
+    if not board_id:
+        return
+
+    event = {'type': event_type, 'board_id': board_id}
+    event.update(data)
+    transaction.on_commit(lambda: _send_board_event(board_id, event))
+
+
+def publish_card_moved(task):
+    """任务卡片移动"""
+    publish_board_event(
+        task.board_id, 'card.moved',
+        task_id=task.id, list_id=task.board_list_id, position=task.position
+    )
+
+
+def publish_card_status(task):
+    """任务状态变更"""
+    publish_board_event(task.board_id, 'card.status', task_id=task.id, status=task.status)
+
+
+def publish_card_labels(task, label_ids):
+    """任务标签变更"""
+    publish_board_event(task.board_id, 'card.labels', task_id=task.id, label_ids=sorted(label_ids))
+
+
+def publish_cards_updated(board_id, task_ids, **changes):
+    """批量操作涉及的任务，changes 为变更后的字段值"""
+    publish_board_event(board_id, 'cards.updated', task_ids=list(task_ids), changes=changes)
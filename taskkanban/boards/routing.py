@@ -0,0 +1,10 @@
+"""
+Boards应用WebSocket路由
+"""
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/boards/<slug:slug>/', consumers.BoardConsumer.as_asgi()),
+]
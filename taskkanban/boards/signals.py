@@ -0,0 +1,289 @@
+"""
+Boards应用信号处理
+看板内数据变更时递增看板快照版本号，记录增量同步所需的变更日志，
+向看板实时频道推送评论事件，在成员关系变更时使权限缓存失效，
+维护看板和列表上的任务数、成员数，并记录任务、列表、成员的活动
+"""
+from celery.signals import task_postrun
+from django.core.signals import request_finished
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+
+from tasks.models import Task, TaskAssignment, TaskComment
+from teams.models import TeamMembership
+from .models import Board, BoardList, BoardLabel, BoardMember
+from .permissions import invalidate_board_roles
+from .snapshots import bump_board_version_on_commit
+from .changes import record_change
+from .counters import (
+    TASK_COUNTER_FIELDS, apply_task_change, increment_member_count, recount_board_counters
+)
+from .realtime import publish_board_event
+from .activity import flush_activities, record_activity
+
+
+def _get_task_board_id(task_id):
+    """获取任务所属看板ID，任务已删除时返回None"""
+    return Task.objects.filter(pk=task_id).values_list('board_id', flat=True).first()
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_delete, sender=Board)
+def board_changed(sender, instance, **kwargs):
+    """看板本身变更"""
+    bump_board_version_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=BoardList)
+@receiver(post_delete, sender=BoardList)
+@receiver(post_save, sender=BoardLabel)
+@receiver(post_delete, sender=BoardLabel)
+@receiver(post_save, sender=BoardMember)
+@receiver(post_delete, sender=BoardMember)
+def board_content_changed(sender, instance, **kwargs):
+    """看板下的任务、列表、标签、成员变更"""
+    bump_board_version_on_commit(instance.board_id)
+
+
+@receiver(post_save, sender=TaskComment)
+@receiver(post_delete, sender=TaskComment)
+@receiver(post_save, sender=TaskAssignment)
+@receiver(post_delete, sender=TaskAssignment)
+def task_related_changed(sender, instance, **kwargs):
+    """任务评论、分配变更"""
+    bump_board_version_on_commit(_get_task_board_id(instance.task_id))
+
+
+@receiver(m2m_changed, sender=Task.labels.through)
+@receiver(m2m_changed, sender=Task.assignees.through)
+def task_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """任务标签、分配人通过多对多关系变更"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        bump_board_version_on_commit(instance.board_id)
+    elif pk_set:
+        # 从标签或用户一侧修改时，涉及的任务可能属于多个看板
+        board_ids = Task.objects.filter(pk__in=pk_set).values_list('board_id', flat=True).distinct()
+        for board_id in board_ids:
+            bump_board_version_on_commit(board_id)
+    elif isinstance(instance, BoardLabel):
+        bump_board_version_on_commit(instance.board_id)
+
+
+@receiver(pre_save, sender=Task)
+def task_state_before_save(sender, instance, **kwargs):
+    """记下加载时的看板、列表、状态和归档状态，计数处理器会在 post_save 中更新 _counted_state"""
+    instance._loaded_state = getattr(instance, '_counted_state', None)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=BoardList)
+def log_saved(sender, instance, created, **kwargs):
+    """记录任务、列表的创建和更新，任务移到其他看板时对原看板记录删除"""
+    entity_type = 'task' if sender is Task else 'list'
+    record_change(instance.board_id, entity_type, instance.pk, 'created' if created else 'updated')
+
+    loaded_state = None if created or sender is not Task else getattr(instance, '_loaded_state', None)
+    if loaded_state and loaded_state[0] != instance.board_id:
+        record_change(loaded_state[0], 'task', instance.pk, 'deleted')
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=BoardList)
+def log_deleted(sender, instance, **kwargs):
+    """记录任务、列表的删除"""
+    entity_type = 'task' if sender is Task else 'list'
+    record_change(instance.board_id, entity_type, instance.pk, 'deleted')
+
+
+@receiver(post_save, sender=TaskAssignment)
+def log_assignment_saved(sender, instance, created, **kwargs):
+    """记录通过 TaskAssignment 直接创建的分配关系"""
+    record_change(
+        _get_task_board_id(instance.task_id), 'assignment', instance.task_id,
+        'created' if created else 'updated', user_id=instance.user_id
+    )
+
+
+@receiver(post_delete, sender=TaskAssignment)
+def log_assignment_deleted(sender, instance, **kwargs):
+    """记录通过 TaskAssignment 直接删除的分配关系"""
+    record_change(
+        _get_task_board_id(instance.task_id), 'assignment', instance.task_id,
+        'deleted', user_id=instance.user_id
+    )
+
+
+@receiver(m2m_changed, sender=Task.assignees.through)
+def log_assignees_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """记录通过 task.assignees 增删的分配关系"""
+    if reverse:
+        # 从用户一侧修改时 instance 为用户，pk_set 为任务ID
+        if action not in ('post_add', 'post_remove') or not pk_set:
+            return
+        tasks = Task.objects.filter(pk__in=pk_set).values_list('id', 'board_id')
+        change_action = 'created' if action == 'post_add' else 'deleted'
+        for task_id, board_id in tasks:
+            record_change(board_id, 'assignment', task_id, change_action, user_id=instance.pk)
+        return
+
+    if action == 'pre_clear':
+        # clear() 的 post_clear 信号不带 pk_set，先记下被清除的用户
+        instance._cleared_assignee_ids = list(
+            TaskAssignment.objects.filter(task=instance).values_list('user_id', flat=True)
+        )
+        return
+
+    if action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_assignee_ids', [])
+        change_action = 'deleted'
+    elif action in ('post_add', 'post_remove'):
+        user_ids = pk_set or []
+        change_action = 'created' if action == 'post_add' else 'deleted'
+    else:
+        return
+
+    for user_id in user_ids:
+        record_change(instance.board_id, 'assignment', instance.pk, change_action, user_id=user_id)
+
+
+@receiver(post_save, sender=TaskComment)
+def publish_comment_added(sender, instance, created, **kwargs):
+    """新评论推送到看板实时频道"""
+    if created:
+        publish_board_event(
+            instance.task.board_id, 'card.comment',
+            task_id=instance.task_id, comment_id=instance.id, user_id=instance.user_id
+        )
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_delete, sender=Board)
+def board_acl_changed(sender, instance, **kwargs):
+    """看板所有者、团队、可见性可能变化"""
+    invalidate_board_roles([instance.pk])
+
+
+@receiver(post_save, sender=BoardMember)
+@receiver(post_delete, sender=BoardMember)
+def board_member_acl_changed(sender, instance, **kwargs):
+    """看板成员变更"""
+    invalidate_board_roles([instance.board_id])
+
+
+@receiver(post_save, sender=TeamMembership)
+@receiver(post_delete, sender=TeamMembership)
+def team_member_acl_changed(sender, instance, **kwargs):
+    """团队成员变更影响团队下的所有看板"""
+    invalidate_board_roles(list(
+        Board.objects.filter(team_id=instance.team_id).values_list('id', flat=True)
+    ))
+
+
+@receiver(post_save, sender=Task)
+def task_counters_saved(sender, instance, created, **kwargs):
+    """任务新建、移动、状态或归档变化时增减看板和列表计数"""
+    new_state = instance.get_counted_state()
+    old_state = None if created else getattr(instance, '_counted_state', None)
+
+    if not created and old_state is None:
+        # 未记录加载时的状态（如只加载了部分字段），重新统计所在看板
+        recount_board_counters([instance.board_id], fields=TASK_COUNTER_FIELDS)
+    elif old_state != new_state:
+        apply_task_change(old_state, new_state)
+    instance._counted_state = new_state
+
+
+@receiver(post_delete, sender=Task)
+def task_counters_deleted(sender, instance, **kwargs):
+    """删除任务"""
+    old_state = getattr(instance, '_counted_state', None) or instance.get_counted_state()
+    if old_state is not None:
+        apply_task_change(old_state, None)
+
+
+@receiver(post_save, sender=BoardMember)
+def member_counter_saved(sender, instance, created, **kwargs):
+    """新增或更新看板成员"""
+    if created:
+        if instance.is_active:
+            increment_member_count(instance.board_id)
+    else:
+        # 活跃状态可能变化，重新统计
+        recount_board_counters([instance.board_id], fields=('member_count',))
+
+
+@receiver(post_delete, sender=BoardMember)
+def member_counter_deleted(sender, instance, **kwargs):
+    """删除看板成员"""
+    if instance.is_active:
+        increment_member_count(instance.board_id, -1)
+
+
+@receiver(post_save, sender=Task)
+def task_activity(sender, instance, created, **kwargs):
+    """记录任务的创建、移动、归档和更新"""
+    old_state = None if created else getattr(instance, '_loaded_state', None)
+    old = dict(zip(Task.COUNTED_FIELDS, old_state)) if old_state else None
+
+    metadata = {}
+    if created:
+        action, description = 'create_task', f'创建了任务「{instance.title}」'
+    elif old and instance.is_archived and not old['is_archived']:
+        action, description = 'archive_task', f'归档了任务「{instance.title}」'
+    elif old and instance.board_list_id != old['board_list_id']:
+        action, description = 'move_task', f'移动了任务「{instance.title}」'
+        metadata = {'from_list_id': old['board_list_id'], 'to_list_id': instance.board_list_id}
+    else:
+        action, description = 'update_task', f'更新了任务「{instance.title}」'
+        if old and instance.status != old['status']:
+            metadata = {'from_status': old['status'], 'to_status': instance.status}
+
+    record_activity(
+        instance.board_id, action, description, target_type='task', target_id=instance.pk,
+        user_id=instance.creator_id, metadata=metadata
+    )
+
+
+@receiver(post_save, sender=BoardList)
+def list_activity(sender, instance, created, **kwargs):
+    """记录列表的创建、归档和更新"""
+    if created:
+        action, description = 'create_list', f'创建了列表「{instance.name}」'
+    elif instance.is_archived and getattr(instance, '_loaded_is_archived', None) is False:
+        action, description = 'archive_list', f'归档了列表「{instance.name}」'
+    else:
+        action, description = 'update_list', f'更新了列表「{instance.name}」'
+    instance._loaded_is_archived = instance.is_archived
+    record_activity(instance.board_id, action, description, target_type='list', target_id=instance.pk)
+
+
+@receiver(post_save, sender=BoardMember)
+def member_added_activity(sender, instance, created, **kwargs):
+    """记录新增成员"""
+    if created:
+        record_activity(
+            instance.board_id, 'add_member', f'添加了成员 {instance.user.get_display_name()}',
+            target_type='user', target_id=instance.user_id, user_id=instance.invited_by_id,
+            metadata={'role': instance.role}
+        )
+
+
+@receiver(post_delete, sender=BoardMember)
+def member_removed_activity(sender, instance, **kwargs):
+    """记录移除成员，看板删除时的级联删除由写入时忽略"""
+    record_activity(
+        instance.board_id, 'remove_member', f'移除了成员 {instance.user.get_display_name()}',
+        target_type='user', target_id=instance.user_id
+    )
+
+
+@receiver(request_finished)
+@receiver(task_postrun)
+def flush_activity_buffer(sender=None, **kwargs):
+    """请求或 Celery 任务结束后写入缓冲的活动"""
+    flush_activities()
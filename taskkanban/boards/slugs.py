@@ -0,0 +1,79 @@
+"""
+看板URL标识分配
+由名称生成基础 slug，一次前缀查询找出已用的最大数字后缀后取下一个；
+并发创建撞到唯一约束时重新分配并重试
+
+中文等非 ASCII 名称先经音译：settings.SLUG_TRANSLITERATOR 指定的函数（点分路径，
+接收名称返回字符串），未设置时若安装了 pypinyin 则转换为拼音，都无法生成时使用随机标识。
+"""
+import re
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.module_loading import import_string
+from django.utils.text import slugify
+
+try:
+    from pypinyin import lazy_pinyin
+    PYPINYIN_AVAILABLE = True
+except ImportError:
+    PYPINYIN_AVAILABLE = False
+
+# 为 -数字 后缀预留的长度
+SUFFIX_RESERVE = 8
+
+# 唯一约束冲突时的重试次数
+MAX_ATTEMPTS = 5
+
+
+def transliterate(name):
+    """将名称转换为可 slugify 的文本"""
+    transliterator = getattr(settings, 'SLUG_TRANSLITERATOR', None)
+    if transliterator:
+        return import_string(transliterator)(name)
+    if PYPINYIN_AVAILABLE:
+        return ' '.join(lazy_pinyin(name))
+    return name
+
+
+def get_base_slug(name, max_length):
+    """由名称生成基础 slug"""
+    base_slug = slugify(transliterate(name or ''))[:max_length - SUFFIX_RESERVE].strip('-')
+    return base_slug or uuid.uuid4().hex[:8]
+
+
+def next_free_slug(queryset, base_slug):
+    """一次查询找出 base_slug 及 base_slug-数字 中已用的最大后缀，返回下一个可用 slug"""
+    pattern = re.compile(rf'^{re.escape(base_slug)}(?:-(\d+))?$')
+    used = None
+    for slug in queryset.filter(slug__startswith=base_slug).values_list('slug', flat=True):
+        match = pattern.match(slug)
+        if match:
+            suffix = int(match.group(1) or 0)
+            used = suffix if used is None else max(used, suffix)
+
+    if used is None:
+        return base_slug
+    return f'{base_slug}-{used + 1}'
+
+
+def save_with_unique_slug(instance, save, *args, **kwargs):
+    """为 instance 分配 slug 并调用 save 保存，撞到唯一约束时重新分配
+
+    save 为模型父类的保存方法，保存放在保存点中，失败不影响外层事务。
+    """
+    model = type(instance)
+    max_length = model._meta.get_field('slug').max_length
+    base_slug = get_base_slug(instance.name, max_length)
+    queryset = model._default_manager.exclude(pk=instance.pk) if instance.pk else model._default_manager.all()
+
+    for attempt in range(MAX_ATTEMPTS):
+        instance.slug = next_free_slug(queryset, base_slug)
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            if attempt == MAX_ATTEMPTS - 1 or not queryset.filter(slug=instance.slug).exists():
+                # 重试次数用尽，或不是 slug 冲突
+                raise
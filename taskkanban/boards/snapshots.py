@@ -0,0 +1,191 @@
+"""
+看板快照服务
+按看板版本号缓存序列化后的看板数据，供看板数据API使用
+
+每个看板维护一个版本号，看板内的任务、列表、标签、成员、评论发生变更时
+由信号递增版本号（见 boards.signals）。快照以 (board_id, version) 为键缓存，
+因此看板只在下一次编辑前保持有效，不会出现固定时长的过期数据。
+"""
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.urls import reverse
+
+from .changes import get_latest_cursor
+
+# 快照缓存时间，版本号变化后旧快照自然失效，这里只用于回收内存
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+VERSION_KEY = 'boards:snapshot:version:{board_id}'
+SNAPSHOT_KEY = 'boards:snapshot:{board_id}:{version}'
+
+
+def _initial_version():
+    """生成初始版本号
+
+    使用毫秒时间戳作为初始值，版本号被缓存淘汰后重新初始化时，
+    不会与旧快照的版本号重复。
+    """
+    return int(time.time() * 1000)
+
+
+def get_board_version(board_id):
+    """获取看板当前版本号"""
+    key = VERSION_KEY.format(board_id=board_id)
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_board_version(board_id):
+    """递增看板版本号，使已缓存的快照失效"""
+    key = VERSION_KEY.format(board_id=board_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def bump_board_version_on_commit(board_id):
+    """在事务提交后递增看板版本号
+
+    如果在提交前递增，并发读取可能在新版本号下缓存到未提交前的数据。
+    """
+    if board_id:
+        transaction.on_commit(lambda: bump_board_version(board_id))
+
+
+def get_board_etag(board_id, version):
+    """根据看板版本号生成ETag"""
+    return f'"board-{board_id}-{version}"'
+
+
+def get_task_queryset():
+    """看板数据使用的任务查询集，评论数量直接读取任务上的计数字段"""
+    from tasks.models import Task
+
+    return Task.objects.select_related(
+        'creator', 'board_list'
+    ).prefetch_related(
+        'assignees', 'labels'
+    )
+
+
+def serialize_task(task):
+    """序列化单个任务，task 需来自 get_task_queryset()"""
+    return {
+        'id': task.id,
+        'title': task.title,
+        'description': task.description,
+        'status': task.status,
+        'priority': task.get_priority_display(),
+        'priority_value': task.priority,
+        'due_date': task.due_date.isoformat() if task.due_date else None,
+        'created_at': task.created_at.isoformat(),
+        'updated_at': task.updated_at.isoformat(),
+        'position': task.position,
+        'list_id': task.board_list.id if task.board_list else None,
+        'list_name': task.board_list.name if task.board_list else None,
+        'creator': {
+            'id': task.creator.id,
+            'name': task.creator.get_display_name(),
+            'avatar': task.creator.avatar.url if task.creator.avatar else None
+        },
+        'assignees': [
+            {
+                'id': assignee.id,
+                'name': assignee.get_display_name(),
+                'avatar': assignee.avatar.url if assignee.avatar else None
+            }
+            for assignee in task.assignees.all()
+        ],
+        'labels': [
+            {
+                'id': label.id,
+                'name': label.name,
+                'color': label.color
+            }
+            for label in task.labels.all()
+        ],
+        'comments_count': task.comment_count,
+        'url': reverse('tasks:detail', kwargs={'pk': task.id})
+    }
+
+
+def build_board_payload(board):
+    """构建看板完整数据"""
+    # 先读取变更游标，之后发生的变更客户端可通过增量接口获取
+    cursor = get_latest_cursor(board.id)
+
+    # 获取看板所有列表
+    lists = list(board.lists.all().order_by('position').values(
+        'id', 'name', 'position'
+    ))
+
+    # 获取所有任务，包含相关数据
+    tasks_queryset = get_task_queryset().filter(
+        board=board
+    ).order_by('board_list__position', 'position')
+    tasks = [serialize_task(task) for task in tasks_queryset]
+
+    # 计算统计数据
+    total_tasks = len(tasks)
+    completed_tasks = len([t for t in tasks if t['status'] == 'done'])
+    in_progress_tasks = len([t for t in tasks if t['status'] == 'in_progress'])
+    todo_tasks = len([t for t in tasks if t['status'] == 'todo'])
+
+    return {
+        'board': {
+            'id': board.id,
+            'name': board.name,
+            'slug': board.slug,
+            'description': board.description,
+            'background_color': board.background_color,
+            'created_at': board.created_at.isoformat()
+        },
+        'cursor': cursor,
+        'lists': lists,
+        'tasks': tasks,
+        'stats': {
+            'total_tasks': total_tasks,
+            'completed_tasks': completed_tasks,
+            'in_progress_tasks': in_progress_tasks,
+            'todo_tasks': todo_tasks,
+            'completion_rate': round((completed_tasks / total_tasks * 100) if total_tasks > 0 else 0, 1)
+        },
+        'members': [
+            {
+                'id': member.user.id,
+                'name': member.user.get_display_name(),
+                'avatar': member.user.avatar.url if member.user.avatar else None,
+                'role': member.role
+            }
+            for member in board.members.select_related('user').all()
+        ]
+    }
+
+
+def get_board_snapshot(board):
+    """获取看板快照
+
+    返回 (version, content)，content 为序列化后的JSON字节串。
+    缓存未命中时重新构建并写入缓存。
+    """
+    version = get_board_version(board.id)
+    key = SNAPSHOT_KEY.format(board_id=board.id, version=version)
+
+    content = cache.get(key)
+    if content is None:
+        payload = build_board_payload(board)
+        content = json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8')
+        cache.set(key, content, SNAPSHOT_TIMEOUT)
+
+    return version, content
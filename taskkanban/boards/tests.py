@@ -1,12 +1,20 @@
 """
 看板应用测试
 """
-from django.test import TestCase, Client
+import re
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from .models import Board, BoardList, BoardMember
+from .models import Board, BoardLabel, BoardList, BoardMember
+from .permissions import roles_for, get_board_role, can_view_board, can_edit_board
+from .realtime import publish_card_status
+from .routing import websocket_urlpatterns
 from .forms import BoardCreateForm, BoardUpdateForm, BoardSearchForm
 from teams.models import Team, TeamMembership
 from tasks.models import Task
@@ -14,6 +22,11 @@ from tasks.models import Task
 User = get_user_model()
 
 
+def fake_pinyin(name):
+    """测试用音译函数"""
+    return {'产品路线图': 'chan pin lu xian tu'}.get(name, name)
+
+
 class BoardModelTest(TestCase):
     """看板模型测试"""
     
@@ -46,6 +59,37 @@ class BoardModelTest(TestCase):
             owner=self.user
         )
         self.assertEqual(str(board), '测试看板')
+    
+    def test_board_slug_suffix_single_query(self):
+        """测试重名看板按最大后缀分配slug，只查询一次"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        for _ in range(3):
+            Board.objects.create(name='Sprint', owner=self.user)
+        Board.objects.create(name='Sprint Planning', owner=self.user)
+        Board.objects.filter(slug='sprint-1').delete()
+        
+        with CaptureQueriesContext(connection) as queries:
+            board = Board.objects.create(name='Sprint', owner=self.user)
+        self.assertEqual(board.slug, 'sprint-3')
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('SELECT')]), 1)
+    
+    def test_board_slug_retries_on_conflict(self):
+        """测试并发分配到相同slug时重新分配"""
+        from unittest import mock
+        
+        Board.objects.create(name='Sprint', owner=self.user)
+        # 模拟另一个请求在查询后抢先占用了 sprint-1
+        with mock.patch('boards.slugs.next_free_slug', side_effect=['sprint', 'sprint-1']):
+            board = Board.objects.create(name='Sprint', owner=self.user)
+        self.assertEqual(board.slug, 'sprint-1')
+    
+    @override_settings(SLUG_TRANSLITERATOR='boards.tests.fake_pinyin')
+    def test_board_slug_transliterator(self):
+        """测试中文名称使用音译函数生成slug"""
+        board = Board.objects.create(name='产品路线图', owner=self.user)
+        self.assertEqual(board.slug, 'chan-pin-lu-xian-tu')
 
 
 class BoardViewTest(TestCase):
@@ -319,3 +363,691 @@ class BoardIntegrationTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '项目看板')
         self.assertContains(response, '待办事项')
+
+
+class BoardDataSnapshotTest(TestCase):
+    """看板数据快照测试"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(
+            name='测试看板',
+            owner=self.user,
+            slug='snapshot-board'
+        )
+        self.board_list = BoardList.objects.create(
+            name='待办',
+            board=self.board,
+            position=1
+        )
+        self.url = reverse('boards:board_data_api', kwargs={'slug': self.board.slug})
+        self.client.login(username='testuser', password='testpass123')
+    
+    def test_snapshot_served_from_cache(self):
+        """测试快照命中缓存时不再查询任务"""
+        Task.objects.create(
+            title='任务1',
+            board=self.board,
+            board_list=self.board_list,
+            creator=self.user
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stats']['total_tasks'], 1)
+        
+        with self.assertNumQueries(4):  # 仅会话、用户和看板查询
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()['stats']['total_tasks'], 1)
+    
+    def test_snapshot_invalidated_on_task_change(self):
+        """测试任务变更后快照失效"""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(response.json()['stats']['total_tasks'], 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(
+                title='新任务',
+                board=self.board,
+                board_list=self.board_list,
+                creator=self.user
+            )
+        
+        response = self.client.get(self.url)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['stats']['total_tasks'], 1)
+    
+    def test_if_none_match_returns_not_modified(self):
+        """测试ETag条件请求"""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+
+class BoardChangesAPITest(TestCase):
+    """看板增量同步API测试"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(
+            name='测试看板',
+            owner=self.user,
+            slug='changes-board'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.board_list = BoardList.objects.create(
+                name='待办',
+                board=self.board,
+                position=1
+            )
+            self.task = Task.objects.create(
+                title='任务1',
+                board=self.board,
+                board_list=self.board_list,
+                creator=self.user
+            )
+        self.url = reverse('boards:board_changes_api', kwargs={'slug': self.board.slug})
+        self.client.login(username='testuser', password='testpass123')
+    
+    def test_changes_since_cursor(self):
+        """测试只返回游标之后的变更"""
+        cursor = self.client.get(self.url).json()['cursor']
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.title = '任务1-已修改'
+            self.task.save()
+            self.task.assignees.add(self.user)
+            new_task = Task.objects.create(
+                title='任务2',
+                board=self.board,
+                board_list=self.board_list,
+                creator=self.user
+            )
+        
+        data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertGreater(data['cursor'], cursor)
+        self.assertEqual([t['id'] for t in data['tasks']['created']], [new_task.id])
+        self.assertEqual([t['title'] for t in data['tasks']['updated']], ['任务1-已修改'])
+        self.assertEqual(data['assignments']['created'], [{'task_id': self.task.id, 'user_id': self.user.id}])
+        self.assertEqual(data['lists']['updated'], [])
+        
+        # 再次使用新游标时没有变更
+        data = self.client.get(self.url, {'since': data['cursor']}).json()
+        self.assertEqual(data['tasks']['updated'], [])
+    
+    def test_deleted_task_reported(self):
+        """测试删除的任务"""
+        cursor = self.client.get(self.url).json()['cursor']
+        task_id = self.task.id
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.delete()
+        
+        data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertEqual(data['tasks']['deleted'], [task_id])
+    
+    def test_invalid_cursor(self):
+        """测试无效游标"""
+        response = self.client.get(self.url, {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_task_moved_to_other_board(self):
+        """测试任务移到其他看板时，原看板收到删除"""
+        cursor = self.client.get(self.url).json()['cursor']
+        other_board = Board.objects.create(name='其他看板', owner=self.user, slug='other-board')
+        other_list = BoardList.objects.create(name='待办', board=other_board, position=1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.get(pk=self.task.pk)
+            task.board = other_board
+            task.board_list = other_list
+            task.save()
+        
+        data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertEqual(data['tasks']['deleted'], [self.task.id])
+        self.assertEqual(data['tasks']['updated'], [])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class BoardConsumerTest(TransactionTestCase):
+    """看板实时频道测试"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(
+            name='测试看板',
+            owner=self.user,
+            slug='realtime-board'
+        )
+        self.board_list = BoardList.objects.create(
+            name='待办',
+            board=self.board,
+            position=1
+        )
+        self.task = Task.objects.create(
+            title='任务1',
+            board=self.board,
+            board_list=self.board_list,
+            creator=self.user
+        )
+    
+    def get_communicator(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/boards/{self.board.slug}/'
+        )
+        communicator.scope['user'] = user
+        return communicator
+    
+    async def test_board_member_receives_events(self):
+        """测试看板成员收到卡片事件"""
+        communicator = self.get_communicator(self.user)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        
+        self.task.status = 'done'
+        await sync_to_async(publish_card_status)(self.task)
+        
+        event = await communicator.receive_json_from()
+        self.assertEqual(event, {
+            'type': 'card.status',
+            'board_id': self.board.id,
+            'task_id': self.task.id,
+            'status': 'done',
+        })
+        await communicator.disconnect()
+    
+    async def test_no_access_rejected(self):
+        """测试无权限用户无法订阅私有看板"""
+        communicator = self.get_communicator(self.other_user)
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+
+class BoardPermissionTest(TestCase):
+    """看板权限服务测试"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.team = Team.objects.create(name='测试团队', created_by=self.owner)
+        self.private_board = Board.objects.create(name='私有看板', owner=self.owner)
+        self.team_board = Board.objects.create(name='团队看板', owner=self.owner, team=self.team)
+        self.public_board = Board.objects.create(name='公开看板', owner=self.owner, visibility='public')
+        self.board_ids = [self.private_board.id, self.team_board.id, self.public_board.id]
+    
+    def fresh_user(self):
+        """模拟新请求中的用户对象"""
+        return User.objects.get(pk=self.user.pk)
+    
+    def test_effective_roles(self):
+        """测试从所有者、看板成员、团队成员计算角色"""
+        BoardMember.objects.create(board=self.private_board, user=self.user, role='observer')
+        TeamMembership.objects.create(team=self.team, user=self.user, role='admin', status='active')
+        
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            roles = roles_for(user, self.board_ids)
+        
+        self.assertEqual(roles, {
+            self.private_board.id: 'observer',
+            self.team_board.id: 'member',
+            self.public_board.id: 'viewer',
+        })
+        self.assertEqual(get_board_role(self.owner, self.private_board), 'owner')
+    
+    def test_team_admin_cannot_manage_board(self):
+        """测试团队管理员只能查看团队看板，不能管理看板"""
+        TeamMembership.objects.create(team=self.team, user=self.user, role='admin', status='active')
+        
+        self.assertTrue(can_view_board(self.fresh_user(), self.team_board))
+        self.assertFalse(can_edit_board(self.fresh_user(), self.team_board))
+        
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('boards:edit', kwargs={'slug': self.team_board.slug}))
+        self.assertEqual(response.status_code, 403)
+    
+    def test_long_lived_user_sees_invalidated_roles(self):
+        """测试同一个用户对象在成员关系变更后读取到新角色"""
+        user = self.fresh_user()
+        self.assertIsNone(get_board_role(user, self.private_board.id))
+        
+        member = BoardMember.objects.create(board=self.private_board, user=self.user, role='admin')
+        self.assertEqual(get_board_role(user, self.private_board.id), 'admin')
+        
+        member.delete()
+        self.assertIsNone(get_board_role(user, self.private_board.id))
+    
+    def test_inactive_memberships_ignored(self):
+        """测试未激活的成员关系不授予权限"""
+        BoardMember.objects.create(board=self.private_board, user=self.user, is_active=False)
+        TeamMembership.objects.create(team=self.team, user=self.user, status='pending')
+        
+        roles = roles_for(self.fresh_user(), self.board_ids[:2])
+        self.assertEqual(roles, {self.private_board.id: None, self.team_board.id: None})
+    
+    def test_cached_and_invalidated(self):
+        """测试角色跨请求缓存，并在成员关系变更后失效"""
+        user = self.fresh_user()
+        roles_for(user, self.board_ids)
+        other_request_user = self.fresh_user()
+        with self.assertNumQueries(0):
+            roles_for(user, self.board_ids)
+            roles_for(other_request_user, self.board_ids)
+        
+        member = BoardMember.objects.create(board=self.private_board, user=self.user, role='member')
+        self.assertEqual(get_board_role(self.fresh_user(), self.private_board.id), 'member')
+        
+        TeamMembership.objects.create(team=self.team, user=self.user, role='member', status='active')
+        self.assertEqual(get_board_role(self.fresh_user(), self.team_board.id), 'member')
+        
+        member.delete()
+        self.assertIsNone(get_board_role(self.fresh_user(), self.private_board.id))
+
+
+
+class BoardCounterTest(TestCase):
+    """看板计数字段测试"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.member = User.objects.create_user(
+            username='member',
+            email='member@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user, slug='counter-board')
+        self.todo = BoardList.objects.create(board=self.board, name='待办', position=1024)
+        self.done = BoardList.objects.create(board=self.board, name='完成', position=2048)
+    
+    def create_task(self, **kwargs):
+        kwargs.setdefault('board_list', self.todo)
+        return Task.objects.create(title='任务', board=self.board, creator=self.user, **kwargs)
+    
+    def get_counts(self, obj):
+        obj.refresh_from_db()
+        return obj.task_count, obj.open_task_count, obj.done_task_count
+    
+    def test_task_writes_update_counters(self):
+        """测试任务新建、移动、完成、归档、删除时计数同步更新"""
+        task = self.create_task()
+        other = self.create_task(status='done')
+        self.assertEqual(self.get_counts(self.board), (2, 1, 1))
+        self.assertEqual(self.get_counts(self.todo), (2, 1, 1))
+        
+        task = Task.objects.get(pk=task.pk)
+        task.board_list = self.done
+        task.status = 'done'
+        task.save()
+        self.assertEqual(self.get_counts(self.board), (2, 0, 2))
+        self.assertEqual(self.get_counts(self.todo), (1, 0, 1))
+        self.assertEqual(self.get_counts(self.done), (1, 0, 1))
+        
+        other.is_archived = True
+        other.save()
+        task.delete()
+        self.assertEqual(self.get_counts(self.board), (0, 0, 0))
+        self.assertEqual(self.get_counts(self.done), (0, 0, 0))
+    
+    def test_stale_instances_do_not_double_count(self):
+        """测试两个请求加载同一任务后都改为完成，计数只变化一次"""
+        self.create_task()
+        task = self.create_task()
+        first = Task.objects.get(pk=task.pk)
+        second = Task.objects.get(pk=task.pk)
+        
+        for instance in (first, second):
+            instance.status = 'done'
+            instance.save()
+        self.assertEqual(self.get_counts(self.board), (2, 1, 1))
+        self.assertEqual(self.get_counts(self.todo), (2, 1, 1))
+    
+    def test_member_count(self):
+        """测试成员数只统计活跃成员"""
+        membership = BoardMember.objects.create(board=self.board, user=self.member)
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.member_count, 1)
+        
+        membership.is_active = False
+        membership.save()
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.member_count, 0)
+    
+    def test_batch_update_and_stale_board_save(self):
+        """测试批量操作重新统计，保存过期的看板对象不覆盖计数"""
+        from tasks.services import TaskBatchService
+        
+        tasks = [self.create_task() for _ in range(3)]
+        board = Board.objects.get(pk=self.board.pk)
+        
+        service = TaskBatchService(self.user, [task.id for task in tasks])
+        service.change_status('done')
+        service.move_to_list(self.done)
+        
+        board.name = '新名称'
+        board.save()
+        self.assertEqual(self.get_counts(self.board), (3, 0, 3))
+        self.assertEqual(self.get_counts(self.todo), (0, 0, 0))
+        self.assertEqual(self.get_counts(self.done), (3, 0, 3))
+
+
+class BoardCloneTest(TestCase):
+    """看板复制测试"""
+    
+    def setUp(self):
+        from tasks.models import SubTask, TaskDependency
+        
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.member = User.objects.create_user(
+            username='member',
+            email='member@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(name='模板看板', owner=self.user, slug='template-board')
+        BoardMember.objects.create(board=self.board, user=self.member)
+        self.label = BoardLabel.objects.create(board=self.board, name='缺陷', color='#ff0000')
+        todo = BoardList.objects.create(board=self.board, name='待办', position=1024)
+        BoardList.objects.create(board=self.board, name='完成', position=2048, is_done_list=True)
+        
+        first = Task.objects.create(
+            title='设计', board=self.board, board_list=todo, creator=self.user, status='done'
+        )
+        second = Task.objects.create(title='开发', board=self.board, board_list=todo, creator=self.user)
+        first.labels.add(self.label)
+        first.assignees.add(self.member)
+        SubTask.objects.create(parent_task=first, title='原型')
+        TaskDependency.objects.create(from_task=second, to_task=first, created_by=self.user)
+    
+    def post_copy(self, **data):
+        self.client.login(username='owner', password='testpass123')
+        data.setdefault('name', '复制的看板')
+        for option in ('copy_lists', 'copy_tasks', 'copy_labels', 'copy_members'):
+            data.setdefault(option, 'on')
+        return self.client.post(reverse('boards:copy', kwargs={'slug': self.board.slug}), data)
+    
+    def test_copy_board_contents(self):
+        """测试复制列表、任务、标签、受理人、子任务和依赖，并维护计数"""
+        response = self.post_copy()
+        self.assertEqual(response.status_code, 302)
+        
+        new_board = Board.objects.get(name='复制的看板')
+        self.assertEqual(list(new_board.lists.values_list('name', flat=True)), ['待办', '完成'])
+        self.assertEqual(new_board.task_count, 2)
+        self.assertEqual(new_board.open_task_count, 2)
+        self.assertEqual(new_board.member_count, 1)
+        
+        design = new_board.tasks.get(title='设计')
+        self.assertEqual(design.status, 'todo')
+        self.assertEqual(list(design.labels.values_list('board', flat=True)), [new_board.id])
+        self.assertEqual(list(design.assignees.all()), [self.member])
+        self.assertEqual((design.assignee_count, design.subtask_count), (1, 1))
+        self.assertTrue(design.dependencies_to.filter(from_task__board=new_board).exists())
+        self.assertEqual(self.board.tasks.count(), 2)
+    
+    def test_copy_query_count_independent_of_tasks(self):
+        """测试复制的查询次数与任务数量无关"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .cloning import clone_board
+        
+        def count_clone_queries():
+            target = Board.objects.create(name='目标看板', owner=self.user)
+            with CaptureQueriesContext(connection) as queries:
+                clone_board(self.board, target, self.user, copy_members=True)
+            target.delete()
+            return len(queries)
+        
+        before = count_clone_queries()
+        todo = self.board.lists.get(name='待办')
+        for i in range(20):
+            task = Task.objects.create(title=f'任务{i}', board=self.board, board_list=todo, creator=self.user)
+            task.labels.add(self.label)
+        self.assertEqual(count_clone_queries(), before)
+    
+    def test_large_board_copied_in_background(self):
+        """测试任务较多时在后台复制并记录进度"""
+        from unittest import mock
+        from .cloning import STATUS_DONE, get_clone_progress
+        
+        with mock.patch('boards.cloning.SYNC_CLONE_LIMIT', 1), self.captureOnCommitCallbacks(execute=True):
+            response = self.post_copy()
+        
+        new_board = Board.objects.get(name='复制的看板')
+        self.assertRedirects(response, reverse('boards:detail', kwargs={'slug': new_board.slug}), fetch_redirect_response=False)
+        self.assertEqual(new_board.tasks.count(), 2)
+        self.assertEqual(get_clone_progress(new_board.id)['status'], STATUS_DONE)
+        
+        response = self.client.get(reverse('boards:copy_progress', kwargs={'slug': new_board.slug}))
+        self.assertEqual(response.json()['progress']['done'], 2)
+
+
+class BoardCardWindowTest(TestCase):
+    """看板卡片分窗加载测试"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(name='大看板', owner=self.user, slug='large-board')
+        self.todo = BoardList.objects.create(board=self.board, name='待办', position=1)
+        self.done = BoardList.objects.create(board=self.board, name='完成', position=2)
+        self.tasks = [
+            Task.objects.create(
+                title=f'任务{i}', board=self.board, board_list=self.todo, creator=self.user, position=i // 2
+            )
+            for i in range(5)
+        ]
+        Task.objects.create(title='已归档', board=self.board, board_list=self.todo, creator=self.user, is_archived=True)
+        Task.objects.create(title='已完成', board=self.board, board_list=self.done, creator=self.user)
+        self.client.login(username='testuser', password='testpass123')
+    
+    def test_detail_renders_first_window(self):
+        """测试详情页每个列表只渲染首屏卡片"""
+        from unittest import mock
+        
+        with mock.patch('boards.windowing.CARD_WINDOW_SIZE', 2):
+            response = self.client.get(reverse('boards:detail', kwargs={'slug': self.board.slug}))
+        
+        todo, done = response.context['board_lists']
+        self.assertEqual(todo.cards, self.tasks[:2])
+        self.assertTrue(todo.has_more_cards)
+        self.assertEqual([task.title for task in done.cards], ['已完成'])
+        self.assertFalse(done.has_more_cards)
+        self.assertNotContains(response, '任务2')
+        self.assertContains(response, reverse('boards:list_cards_api', args=[self.board.slug, self.todo.id]))
+    
+    def test_cards_paginated_by_position(self):
+        """测试按位置和ID分页加载后续卡片，位置相同的卡片不重复也不遗漏"""
+        url = reverse('boards:list_cards_api', args=[self.board.slug, self.todo.id])
+        
+        seen = []
+        params = {'size': 2}
+        while True:
+            data = self.client.get(url, params).json()
+            seen += [int(task_id) for task_id in re.findall(r'data-task-id="(\d+)"', data['html'])]
+            if not data['has_more']:
+                break
+            params.update(data['next'])
+        
+        self.assertEqual(seen, [task.id for task in self.tasks])
+        self.assertEqual(self.client.get(url, {'after': 'x'}).status_code, 400)
+    
+    def test_cards_require_board_access(self):
+        """测试非成员无法加载卡片"""
+        User.objects.create_user(username='outsider', password='testpass123')
+        self.client.login(username='outsider', password='testpass123')
+        
+        response = self.client.get(reverse('boards:list_cards_api', args=[self.board.slug, self.todo.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class BoardActivityTest(TestCase):
+    """看板活动记录测试"""
+    
+    def setUp(self):
+        from unittest import mock
+        from . import activity
+        
+        # 每个测试使用独立的缓冲区
+        patcher = mock.patch.object(activity, '_buffer', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.user = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.member = User.objects.create_user(username='member', password='testpass123')
+        self.board = Board.objects.create(name='活动看板', owner=self.user, slug='activity-board')
+        self.todo = BoardList.objects.create(board=self.board, name='待办', position=1)
+        self.doing = BoardList.objects.create(board=self.board, name='进行中', position=2)
+        self.url = reverse('boards:board_activity_api', kwargs={'slug': self.board.slug})
+    
+    def test_mutations_buffered_until_flush(self):
+        """测试任务、列表、成员变更在提交后缓冲，刷新时批量写入"""
+        from django.db import transaction
+        from .activity import flush_activities
+        from .models import BoardActivity
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title='设计', board=self.board, board_list=self.todo, creator=self.user)
+            task.board_list = self.doing
+            task.save()
+            task.is_archived = True
+            task.save()
+            BoardMember.objects.create(board=self.board, user=self.member, invited_by=self.user)
+        
+        # 回滚的变更不记录
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Task.objects.create(title='回滚', board=self.board, board_list=self.todo, creator=self.user)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        
+        self.assertFalse(BoardActivity.objects.exists())
+        self.assertEqual(flush_activities(), 4)
+        
+        activities = list(self.board.activities.order_by('id'))
+        self.assertEqual(
+            [activity.action for activity in activities],
+            ['create_task', 'move_task', 'archive_task', 'add_member']
+        )
+        self.assertEqual(activities[1].metadata, {'from_list_id': self.todo.id, 'to_list_id': self.doing.id})
+        self.assertEqual(activities[3].target_id, self.member.id)
+        self.assertEqual(flush_activities(), 0)
+    
+    def test_request_user_recorded_and_flushed(self):
+        """测试请求中的变更记录当前用户，并在请求结束时写入"""
+        BoardMember.objects.create(board=self.board, user=self.member, role='admin')
+        self.client.login(username='member', password='testpass123')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('boards:list_create_api', kwargs={'slug': self.board.slug}), {'name': '完成', 'position': 3}
+            )
+        list_id = response.json()['list']['id']
+        
+        # 下一个请求结束时写入缓冲的活动
+        self.client.get(self.url)
+        activities = self.client.get(self.url).json()['activities']
+        self.assertEqual(len(activities), 1)
+        self.assertEqual(activities[0]['action'], 'create_list')
+        self.assertEqual(activities[0]['target_id'], list_id)
+        self.assertEqual(activities[0]['user']['id'], self.member.id)
+    
+    def test_feed_keyset_pagination(self):
+        """测试活动流按时间和ID倒序分页，同一时间的活动不重复也不遗漏"""
+        from django.utils import timezone
+        from .models import BoardActivity
+        
+        now = timezone.now()
+        activities = BoardActivity.objects.bulk_create([
+            BoardActivity(
+                board=self.board, user=self.user, action='update_task',
+                description=f'活动{i}', created_at=now - timezone.timedelta(minutes=i // 2)
+            )
+            for i in range(5)
+        ])
+        expected = [a.id for a in sorted(activities, key=lambda a: (a.created_at, a.id), reverse=True)]
+        
+        self.client.login(username='owner', password='testpass123')
+        seen = []
+        params = {'limit': 2}
+        while True:
+            data = self.client.get(self.url, params).json()
+            seen += [activity['id'] for activity in data['activities']]
+            if not data['has_more']:
+                break
+            params.update(data['next'])
+        
+        self.assertEqual(seen, expected)
+        self.assertEqual(self.client.get(self.url, {'before': 'abc'}).status_code, 400)
+        
+        self.client.login(username='member', password='testpass123')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+    
+    def test_purge_old_activities(self):
+        """测试清理超过保留期的活动"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .activity import purge_old_activities
+        from .models import BoardActivity
+        
+        BoardActivity.objects.bulk_create([
+            BoardActivity(
+                board=self.board, user=self.user, action='update_task',
+                description=description, created_at=timezone.now() - timedelta(days=days)
+            )
+            for description, days in (('旧活动', 200), ('新活动', 10))
+        ])
+        
+        self.assertEqual(purge_old_activities(180), 1)
+        self.assertEqual(list(self.board.activities.values_list('description', flat=True)), ['新活动'])
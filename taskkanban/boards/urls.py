@@ -25,10 +25,12 @@ urlpatterns = [
     
     # 复制看板
     path('<slug:slug>/copy/', views.BoardCopyView.as_view(), name='copy'),
+    path('<slug:slug>/copy/progress/', views.BoardCloneProgressAPIView.as_view(), name='copy_progress'),
     
     # API路由
     path('api/lists/', views.BoardListsAPIView.as_view(), name='board_lists'),
     path('<slug:slug>/lists/create/', views.BoardListCreateAPIView.as_view(), name='list_create_api'),
+    path('<slug:slug>/lists/<int:list_id>/cards/', views.BoardListCardsView.as_view(), name='list_cards_api'),
     path('<slug:slug>/members/invite/', views.BoardMemberInviteAPIView.as_view(), name='member_invite_api'),
       # 标签管理API路由
     path('<slug:slug>/labels/', views.BoardLabelListCreateView.as_view(), name='label_list_create_api'),
@@ -36,4 +38,10 @@ urlpatterns = [
     
     # 看板数据API - 支持多视图切换
     path('<slug:slug>/data/', views.BoardDataAPIView.as_view(), name='board_data_api'),
+    
+    # 看板增量同步API
+    path('<slug:slug>/changes/', views.BoardChangesAPIView.as_view(), name='board_changes_api'),
+    
+    # 看板活动流API
+    path('<slug:slug>/activity/', views.BoardActivityFeedAPIView.as_view(), name='board_activity_api'),
 ]
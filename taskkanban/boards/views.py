@@ -9,21 +9,27 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q, Count, Prefetch, Max
-from django.http import JsonResponse, HttpResponseForbidden
+from django.db.models import Q
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, HttpResponseNotModified
 from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+from django.template.loader import render_to_string
 import json
 
 from .models import Board, BoardList, BoardMember, BoardLabel
-from tasks.models import Task
+from .snapshots import get_board_snapshot, get_board_etag
+from .activity import FEED_PAGE_SIZE, MAX_FEED_PAGE_SIZE, get_activity_feed, serialize_activity
+from .changes import get_changes_since
+from .cloning import get_clone_progress, start_clone
+from .ordering import POSITION_GAP, get_next_position
+from .permissions import can_view_board, can_edit_board
+from .windowing import MAX_PAGE_SIZE, attach_card_windows, get_cards_after
 from .forms import (
     BoardCreateForm, BoardUpdateForm, BoardListCreateForm, 
     BoardMemberInviteForm, BoardSearchForm, BoardLabelForm
 )
-from tasks.models import Task
 
 User = get_user_model()
 
@@ -54,40 +60,11 @@ class BoardAccessMixin(UserPassesTestMixin):
     
     def has_board_access(self, board, user):
         """检查用户是否有看板访问权限"""
-        if not board or not user.is_authenticated:
-            return False
-        
-        # 看板所有者总是有权限
-        if board.owner == user:
-            return True
-        
-        # 检查看板成员权限
-        if BoardMember.objects.filter(board=board, user=user).exists():
-            return True
-          # 检查团队成员权限
-        if board.team and board.team.memberships.filter(user=user).exists():
-            return True
-          # 公开看板任何人都可以访问
-        if board.visibility == 'public':
-            return True
-        
-        return False
+        return can_view_board(user, board)
     
     def has_board_edit_access(self, board, user):
         """检查用户是否有看板编辑权限"""
-        if not board or not user.is_authenticated:
-            return False
-        
-        # 看板所有者总是有编辑权限
-        if board.owner == user:
-            return True
-        
-        # 检查看板管理员权限
-        return BoardMember.objects.filter(
-            board=board, 
-            user=user, 
-            role__in=['admin', 'owner']
-        ).exists()
+        return can_edit_board(user, board)
 
 
 class BoardListView(LoginRequiredMixin, ListView):
@@ -106,9 +83,6 @@ class BoardListView(LoginRequiredMixin, ListView):
             Q(visibility='public')  # 公开看板
         ).distinct().select_related('owner', 'team').prefetch_related(
             'members__user'
-        ).annotate(
-            total_tasks=Count('lists__tasks', distinct=True),
-            total_members=Count('members', distinct=True)
         )
         
         # 处理搜索和过滤
@@ -221,7 +195,7 @@ class BoardCreateView(LoginRequiredMixin, CreateView):
             BoardList.objects.create(
                 board=board,
                 name=list_data['name'],
-                position=list_data['position']
+                position=list_data['position'] * POSITION_GAP
             )
     
     def get_success_url(self):
@@ -238,54 +212,30 @@ class BoardDetailView(LoginRequiredMixin, BoardAccessMixin, DetailView):
     
     def get_object(self):
         obj = super().get_object()
-        # 检查看板是否已关闭且用户不是所有者
-        if obj.is_closed and obj.owner != self.request.user:
-            if not BoardMember.objects.filter(
-                board=obj, 
-                user=self.request.user, 
-                role__in=['admin', 'owner']
-            ).exists():
-                messages.warning(
-                    self.request, 
-                    _('该看板已关闭，您只能查看不能编辑')
-                )
+        # 检查看板是否已关闭且用户不是所有者或管理员，角色在请求内缓存
+        if obj.is_closed and not can_edit_board(self.request.user, obj):
+            messages.warning(
+                self.request, 
+                _('该看板已关闭，您只能查看不能编辑')
+            )
         return obj
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         board = self.object
         
-        # 获取看板列表和任务
+        # 每个列表只加载首屏卡片，其余卡片滚动时加载
         lists = BoardList.objects.filter(board=board).order_by('position')
-          # 预加载任务数据
-        lists = lists.prefetch_related(
-            Prefetch(
-                'tasks',
-                queryset=Task.objects.select_related(
-                    'creator'
-                ).prefetch_related(
-                    'assignees', 'labels'
-                ).order_by('position')
-            )
-        )
-        
-        context['board_lists'] = lists
+        context['board_lists'] = attach_card_windows(lists)
         
         # 看板成员
         members = BoardMember.objects.filter(board=board).select_related('user')
         context['board_members'] = members
         context['is_board_owner'] = board.owner == self.request.user
-        context['is_board_admin'] = BoardMember.objects.filter(
-            board=board,
-            user=self.request.user,
-            role__in=['admin', 'owner']
-        ).exists()
-          # 统计信息
-        context['total_tasks'] = Task.objects.filter(board_list__board=board).count()
-        context['completed_tasks'] = Task.objects.filter(
-            board_list__board=board,
-            status='done'
-        ).count()
+        context['is_board_admin'] = can_edit_board(self.request.user, board)
+        # 统计信息
+        context['total_tasks'] = board.task_count
+        context['completed_tasks'] = board.done_task_count
         
         # 表单
         context['list_form'] = BoardListCreateForm()
@@ -294,6 +244,33 @@ class BoardDetailView(LoginRequiredMixin, BoardAccessMixin, DetailView):
         return context
 
 
+class BoardListCardsView(LoginRequiredMixin, BoardAccessMixin, View):
+    """列表卡片分页 API，after 和 after_id 为上一页最后一张卡片的位置和ID"""
+    
+    def get(self, request, slug, list_id):
+        board = get_object_or_404(Board, slug=slug)
+        board_list = get_object_or_404(BoardList, pk=list_id, board=board)
+        
+        try:
+            after = request.GET.get('after')
+            after = int(after) if after not in (None, '') else None
+            after_id = request.GET.get('after_id')
+            after_id = int(after_id) if after_id not in (None, '') else None
+            size = request.GET.get('size')
+            size = min(max(int(size), 1), MAX_PAGE_SIZE) if size else None
+        except ValueError:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        
+        cards, has_more = get_cards_after(board_list, after, after_id, size)
+        html = render_to_string('boards/_task_card.html', {'cards': cards}, request=request)
+        return JsonResponse({
+            'html': html,
+            'count': len(cards),
+            'has_more': has_more,
+            'next': {'after': cards[-1].position, 'after_id': cards[-1].id} if cards and has_more else None,
+        })
+
+
 class BoardUpdateView(LoginRequiredMixin, BoardAccessMixin, UpdateView):
     """编辑看板视图"""
     model = Board
@@ -349,7 +326,7 @@ class BoardDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         board = self.object
         
         # 统计信息
-        context['total_tasks'] = Task.objects.filter(board_list__board=board).count()
+        context['total_tasks'] = board.task_count
         context['total_comments'] = 0  # TODO: 实现评论统计
         
         return context
@@ -367,7 +344,7 @@ class BoardCopyView(LoginRequiredMixin, BoardAccessMixin, DetailView):
         board = self.object
         
         # 统计信息
-        context['total_tasks'] = Task.objects.filter(board_list__board=board).count()
+        context['total_tasks'] = board.task_count
           # 用户团队（用于团队选择）
         from teams.models import TeamMembership
         user_teams = TeamMembership.objects.filter(
@@ -416,56 +393,20 @@ class BoardCopyView(LoginRequiredMixin, BoardAccessMixin, DetailView):
             except Team.DoesNotExist:
                 pass
         
-        # 复制标签
-        label_mapping = {}
-        if copy_labels:
-            from .models import BoardLabel
-            for label in BoardLabel.objects.filter(board=original_board):
-                new_label = BoardLabel.objects.create(
-                    board=new_board,
-                    name=label.name,
-                    color=label.color
-                )
-                label_mapping[label.id] = new_label
-        
-        # 复制列表
-        if copy_lists:
-            for original_list in original_board.lists.all():
-                new_list = BoardList.objects.create(
-                    board=new_board,
-                    name=original_list.name,
-                    position=original_list.position
-                )
-                
-                # 复制任务
-                if copy_tasks:
-                    for task in original_list.tasks.all():
-                        new_task = Task.objects.create(
-                            title=task.title,
-                            description=task.description,
-                            board=new_board,
-                            board_list=new_list,
-                            creator=request.user,
-                            priority=task.priority,
-                            position=task.position,
-                            due_date=task.due_date,
-                            estimated_hours=task.estimated_hours
-                        )
-                        
-                        # 复制任务标签
-                        if copy_labels:
-                            for label in task.labels.all():
-                                if label.id in label_mapping:
-                                    new_task.labels.add(label_mapping[label.id])
-        
-        # 复制成员
-        if copy_members:
-            for member in original_board.members.all():
-                BoardMember.objects.create(
-                    board=new_board,
-                    user=member.user,
-                    role='member'  # 默认成员角色
-                )
+        # 复制列表、任务、标签和成员，任务较多时在后台复制
+        in_background = start_clone(
+            original_board, new_board, request.user,
+            copy_lists=copy_lists,
+            copy_tasks=copy_tasks,
+            copy_labels=copy_labels,
+            copy_members=copy_members,
+        )
+        if in_background:
+            messages.info(
+                request,
+                _('看板 "{}" 已创建，内容正在后台复制').format(new_board.name)
+            )
+            return redirect('boards:detail', slug=new_board.slug)
         
         messages.success(
             request, 
@@ -476,6 +417,18 @@ class BoardCopyView(LoginRequiredMixin, BoardAccessMixin, DetailView):
 
 
 # API视图 (用于AJAX请求)
+class BoardCloneProgressAPIView(LoginRequiredMixin, BoardAccessMixin, View):
+    """看板后台复制进度 API"""
+    
+    def get(self, request, slug):
+        board = get_object_or_404(Board, slug=slug)
+        
+        if not self.has_board_access(board, request.user):
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        
+        return JsonResponse({'progress': get_clone_progress(board.id)})
+
+
 class BoardListCreateAPIView(LoginRequiredMixin, BoardAccessMixin, View):
     """创建看板列表 API"""
     
@@ -491,10 +444,7 @@ class BoardListCreateAPIView(LoginRequiredMixin, BoardAccessMixin, View):
             board_list.board = board
               # 如果没有指定位置，放在最后
             if not board_list.position:
-                max_position = BoardList.objects.filter(
-                    board=board
-                ).aggregate(Max('position'))['position__max'] or 0
-                board_list.position = max_position + 1
+                board_list.position = get_next_position(board.lists.all())
             
             board_list.save()
             
@@ -648,7 +598,7 @@ class BoardListsAPIView(LoginRequiredMixin, View):
             # 获取指定看板的列表
             try:
                 board = Board.objects.get(id=board_id)
-                if not self.has_board_access(board, request.user):
+                if not can_view_board(request.user, board):
                     return JsonResponse({'error': 'Permission denied'}, status=403)
                 
                 lists = BoardList.objects.filter(board=board).order_by('position')
@@ -658,7 +608,7 @@ class BoardListsAPIView(LoginRequiredMixin, View):
                         'id': board_list.id,
                         'name': board_list.name,
                         'position': board_list.position,
-                        'task_count': board_list.tasks.count()
+                        'task_count': board_list.task_count
                     })
                 
                 return JsonResponse(lists_data, safe=False)
@@ -690,127 +640,78 @@ class BoardListsAPIView(LoginRequiredMixin, View):
                 })
             
             return JsonResponse(boards_data, safe=False)
+
+
+class BoardDataAPIView(LoginRequiredMixin, BoardAccessMixin, View):
+    """
+    看板数据API视图 - 支持多视图切换
+    返回看板的所有任务和列表数据
+
+    数据来自按版本号缓存的看板快照，支持 ETag / If-None-Match 条件请求
+    """
     
-    def has_board_access(self, board, user):
-        """检查用户是否有看板访问权限"""
-        if not board or not user.is_authenticated:
-            return False
+    def get(self, request, slug):
+        board = get_object_or_404(Board, slug=slug)
         
-        # 看板所有者总是有权限
-        if board.owner == user:
-            return True
+        version, content = get_board_snapshot(board)
+        etag = get_board_etag(board.id, version)
         
-        # 检查看板成员权限
-        if BoardMember.objects.filter(board=board, user=user).exists():
-            return True
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and etag in parse_etags(if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
         
-        # 检查团队成员权限
-        if board.team and board.team.memberships.filter(user=user).exists():
-            return True
+        response['ETag'] = etag
+        # 客户端每次都需要重新验证，未变更时返回304
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class BoardChangesAPIView(LoginRequiredMixin, BoardAccessMixin, View):
+    """
+    看板增量同步API
+    返回游标 since 之后创建、更新或删除的任务、列表和任务分配
+    """
+    
+    def get(self, request, slug):
+        board = get_object_or_404(Board, slug=slug)
         
-        # 公开看板任何人都可以访问
-        if board.visibility == 'public':
-            return True
+        try:
+            since = int(request.GET.get('since', 0))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        
+        if since < 0:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
         
-        return False
+        return JsonResponse(get_changes_since(board, since))
 
 
-class BoardDataAPIView(LoginRequiredMixin, BoardAccessMixin, View):
+class BoardActivityFeedAPIView(LoginRequiredMixin, BoardAccessMixin, View):
     """
-    看板数据API视图 - 支持多视图切换
-    返回看板的所有任务和列表数据
+    看板活动流API
+    按时间倒序返回活动，before 和 before_id 为上一页最后一条活动的时间和ID
     """
     
-    @method_decorator(cache_page(60 * 5))  # 缓存5分钟
     def get(self, request, slug):
         board = get_object_or_404(Board, slug=slug)
         
-        # 获取看板所有列表
-        lists = list(board.lists.all().order_by('position').values(
-            'id', 'name', 'position'
-        ))
-          # 获取所有任务，包含相关数据
-        tasks_queryset = Task.objects.filter(
-            board=board
-        ).select_related(
-            'creator', 'board_list'
-        ).prefetch_related(
-            'assignees', 'labels', 'comments'
-        ).order_by('board_list__position', 'position')
-        
-        tasks = []
-        for task in tasks_queryset:
-            task_data = {
-                'id': task.id,
-                'title': task.title,
-                'description': task.description,
-                'status': task.status,
-                'priority': task.get_priority_display(),
-                'priority_value': task.priority,
-                'due_date': task.due_date.isoformat() if task.due_date else None,
-                'created_at': task.created_at.isoformat(),
-                'updated_at': task.updated_at.isoformat(),                'position': task.position,
-                'list_id': task.board_list.id if task.board_list else None,
-                'list_name': task.board_list.name if task.board_list else None,
-                'creator': {
-                    'id': task.creator.id,
-                    'name': task.creator.get_display_name(),
-                    'avatar': task.creator.avatar.url if task.creator.avatar else None
-                },
-                'assignees': [
-                    {
-                        'id': assignee.id,
-                        'name': assignee.get_display_name(),
-                        'avatar': assignee.avatar.url if assignee.avatar else None
-                    }
-                    for assignee in task.assignees.all()
-                ],
-                'labels': [
-                    {
-                        'id': label.id,
-                        'name': label.name,
-                        'color': label.color
-                    }
-                    for label in task.labels.all()
-                ],
-                'comments_count': task.comments.count(),
-                'url': reverse('tasks:detail', kwargs={'pk': task.id})
-            }
-            tasks.append(task_data)
-        
-        # 计算统计数据
-        total_tasks = len(tasks)
-        completed_tasks = len([t for t in tasks if t['status'] == 'done'])
-        in_progress_tasks = len([t for t in tasks if t['status'] == 'in_progress'])
-        todo_tasks = len([t for t in tasks if t['status'] == 'todo'])
-        
-        data = {
-            'board': {
-                'id': board.id,
-                'name': board.name,
-                'slug': board.slug,
-                'description': board.description,
-                'background_color': board.background_color,
-                'created_at': board.created_at.isoformat()
-            },
-            'lists': lists,
-            'tasks': tasks,
-            'stats': {
-                'total_tasks': total_tasks,
-                'completed_tasks': completed_tasks,
-                'in_progress_tasks': in_progress_tasks,
-                'todo_tasks': todo_tasks,
-                'completion_rate': round((completed_tasks / total_tasks * 100) if total_tasks > 0 else 0, 1)
-            },
-            'members': [
-                {
-                    'id': member.user.id,
-                    'name': member.user.get_display_name(),
-                    'avatar': member.user.avatar.url if member.user.avatar else None,
-                    'role': member.role
-                }
-                for member in board.members.select_related('user').all()
-            ]
-        }
-        
-        return JsonResponse(data)
+        try:
+            before = request.GET.get('before')
+            before = parse_datetime(before) if before else None
+            if request.GET.get('before') and before is None:
+                raise ValueError(before)
+            before_id = request.GET.get('before_id')
+            before_id = int(before_id) if before_id else None
+            limit = min(max(int(request.GET.get('limit', FEED_PAGE_SIZE)), 1), MAX_FEED_PAGE_SIZE)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        
+        activities, has_more = get_activity_feed(board, before, before_id, limit)
+        last = activities[-1] if activities else None
+        return JsonResponse({
+            'activities': [serialize_activity(activity) for activity in activities],
+            'has_more': has_more,
+            'next': {'before': last.created_at.isoformat(), 'before_id': last.id} if has_more else None,
+        })
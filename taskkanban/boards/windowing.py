@@ -0,0 +1,70 @@
+"""
+看板卡片分窗加载
+看板详情页每个列表只渲染前 CARD_WINDOW_SIZE 张卡片，一次窗口函数查询取出所有列表的首屏卡片，
+受理人和标签只为这些卡片预加载；列表的卡片数直接读取 BoardList 上存储的计数字段。
+后续卡片在滚动时按位置分页加载（见 BoardListCardsView）。
+
+只显示未归档的任务，与列表计数一致。
+"""
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+CARD_WINDOW_SIZE = 50
+
+# 单次分页请求的最大卡片数
+MAX_PAGE_SIZE = 200
+
+
+def card_queryset():
+    """卡片需要的任务字段和关联"""
+    from tasks.models import Task
+
+    return Task.objects.filter(is_archived=False).select_related('creator').prefetch_related(
+        'assignees', 'labels'
+    )
+
+
+def get_first_cards(board_lists, size=None):
+    """取出各列表的前 size 张卡片，返回 {list_id: [任务]}"""
+    size = size or CARD_WINDOW_SIZE
+    list_ids = [board_list.id for board_list in board_lists]
+    cards = {list_id: [] for list_id in list_ids}
+    if not list_ids:
+        return cards
+
+    tasks = card_queryset().filter(board_list_id__in=list_ids).annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=[F('board_list_id')],
+            order_by=[F('position').asc(), F('id').asc()]
+        )
+    ).filter(row_number__lte=size).order_by('board_list_id', 'position', 'id')
+
+    for task in tasks:
+        cards[task.board_list_id].append(task)
+    return cards
+
+
+def attach_card_windows(board_lists, size=None):
+    """为列表附加首屏卡片 cards 及是否还有更多卡片 has_more_cards"""
+    board_lists = list(board_lists)
+    cards = get_first_cards(board_lists, size)
+    for board_list in board_lists:
+        board_list.cards = cards[board_list.id]
+        board_list.has_more_cards = board_list.task_count > len(board_list.cards)
+    return board_lists
+
+
+def get_cards_after(board_list, after_position=None, after_id=None, size=None):
+    """取出位置在 (after_position, after_id) 之后的 size 张卡片，返回 (卡片, 是否还有更多)"""
+    size = size or CARD_WINDOW_SIZE
+    tasks = card_queryset().filter(board_list=board_list)
+    if after_position is not None:
+        after = Q(position__gt=after_position)
+        if after_id is not None:
+            after |= Q(position=after_position, id__gt=after_id)
+        tasks = tasks.filter(after)
+
+    # 多取一张判断是否还有更多
+    cards = list(tasks.order_by('position', 'id')[:size + 1])
+    return cards[:size], len(cards) > size
@@ -0,0 +1,233 @@
+"""
+截止提醒和每日摘要的批量生成
+按用户ID分块，每块一次分组查询取出块内所有用户的逾期和临近截止任务，批量加载通知偏好，
+每个用户渲染一封摘要邮件，整块 bulk_create 后由 send_pending_notifications 分批发送。
+
+各分块由独立的 Celery 任务处理，多个 worker 可并行生成。
+
+截止提醒只包含逾期不超过 OVERDUE_WINDOW_DAYS 天和明天结束前截止的任务。
+每日摘要还包含之后截止或没有截止时间的任务（upcoming）；接收截止提醒的用户，
+摘要中不再重复逾期和临近截止的任务。
+
+邮件模板的上下文中 tasks 为全部任务，overdue、due_soon、upcoming 为各部分的任务，
+每项包含 id、title、status、due_date、board_id、board_name、url；
+task 和 board 为第一项的任务和看板，兼容按单个任务编写的截止提醒模板。
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import EmailNotification, UserNotificationPreference
+from .rendering import get_compiled_template
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# 每个分块处理的用户数
+DIGEST_CHUNK_SIZE = 1000
+
+DUE_REMINDER = 'task_due_reminder'
+DAILY_SUMMARY = 'daily_summary'
+
+# 摘要中的任务状态
+OPEN_STATUSES = ('todo', 'in_progress', 'review', 'blocked')
+
+# 逾期超过该天数的任务不再出现在提醒和摘要中
+OVERDUE_WINDOW_DAYS = 30
+
+# 每日摘要中 upcoming 部分的最大条数
+SUMMARY_MAX_UPCOMING = 50
+
+
+def get_due_window(now):
+    """截止提醒的范围：逾期不超过 OVERDUE_WINDOW_DAYS 天到明天结束"""
+    tomorrow = timezone.localtime(now).date() + timedelta(days=1)
+    return (
+        now - timedelta(days=OVERDUE_WINDOW_DAYS),
+        timezone.make_aware(datetime.combine(tomorrow + timedelta(days=1), time.min)),
+    )
+
+
+def open_assignments():
+    """未完成、未归档任务的分配"""
+    from tasks.models import TaskAssignment
+
+    return TaskAssignment.objects.filter(task__status__in=OPEN_STATUSES, task__is_archived=False)
+
+
+def due_assignments(now):
+    """截止提醒范围内的任务分配"""
+    start, end = get_due_window(now)
+    return open_assignments().filter(task__due_date__gte=start, task__due_date__lt=end)
+
+
+def summary_assignments(now):
+    """每日摘要的任务分配：没有逾期过久的任务，包括没有截止时间的任务"""
+    start, _ = get_due_window(now)
+    return open_assignments().filter(Q(task__due_date__isnull=True) | Q(task__due_date__gte=start))
+
+
+def get_assignments(template_type, now):
+    if template_type == DAILY_SUMMARY:
+        return summary_assignments(now)
+    return due_assignments(now)
+
+
+def collect_tasks(template_type, user_ids, now):
+    """一次查询取出用户的待办任务，按截止时间分为逾期、临近截止和之后截止
+
+    返回 {user_id: {'overdue': [...], 'due_soon': [...], 'upcoming': [...]}}，没有任务的用户不出现。
+    """
+    site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+    _, end = get_due_window(now)
+    rows = get_assignments(template_type, now).filter(user_id__in=user_ids).order_by(
+        'user_id', F('task__due_date').asc(nulls_last=True), 'task_id'
+    ).values(
+        'user_id', 'task_id', 'task__title', 'task__status', 'task__due_date',
+        'task__board_id', 'task__board__name',
+    )
+
+    digests = {}
+    for row in rows:
+        item = {
+            'id': row['task_id'],
+            'title': row['task__title'],
+            'status': row['task__status'],
+            'due_date': row['task__due_date'],
+            'board_id': row['task__board_id'],
+            'board_name': row['task__board__name'],
+            'url': f"{site_url}/tasks/{row['task_id']}/",
+        }
+        due_date = row['task__due_date']
+        if due_date is None or due_date >= end:
+            section = 'upcoming'
+        elif due_date < now:
+            section = 'overdue'
+        else:
+            section = 'due_soon'
+        digest = digests.setdefault(row['user_id'], {'overdue': [], 'due_soon': [], 'upcoming': []})
+        if section != 'upcoming' or len(digest['upcoming']) < SUMMARY_MAX_UPCOMING:
+            digest[section].append(item)
+    return digests
+
+
+def load_preferences(users):
+    """批量加载通知偏好，没有偏好记录的用户使用默认设置（与 EmailService.get_user_preference 一致）"""
+    preferences = {
+        preference.user_id: preference
+        for preference in UserNotificationPreference.objects.filter(user__in=users)
+    }
+    for user in users:
+        if user.pk not in preferences:
+            preferences[user.pk] = UserNotificationPreference(
+                user=user, email_enabled=True, email_verified=bool(user.email)
+            )
+    return preferences
+
+
+def wants_digest(preference, template_type):
+    """用户是否接收该类摘要"""
+    if not (preference.email_enabled and preference.email_verified):
+        return False
+    frequency = getattr(preference, template_type)
+    if template_type == DAILY_SUMMARY:
+        return frequency == 'daily'
+    return frequency != 'never'
+
+
+def build_digests(template_type, user_ids, now=None):
+    """为一块用户生成摘要邮件，返回创建的通知数"""
+    from .services import EmailService
+
+    now = now or timezone.now()
+    template = get_compiled_template(template_type)
+    if template is None:
+        logger.error(f"Email template not found: {template_type}")
+        return 0
+
+    digests = collect_tasks(template_type, user_ids, now)
+    if not digests:
+        return 0
+
+    users = list(User.objects.filter(pk__in=list(digests), is_active=True).exclude(email=''))
+    preferences = load_preferences(users)
+    site_name = getattr(settings, 'SITE_NAME', '任务看板')
+    site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+
+    notifications = []
+    for user in users:
+        preference = preferences[user.pk]
+        if not wants_digest(preference, template_type):
+            continue
+        digest = digests[user.pk]
+        if template_type == DAILY_SUMMARY and wants_digest(preference, DUE_REMINDER):
+            # 逾期和临近截止的任务已在截止提醒中发送
+            digest = {**digest, 'overdue': [], 'due_soon': []}
+        tasks = digest['overdue'] + digest['due_soon'] + digest['upcoming']
+        if not tasks:
+            continue
+        context = {
+            'user': user,
+            'date': timezone.localtime(now).date(),
+            'tasks': tasks,
+            'task': tasks[0],
+            'board': {'id': tasks[0]['board_id'], 'name': tasks[0]['board_name']},
+            'due_date': tasks[0]['due_date'],
+            'overdue': digest['overdue'],
+            'due_soon': digest['due_soon'],
+            'upcoming': digest['upcoming'],
+            'site_name': site_name,
+            'site_url': site_url,
+            'unsubscribe_url': EmailService.generate_unsubscribe_url(user, template_type),
+        }
+        try:
+            subject, body = template.render(context)
+        except Exception as e:
+            logger.error(f"Error rendering email template {template_type} for {user.username}: {e}")
+            continue
+
+        notifications.append(EmailNotification(
+            recipient=user,
+            recipient_email=user.email,
+            template_type=template_type,
+            subject=subject,
+            body=body,
+            is_html=template.is_html,
+            send_at=now,
+        ))
+
+    EmailNotification.objects.bulk_create(notifications, batch_size=500)
+    return len(notifications)
+
+
+@shared_task
+def build_digest_chunk(template_type, user_ids, now=None):
+    """生成一块用户的摘要邮件"""
+    now = datetime.fromisoformat(now) if now else None
+    return build_digests(template_type, user_ids, now)
+
+
+def schedule_digests(template_type, now=None):
+    """按用户ID分块安排生成摘要，只处理有相应任务的用户，返回分块数"""
+    now = now or timezone.now()
+    user_ids = get_assignments(template_type, now).order_by('user_id').values_list('user_id', flat=True).distinct()
+
+    chunks = 0
+    chunk = []
+    for user_id in user_ids.iterator(chunk_size=DIGEST_CHUNK_SIZE):
+        chunk.append(user_id)
+        if len(chunk) >= DIGEST_CHUNK_SIZE:
+            build_digest_chunk.delay(template_type, chunk, now.isoformat())
+            chunks += 1
+            chunk = []
+    if chunk:
+        build_digest_chunk.delay(template_type, chunk, now.isoformat())
+        chunks += 1
+
+    logger.info(f"Scheduled {chunks} {template_type} digest chunks")
+    return chunks
@@ -0,0 +1,78 @@
+"""
+邮件模板编译缓存
+按 (模板类型, 更新时间) 在进程内缓存编译后的主题和正文模板
+
+各模板类型当前的更新时间保存在共享缓存中，模板保存或删除时由信号清除
+（见 notifications.signals），其他进程下次读取时即按新的更新时间重新编译。
+"""
+from django.core.cache import cache
+from django.template import Context, Template
+
+from .models import EmailTemplate
+
+VERSION_KEY = 'notifications:template:version:{template_type}'
+VERSION_TIMEOUT = 60 * 60
+
+# 缓存中表示模板不存在或未启用
+MISSING = ''
+
+# 进程内缓存: {(template_type, version): CompiledEmailTemplate}
+_compiled_templates = {}
+
+
+class CompiledEmailTemplate:
+    """编译后的邮件模板"""
+
+    def __init__(self, template):
+        self.template_type = template.template_type
+        self.is_html = template.is_html
+        self.subject = Template(template.subject_template)
+        self.body = Template(template.body_template)
+
+    def render(self, context):
+        """渲染主题和正文"""
+        context = Context(context)
+        return self.subject.render(context), self.body.render(context)
+
+
+def _get_version(template):
+    return template.updated_at.isoformat() if template else MISSING
+
+
+def get_compiled_template(template_type):
+    """获取编译后的邮件模板，模板不存在或未启用时返回None"""
+    key = VERSION_KEY.format(template_type=template_type)
+    version = cache.get(key)
+
+    template = None
+    if version is None:
+        template = EmailTemplate.objects.filter(template_type=template_type, is_active=True).first()
+        version = _get_version(template)
+        cache.set(key, version, VERSION_TIMEOUT)
+
+    if version == MISSING:
+        return None
+
+    compiled = _compiled_templates.get((template_type, version))
+    if compiled is None:
+        if template is None:
+            template = EmailTemplate.objects.filter(template_type=template_type, is_active=True).first()
+            if template is None or _get_version(template) != version:
+                # 共享缓存中的版本已过时
+                cache.delete(key)
+                return get_compiled_template(template_type)
+
+        compiled = CompiledEmailTemplate(template)
+        # 同一类型只保留最新版本
+        for cached_key in [k for k in _compiled_templates if k[0] == template_type]:
+            del _compiled_templates[cached_key]
+        _compiled_templates[(template_type, version)] = compiled
+
+    return compiled
+
+
+def invalidate_template(template_type):
+    """模板变更后清除缓存"""
+    cache.delete(VERSION_KEY.format(template_type=template_type))
+    for cached_key in [k for k in _compiled_templates if k[0] == template_type]:
+        _compiled_templates.pop(cached_key, None)
@@ -7,8 +7,8 @@ import logging
 from datetime import timedelta
 from typing import Dict, List, Optional, Any
 from django.conf import settings
-from django.core.mail import send_mail, EmailMultiAlternatives
-from django.template import Template, Context
+from django.core.mail import get_connection, EmailMultiAlternatives
+from django.core import signing
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -16,13 +16,25 @@ from django.db import transaction
 from celery import shared_task
 
 from .models import (
-    EmailTemplate, EmailNotification, UserNotificationPreference,
+    EmailNotification, UserNotificationPreference,
     NotificationQueue, UnsubscribeToken
 )
+from .digests import DAILY_SUMMARY, DUE_REMINDER, schedule_digests
+from .rendering import get_compiled_template
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# 每批发送的通知数量，同一批通知复用一个邮件连接
+EMAIL_BATCH_SIZE = 100
+
+# 发送中状态超过该时间视为处理进程已退出，重新放回队列
+SENDING_TIMEOUT = timedelta(minutes=15)
+
+# 退订令牌有效期
+UNSUBSCRIBE_SALT = 'notifications.unsubscribe'
+UNSUBSCRIBE_MAX_AGE = timedelta(days=30)
+
 
 class EmailService:
     """邮件服务类"""
@@ -73,10 +85,9 @@ class EmailService:
             logger.info(f"Skipping notification for {recipient.username}: {template_type}")
             return None
         
-        # 获取邮件模板
-        try:
-            template = EmailTemplate.objects.get(template_type=template_type, is_active=True)
-        except EmailTemplate.DoesNotExist:
+        # 获取编译后的邮件模板
+        template = get_compiled_template(template_type)
+        if template is None:
             logger.error(f"Email template not found: {template_type}")
             return None
         
@@ -91,8 +102,7 @@ class EmailService:
             })
             
             # 渲染主题和正文
-            subject = Template(template.subject_template).render(Context(context))
-            body = Template(template.body_template).render(Context(context))
+            subject, body = template.render(context)
             
         except Exception as e:
             logger.error(f"Error rendering email template {template_type}: {e}")
@@ -115,6 +125,20 @@ class EmailService:
         logger.info(f"Created email notification {notification.id} for {recipient.username}")
         return notification
     
+    @staticmethod
+    def build_message(notification: EmailNotification, connection=None) -> EmailMultiAlternatives:
+        """构建邮件消息"""
+        msg = EmailMultiAlternatives(
+            subject=notification.subject,
+            body=notification.body,  # 纯文本版本
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[notification.recipient_email],
+            connection=connection,
+        )
+        if notification.is_html:
+            msg.attach_alternative(notification.body, "text/html")
+        return msg
+    
     @staticmethod
     def send_notification(notification: EmailNotification) -> bool:
         """发送单个邮件通知"""
@@ -124,25 +148,7 @@ class EmailService:
             notification.save(update_fields=['status'])
             
             # 发送邮件
-            if notification.is_html:
-                # HTML邮件
-                msg = EmailMultiAlternatives(
-                    subject=notification.subject,
-                    body=notification.body,  # 纯文本版本
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[notification.recipient_email],
-                )
-                msg.attach_alternative(notification.body, "text/html")
-                msg.send()
-            else:
-                # 纯文本邮件
-                send_mail(
-                    subject=notification.subject,
-                    message=notification.body,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[notification.recipient_email],
-                    fail_silently=False,
-                )
+            EmailService.build_message(notification).send()
             
             # 更新状态为已发送
             notification.status = 'sent'
@@ -162,29 +168,136 @@ class EmailService:
             return False
     
     @staticmethod
-    def generate_unsubscribe_url(user: User, template_type: str = '') -> str:
-        """生成退订链接"""
-        # 创建退订令牌
-        token = UnsubscribeToken.objects.create(
-            user=user,
-            template_type=template_type,
-            expires_at=timezone.now() + timedelta(days=30)
+    def claim_pending_batch(batch_size: int = EMAIL_BATCH_SIZE) -> List[EmailNotification]:
+        """领取一批待发送通知
+
+        锁定行并跳过其他进程已锁定的行，在同一事务内标记为发送中，
+        多个进程并行领取时不会拿到同一条通知。
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                EmailNotification.objects.select_for_update(skip_locked=True).filter(
+                    status='pending',
+                    send_at__lte=now
+                ).order_by('send_at').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return []
+            EmailNotification.objects.filter(id__in=ids).update(status='sending', updated_at=now)
+        
+        return list(EmailNotification.objects.filter(id__in=ids).order_by('send_at'))
+    
+    @staticmethod
+    def send_batch(notifications: List[EmailNotification]) -> Dict[str, int]:
+        """通过同一个邮件连接发送一批通知，并批量写回发送状态"""
+        sent_count = 0
+        failed_count = 0
+        
+        connection = get_connection()
+        try:
+            connection.open()
+            for notification in notifications:
+                try:
+                    EmailService.build_message(notification, connection).send()
+                    notification.status = 'sent'
+                    notification.sent_at = timezone.now()
+                    sent_count += 1
+                except Exception as e:
+                    notification.status = 'failed'
+                    notification.error_message = str(e)
+                    failed_count += 1
+                    logger.error(f"Failed to send email notification {notification.id}: {e}")
+        except Exception as e:
+            # 无法建立连接时整批标记为失败
+            logger.error(f"Failed to open email connection: {e}")
+            for notification in notifications:
+                if notification.status == 'sending':
+                    notification.status = 'failed'
+                    notification.error_message = str(e)
+                    failed_count += 1
+        finally:
+            connection.close()
+        
+        now = timezone.now()
+        for notification in notifications:
+            notification.updated_at = now
+        EmailNotification.objects.bulk_update(
+            notifications, ['status', 'sent_at', 'error_message', 'updated_at'], batch_size=500
         )
         
+        return {'sent': sent_count, 'failed': failed_count}
+    
+    @staticmethod
+    def release_stale_sending() -> int:
+        """将长时间停留在发送中的通知重新放回队列（处理进程异常退出的情况）"""
+        cutoff = timezone.now() - SENDING_TIMEOUT
+        return EmailNotification.objects.filter(
+            status='sending',
+            updated_at__lt=cutoff
+        ).update(status='pending', updated_at=timezone.now())
+    
+    @staticmethod
+    def generate_unsubscribe_url(user: User, template_type: str = '') -> str:
+        """生成退订链接
+
+        默认使用签名令牌，不写入数据库；关闭 NOTIFICATION_SIGNED_UNSUBSCRIBE 时
+        为每封邮件创建 UnsubscribeToken 记录。
+        """
+        if getattr(settings, 'NOTIFICATION_SIGNED_UNSUBSCRIBE', True):
+            token = signing.dumps({'user': user.pk, 'type': template_type}, salt=UNSUBSCRIBE_SALT)
+        else:
+            # 创建退订令牌
+            token = UnsubscribeToken.objects.create(
+                user=user,
+                template_type=template_type,
+                expires_at=timezone.now() + UNSUBSCRIBE_MAX_AGE
+            ).token
+        
         base_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
-        return f"{base_url}/notifications/unsubscribe/{token.token}/"
+        return f"{base_url}/notifications/unsubscribe/{token}/"
+    
+    @staticmethod
+    def load_unsubscribe_token(token: str) -> Optional[UnsubscribeToken]:
+        """解析退订令牌
+
+        签名令牌返回未保存的 UnsubscribeToken，数据库令牌返回对应记录，
+        令牌无效时返回None。
+        """
+        if ':' not in token:
+            # 数据库令牌由 token_urlsafe 生成，不包含冒号
+            return UnsubscribeToken.objects.select_related('user').filter(token=token).first()
+        
+        try:
+            data = signing.loads(token, salt=UNSUBSCRIBE_SALT, max_age=UNSUBSCRIBE_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        
+        user = User.objects.filter(pk=data.get('user')).first()
+        if user is None:
+            return None
+        return UnsubscribeToken(
+            user=user,
+            template_type=data.get('type', ''),
+            expires_at=timezone.now() + UNSUBSCRIBE_MAX_AGE
+        )
     
     @staticmethod
     def process_unsubscribe(token: str) -> bool:
         """处理退订请求"""
         try:
-            unsubscribe_token = UnsubscribeToken.objects.get(token=token)
+            unsubscribe_token = EmailService.load_unsubscribe_token(token)
+            
+            if unsubscribe_token is None:
+                logger.warning(f"Invalid unsubscribe token: {token}")
+                return False
             
             if not unsubscribe_token.is_valid():
                 return False
             
-            # 使用令牌
-            unsubscribe_token.use_token()
+            # 使用数据库令牌，签名令牌可重复使用
+            if not unsubscribe_token._state.adding:
+                unsubscribe_token.use_token()
             
             # 更新用户偏好
             preference = EmailService.get_user_preference(unsubscribe_token.user)
@@ -201,9 +314,6 @@ class EmailService:
             logger.info(f"User {unsubscribe_token.user.username} unsubscribed from {unsubscribe_token.template_type or 'all'}")
             return True
             
-        except UnsubscribeToken.DoesNotExist:
-            logger.warning(f"Invalid unsubscribe token: {token}")
-            return False
         except Exception as e:
             logger.error(f"Error processing unsubscribe: {e}")
             return False
@@ -314,21 +424,25 @@ def send_email_notification_task(notification_id: str):
 
 
 @shared_task
-def send_pending_notifications():
-    """发送所有待发送的邮件通知"""
-    notifications = EmailNotification.objects.filter(
-        status='pending',
-        send_at__lte=timezone.now()
-    )
+def send_pending_notifications(batch_size: int = EMAIL_BATCH_SIZE, max_batches: Optional[int] = None):
+    """分批发送待发送的邮件通知，可由多个进程并行执行"""
+    released = EmailService.release_stale_sending()
+    if released:
+        logger.warning(f"Released {released} stale sending notifications")
     
     sent_count = 0
     failed_count = 0
+    batches = 0
     
-    for notification in notifications:
-        if EmailService.send_notification(notification):
-            sent_count += 1
-        else:
-            failed_count += 1
+    while max_batches is None or batches < max_batches:
+        notifications = EmailService.claim_pending_batch(batch_size)
+        if not notifications:
+            break
+        
+        result = EmailService.send_batch(notifications)
+        sent_count += result['sent']
+        failed_count += result['failed']
+        batches += 1
     
     logger.info(f"Sent {sent_count} notifications, {failed_count} failed")
     return {'sent': sent_count, 'failed': failed_count}
@@ -336,46 +450,14 @@ def send_pending_notifications():
 
 @shared_task
 def send_daily_summary():
-    """发送每日工作摘要"""
-    # 获取需要每日摘要的用户
-    users = User.objects.filter(
-        notification_preference__daily_summary='daily',
-        notification_preference__email_enabled=True,
-        notification_preference__email_verified=True,
-    )
-    
-    for user in users:
-        # 获取用户今天的任务活动
-        today = timezone.now().date()
-        
-        # 这里可以根据需要收集用户的任务数据
-        context = {
-            'date': today,
-            'user': user,
-            # 添加更多摘要数据...
-        }
-        
-        EmailService.create_notification(
-            recipient=user,
-            template_type='daily_summary',
-            context=context,
-        )
+    """发送每日工作摘要，每个用户一封，汇总分配给用户的未完成任务"""
+    return schedule_digests(DAILY_SUMMARY)
 
 
 @shared_task
 def send_due_date_reminders():
-    """发送任务截止日期提醒"""
-    from tasks.models import Task
-    
-    # 获取明天截止的任务
-    tomorrow = timezone.now().date() + timedelta(days=1)
-    due_tasks = Task.objects.filter(
-        due_date__date=tomorrow,
-        status__in=['todo', 'in_progress']
-    ).select_related('board').prefetch_related('assignees')
-    
-    for task in due_tasks:
-        NotificationTrigger.task_due_reminder(task)
+    """发送任务截止日期提醒，每个用户一封摘要，不再按任务逐封发送"""
+    return schedule_digests(DUE_REMINDER)
 
 
 @shared_task
@@ -0,0 +1,16 @@
+"""
+Notifications应用信号处理
+邮件模板变更时清除编译缓存
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import EmailTemplate
+from .rendering import invalidate_template
+
+
+@receiver(post_save, sender=EmailTemplate)
+@receiver(post_delete, sender=EmailTemplate)
+def email_template_changed(sender, instance, **kwargs):
+    """邮件模板保存或删除"""
+    invalidate_template(instance.template_type)
@@ -1,3 +1,217 @@
+"""
+Notifications应用测试
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import EmailNotification, EmailTemplate, UnsubscribeToken
+from .rendering import get_compiled_template
+from .services import EmailService, send_pending_notifications
+
+User = get_user_model()
+
+
+class SendPendingNotificationsTest(TestCase):
+    """待发送邮件批量发送测试"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+    
+    def create_notifications(self, count, **kwargs):
+        return [
+            EmailNotification.objects.create(
+                recipient=self.user,
+                recipient_email=self.user.email,
+                template_type='task_assigned',
+                subject=f'通知 {i}',
+                body=f'<p>通知 {i}</p>',
+                **kwargs
+            )
+            for i in range(count)
+        ]
+    
+    def test_batches_share_connection(self):
+        """测试每批通知复用一个邮件连接"""
+        self.create_notifications(5)
+        self.create_notifications(1, send_at=timezone.now() + timedelta(hours=1))
+        
+        with mock.patch('notifications.services.get_connection', wraps=mail.get_connection) as get_connection:
+            result = send_pending_notifications(batch_size=2)
+        
+        self.assertEqual(result, {'sent': 5, 'failed': 0})
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(EmailNotification.objects.filter(status='sent', sent_at__isnull=False).count(), 5)
+        self.assertEqual(EmailNotification.objects.filter(status='pending').count(), 1)
+    
+    def test_failed_message_does_not_stop_batch(self):
+        """测试单封邮件失败不影响同批其他邮件"""
+        first, second = self.create_notifications(2)
+        EmailNotification.objects.filter(pk=first.pk).update(recipient_email='invalid\nemail')
+        
+        result = send_pending_notifications()
+        
+        self.assertEqual(result, {'sent': 1, 'failed': 1})
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'failed')
+        self.assertTrue(first.error_message)
+    
+    def test_claimed_notifications_are_not_reclaimed(self):
+        """测试已领取的通知不会被再次领取，超时后重新放回队列"""
+        self.create_notifications(3)
+        
+        claimed = EmailService.claim_pending_batch(2)
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(len(EmailService.claim_pending_batch(10)), 1)
+        self.assertEqual(EmailService.claim_pending_batch(10), [])
+        
+        EmailNotification.objects.filter(pk=claimed[0].pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(EmailService.release_stale_sending(), 1)
+
+
+class EmailTemplateRenderingTest(TestCase):
+    """邮件模板编译缓存和退订令牌测试"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.template = EmailTemplate.objects.create(
+            name='任务分配',
+            template_type='task_assigned',
+            subject_template='分配给 {{ user.username }}',
+            body_template='<a href="{{ unsubscribe_url }}">退订</a>'
+        )
+    
+    def test_compiled_template_cached(self):
+        """测试编译后的模板被缓存，模板保存后重新编译"""
+        compiled = get_compiled_template('task_assigned')
+        with self.assertNumQueries(0):
+            self.assertIs(get_compiled_template('task_assigned'), compiled)
+        
+        self.template.subject_template = '新主题'
+        self.template.save()
+        
+        recompiled = get_compiled_template('task_assigned')
+        self.assertIsNot(recompiled, compiled)
+        self.assertEqual(recompiled.render({})[0], '新主题')
+        
+        self.template.is_active = False
+        self.template.save()
+        self.assertIsNone(get_compiled_template('task_assigned'))
+    
+    def test_signed_unsubscribe(self):
+        """测试签名退订令牌不写入数据库"""
+        notification = EmailService.create_notification(self.user, 'task_assigned', {})
+        
+        self.assertEqual(notification.subject, '分配给 testuser')
+        self.assertFalse(UnsubscribeToken.objects.exists())
+        
+        token = notification.body.split('/notifications/unsubscribe/')[1].split('/')[0]
+        response = self.client.get(reverse('notifications:unsubscribe', kwargs={'token': token}))
+        self.assertTrue(response.context['valid'])
+        
+        self.assertTrue(EmailService.process_unsubscribe(token))
+        self.assertEqual(EmailService.get_user_preference(self.user).task_assigned, 'never')
+        self.assertFalse(EmailService.process_unsubscribe(token + 'x'))
+
+
 
-# Create your tests here.
+class DigestPipelineTest(TestCase):
+    """截止提醒和每日摘要批量生成测试"""
+    
+    def setUp(self):
+        from boards.models import Board, BoardList
+        from tasks.models import Task
+        
+        cache.clear()
+        EmailTemplate.objects.create(
+            name='截止提醒',
+            template_type='task_due_reminder',
+            subject_template='{{ tasks|length }} 个任务即将截止',
+            body_template='{{ board.name }}|{% for item in overdue %}逾期:{{ item.title }};{% endfor %}'
+                          '{% for item in due_soon %}临近:{{ item.title }};{% endfor %}'
+        )
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+        for user in self.users[:2]:
+            EmailService.get_user_preference(user)
+        board = Board.objects.create(name='测试看板', owner=self.users[0])
+        board_list = BoardList.objects.create(name='待办', board=board, position=1024)
+        
+        now = timezone.now()
+        due_dates = {
+            '很久以前': now - timedelta(days=90),
+            '逾期任务': now - timedelta(days=2),
+            '明天截止': now + timedelta(hours=2),
+            '下周截止': now + timedelta(days=7),
+        }
+        for title, due_date in due_dates.items():
+            task = Task.objects.create(
+                title=title, board=board, board_list=board_list, creator=self.users[0], due_date=due_date
+            )
+            task.assignees.add(*self.users)
+    
+    def test_one_digest_per_user(self):
+        """测试每个用户一封摘要，查询次数与用户数无关"""
+        from .digests import DUE_REMINDER, build_digests
+        from .services import send_due_date_reminders
+        
+        user_ids = [user.pk for user in self.users]
+        get_compiled_template(DUE_REMINDER)
+        # 任务分组查询、用户、偏好、批量插入
+        with self.assertNumQueries(4):
+            self.assertEqual(build_digests(DUE_REMINDER, user_ids), 3)
+        
+        EmailNotification.objects.all().delete()
+        preference = EmailService.get_user_preference(self.users[1])
+        preference.task_due_reminder = 'never'
+        preference.save()
+        
+        self.assertEqual(send_due_date_reminders(), 1)
+        notifications = EmailNotification.objects.order_by('recipient_id')
+        self.assertEqual([n.recipient for n in notifications], [self.users[0], self.users[2]])
+        self.assertEqual(notifications[0].subject, '2 个任务即将截止')
+        # 逾期过久的任务不再提醒
+        self.assertEqual(notifications[0].body, '测试看板|逾期:逾期任务;临近:明天截止;')
+    
+    def test_daily_summary_respects_frequency(self):
+        """测试每日摘要只发给选择每日摘要的用户，不重复截止提醒中的任务"""
+        from .services import send_daily_summary
+        
+        EmailTemplate.objects.create(
+            name='每日摘要',
+            template_type='daily_summary',
+            subject_template='{{ date }} 摘要',
+            body_template='{{ overdue|length }}/{{ due_soon|length }}/{{ upcoming|length }}'
+        )
+        preference = EmailService.get_user_preference(self.users[0])
+        preference.daily_summary = 'weekly'
+        preference.save()
+        preference = EmailService.get_user_preference(self.users[1])
+        preference.task_due_reminder = 'never'
+        preference.save()
+        
+        send_daily_summary()
+        
+        notifications = EmailNotification.objects.filter(template_type='daily_summary').order_by('recipient_id')
+        self.assertEqual([n.recipient for n in notifications], [self.users[1], self.users[2]])
+        self.assertEqual([n.body for n in notifications], ['1/1/1', '0/0/1'])
@@ -15,7 +15,7 @@ from django.conf import settings
 
 from .models import (
     EmailTemplate, UserNotificationPreference, EmailNotification,
-    NotificationQueue, UnsubscribeToken
+    NotificationQueue
 )
 from .services import EmailService, NotificationTrigger
 from .forms import (
@@ -61,17 +61,16 @@ class UnsubscribeView(TemplateView):
         context = super().get_context_data(**kwargs)
         token = kwargs.get('token')
         
-        try:
-            unsubscribe_token = UnsubscribeToken.objects.get(token=token)
-            if unsubscribe_token.is_valid():
-                context['token'] = unsubscribe_token
-                context['valid'] = True
-            else:
-                context['valid'] = False
-                context['error'] = _('退订链接已过期或已使用')
-        except UnsubscribeToken.DoesNotExist:
+        unsubscribe_token = EmailService.load_unsubscribe_token(token)
+        if unsubscribe_token is None:
             context['valid'] = False
             context['error'] = _('无效的退订链接')
+        elif unsubscribe_token.is_valid():
+            context['token'] = unsubscribe_token
+            context['valid'] = True
+        else:
+            context['valid'] = False
+            context['error'] = _('退订链接已过期或已使用')
         
         return context
     
@@ -0,0 +1,203 @@
+"""
+报表异步执行
+每次运行创建一条 ReportExecution，事务提交后由 Celery 生成报表数据并导出到 MEDIA_ROOT 下的文件，
+客户端按执行ID轮询状态并下载结果。
+
+同一报表以相同参数（格式和筛选条件）在 DEDUP_TTL 内重复运行时，返回已有的未失败执行，
+不重复生成。
+"""
+import hashlib
+import json
+import logging
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from celery import shared_task
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .export_services import ReportExportService
+from .models import Report, ReportExecution
+from .permissions import check_scope_access
+from .services import ReportDataService
+
+logger = logging.getLogger(__name__)
+
+# 相同参数的执行在该时间内复用
+DEDUP_TTL = timedelta(minutes=10)
+
+# 导出文件目录（相对 MEDIA_ROOT）
+EXECUTION_DIR = 'reports/executions'
+
+# 导出格式: (ReportExportService 方法, 扩展名)
+EXPORT_FORMATS = {
+    'json': ('export_to_json', 'json'),
+    'csv': ('export_to_csv', 'csv'),
+    'excel': ('export_to_excel', 'xlsx'),
+    'pdf': ('export_to_pdf', 'pdf'),
+}
+
+# 可由请求覆盖的报表筛选参数
+PARAM_KEYS = ('date_range', 'board_id', 'team_id', 'assignee_id')
+
+DEFAULT_DATE_RANGE = 30
+
+
+def get_params(report, overrides=None):
+    """合并报表的看板、团队、筛选条件和请求参数"""
+    params = {'date_range': DEFAULT_DATE_RANGE}
+    if report.board_id:
+        params['board_id'] = report.board_id
+    if report.team_id:
+        params['team_id'] = report.team_id
+    for source in (report.filters or {}, overrides or {}):
+        params.update({key: source[key] for key in PARAM_KEYS if source.get(key) not in (None, '')})
+    # 表单提交的参数为字符串，统一为整数后再计算摘要
+    try:
+        return {key: int(value) for key, value in params.items()}
+    except (TypeError, ValueError):
+        raise ValueError('报表参数必须为整数')
+
+
+def get_params_hash(export_format, params):
+    payload = json.dumps({'format': export_format, 'params': params}, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def start_execution(report, user, export_format='json', overrides=None):
+    """运行报表，返回 (执行记录, 是否新建)
+
+    筛选的看板、团队、受理人须是用户可访问的，否则抛出 PermissionDenied。
+    有相同参数的未失败执行时直接返回，否则创建执行记录并在事务提交后安排后台生成；
+    检查和创建期间锁定报表行，相同的并发请求只创建一次执行。
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {export_format}')
+
+    params = get_params(report, overrides)
+    check_scope_access(user, params.get('board_id'), params.get('team_id'), params.get('assignee_id'))
+    params_hash = get_params_hash(export_format, params)
+
+    with transaction.atomic():
+        Report.objects.select_for_update().only('pk').get(pk=report.pk)
+        existing = ReportExecution.objects.filter(
+            report=report,
+            params_hash=params_hash,
+            status__in=['pending', 'running', 'completed'],
+            created_at__gte=timezone.now() - DEDUP_TTL,
+        ).first()
+        if existing is not None:
+            return existing, False
+
+        execution = ReportExecution.objects.create(
+            report=report,
+            export_format=export_format,
+            params=params,
+            params_hash=params_hash,
+            triggered_by=user,
+        )
+        transaction.on_commit(lambda: run_report_execution.delay(execution.pk))
+    return execution, True
+
+
+def build_report_data(execution):
+    """按执行参数生成报表数据"""
+    from django.contrib.auth import get_user_model
+    from boards.models import Board
+    from teams.models import Team
+
+    params = execution.params
+    end_date = timezone.localdate()
+    start_date = end_date - timedelta(days=params.get('date_range', DEFAULT_DATE_RANGE))
+
+    def get(model, key):
+        return model.objects.filter(pk=params[key]).first() if params.get(key) else None
+
+    return ReportDataService(
+        start_date=start_date,
+        end_date=end_date,
+        user=get(get_user_model(), 'assignee_id'),
+        team=get(Team, 'team_id'),
+        board=get(Board, 'board_id'),
+    ).get_dashboard_summary()
+
+
+def write_export_file(execution, data):
+    """导出到存储，返回文件路径"""
+    method, extension = EXPORT_FORMATS[execution.export_format]
+    response = getattr(ReportExportService(data, execution.report.name), method)()
+
+    with tempfile.TemporaryFile() as output:
+        try:
+            for chunk in response:
+                output.write(chunk)
+        finally:
+            response.close()
+        output.seek(0)
+        return default_storage.save(f'{EXECUTION_DIR}/{execution.pk}.{extension}', File(output))
+
+
+def _to_json(value):
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+@shared_task
+def run_report_execution(execution_id):
+    """后台生成报表，返回执行状态"""
+    now = timezone.now()
+    # 只领取等待中的执行，重复投递的任务不会重复生成
+    claimed = ReportExecution.objects.filter(pk=execution_id, status='pending').update(
+        status='running', started_at=now
+    )
+    if not claimed:
+        return None
+
+    execution = ReportExecution.objects.select_related('report').get(pk=execution_id)
+    started = time.monotonic()
+    try:
+        data = build_report_data(execution)
+        execution.file_path = write_export_file(execution, data)
+        execution.result_data = _to_json(data.get('summary', {}))
+        execution.record_count = data.get('task_stats', {}).get('total_tasks', 0)
+        execution.status = 'completed'
+    except Exception as e:
+        logger.error(f"Report execution {execution_id} failed: {e}")
+        execution.status = 'failed'
+        execution.error_message = str(e)
+
+    execution.completed_at = timezone.now()
+    execution.execution_time = Decimal(f'{time.monotonic() - started:.3f}')
+    execution.save(update_fields=[
+        'status', 'file_path', 'result_data', 'record_count', 'error_message', 'completed_at', 'execution_time'
+    ])
+    return execution.status
+
+
+def open_result(execution):
+    """打开已完成执行的导出文件，文件不存在时返回None"""
+    if execution.status != 'completed' or not execution.file_path:
+        return None
+    if not default_storage.exists(execution.file_path):
+        return None
+    return default_storage.open(execution.file_path, 'rb')
+
+
+def serialize_execution(execution):
+    """执行状态的JSON表示"""
+    return {
+        'id': execution.pk,
+        'report': execution.report_id,
+        'status': execution.status,
+        'format': execution.export_format,
+        'params': execution.params,
+        'record_count': execution.record_count,
+        'execution_time': float(execution.execution_time) if execution.execution_time is not None else None,
+        'error_message': execution.error_message,
+        'created_at': execution.created_at,
+        'completed_at': execution.completed_at,
+    }
@@ -1,18 +1,21 @@
 """
 报表导出服务模块
-提供PDF、Excel、CSV等格式的报表导出功能
+提供PDF、Excel、CSV等格式的报表导出功能，以及任务明细的流式导出
 """
 
 import os
 import csv
 import json
+import tempfile
 from datetime import datetime
 from io import BytesIO, StringIO
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional
 
-from django.http import HttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.template.loader import get_template
 from django.conf import settings
+from django.utils import timezone
 
 try:
     import pandas as pd
@@ -31,6 +34,14 @@ try:
 except ImportError:
     REPORTLAB_AVAILABLE = False
 
+try:
+    from openpyxl import Workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
 
 class ReportExportService:
     """报表导出服务类"""
@@ -77,13 +88,16 @@ class ReportExportService:
         return response
     
     def export_to_excel(self, filename: Optional[str] = None) -> HttpResponse:
-        """导出为Excel格式"""
-        if not PANDAS_AVAILABLE:
-            raise ImportError("需要安装pandas库才能导出Excel格式")
+        """导出为Excel格式，安装了openpyxl时以只写模式逐行写入，否则使用pandas"""
+        if not OPENPYXL_AVAILABLE and not PANDAS_AVAILABLE:
+            raise ImportError("需要安装openpyxl或pandas库才能导出Excel格式")
         
         if not filename:
             filename = f"{self.report_title}_{self.timestamp}.xlsx"
         
+        if OPENPYXL_AVAILABLE:
+            return write_only_xlsx_response(self._iter_excel_sheets(), filename)
+        
         output = BytesIO()
         
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
@@ -104,14 +118,57 @@ class ReportExportService:
         
         output.seek(0)
         
-        response = HttpResponse(
-            output.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        response = HttpResponse(output.getvalue(), content_type=XLSX_CONTENT_TYPE)
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         
         return response
     
+    def _iter_excel_sheets(self):
+        """按工作表生成 (名称, 行迭代器)，内容与 _write_detailed_data_to_excel 一致"""
+        if 'summary' in self.data:
+            yield '摘要', [['指标', '数值']] + [
+                [self._translate_key(key), value] for key, value in self.data['summary'].items()
+            ]
+        
+        if 'workload_stats' in self.data and self.data['workload_stats'].get('user_workloads'):
+            yield '用户工作负载', [['用户', '总任务', '已完成', '进行中', '待办', '完成率']] + [
+                [
+                    workload.get('display_name', ''),
+                    workload.get('total_tasks', 0),
+                    workload.get('completed_tasks', 0),
+                    workload.get('in_progress_tasks', 0),
+                    workload.get('todo_tasks', 0),
+                    f"{workload.get('completion_rate', 0):.1f}%"
+                ]
+                for workload in self.data['workload_stats']['user_workloads']
+            ]
+        
+        if 'team_stats' in self.data and self.data['team_stats'].get('team_stats'):
+            yield '团队绩效', [['团队', '成员数', '总任务', '已完成', '完成率', '人均任务']] + [
+                [
+                    team.get('team_name', ''),
+                    team.get('member_count', 0),
+                    team.get('total_tasks', 0),
+                    team.get('completed_tasks', 0),
+                    f"{team.get('completion_rate', 0):.1f}%",
+                    f"{team.get('tasks_per_member', 0):.1f}"
+                ]
+                for team in self.data['team_stats']['team_stats']
+            ]
+        
+        if 'project_stats' in self.data and self.data['project_stats'].get('project_stats'):
+            yield '项目进度', [['项目', '总任务', '已完成', '进行中', '进度', '预计完成']] + [
+                [
+                    project.get('board_name', ''),
+                    project.get('total_tasks', 0),
+                    project.get('completed_tasks', 0),
+                    project.get('in_progress_tasks', 0),
+                    f"{project.get('progress_rate', 0):.1f}%",
+                    project.get('estimated_completion', '未知')
+                ]
+                for project in self.data['project_stats']['project_stats']
+            ]
+    
     def export_to_pdf(self, filename: Optional[str] = None) -> HttpResponse:
         """导出为PDF格式"""
         if not REPORTLAB_AVAILABLE:
@@ -388,6 +445,136 @@ class ReportExportService:
         return translations.get(key, key)
 
 
+class Echo:
+    """csv.writer 的伪文件对象，writerow 直接返回写入的行"""
+    
+    def write(self, value):
+        return value
+
+
+def write_only_xlsx_response(sheets, filename: str) -> FileResponse:
+    """以只写模式逐行写入工作簿并分块返回
+
+    sheets 为 (工作表名, 行迭代器) 序列。只写模式不在内存中保留已写入的行，
+    工作簿先写入临时文件，响应结束时关闭并删除。
+    """
+    workbook = Workbook(write_only=True)
+    for title, rows in sheets:
+        worksheet = workbook.create_sheet(title=title[:31])
+        for row in rows:
+            worksheet.append(row)
+    
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+class TaskExportService:
+    """任务明细导出服务
+
+    按 CHUNK_SIZE 分块迭代查询集，CSV 和 NDJSON 以生成器流式输出，XLSX 以只写模式写入临时文件，
+    导出行数不影响工作进程内存。
+    """
+    
+    CHUNK_SIZE = 2000
+    
+    # (查询字段, 列名)
+    EXPORT_FIELDS = [
+        ('id', 'ID'),
+        ('title', '标题'),
+        ('board__name', '看板'),
+        ('board_list__name', '列表'),
+        ('status', '状态'),
+        ('priority', '优先级'),
+        ('creator__username', '创建人'),
+        ('due_date', '截止时间'),
+        ('completed_at', '完成时间'),
+        ('created_at', '创建时间'),
+        ('updated_at', '更新时间'),
+    ]
+    
+    def __init__(self, queryset, title: str = "任务明细"):
+        from tasks.models import Task
+        
+        self.queryset = queryset
+        self.title = title
+        self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.choices = {
+            'status': dict(Task.STATUS_CHOICES),
+            'priority': dict(Task.PRIORITY_CHOICES),
+        }
+    
+    @property
+    def fields(self) -> List[str]:
+        return [field for field, _ in self.EXPORT_FIELDS]
+    
+    @property
+    def headers(self) -> List[str]:
+        return [header for _, header in self.EXPORT_FIELDS]
+    
+    def _filename(self, extension: str) -> str:
+        return f"{self.title}_{self.timestamp}.{extension}"
+    
+    def iter_rows(self, display: bool = True) -> Iterator[tuple]:
+        """逐行返回任务字段值，display 为 True 时状态和优先级转换为显示名称"""
+        rows = self.queryset.order_by('pk').values_list(*self.fields).iterator(chunk_size=self.CHUNK_SIZE)
+        if not display:
+            yield from rows
+            return
+        
+        status_index = self.fields.index('status')
+        priority_index = self.fields.index('priority')
+        for row in rows:
+            row = list(row)
+            row[status_index] = str(self.choices['status'].get(row[status_index], row[status_index]))
+            row[priority_index] = str(self.choices['priority'].get(row[priority_index], row[priority_index]))
+            yield row
+    
+    def stream_csv(self, filename: Optional[str] = None) -> StreamingHttpResponse:
+        """流式导出为CSV"""
+        writer = csv.writer(Echo())
+        
+        def content():
+            # 添加BOM以支持Excel中文显示
+            yield '\ufeff' + writer.writerow(self.headers)
+            for row in self.iter_rows():
+                yield writer.writerow(row)
+        
+        response = StreamingHttpResponse(content(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename or self._filename("csv")}"'
+        return response
+    
+    def stream_ndjson(self, filename: Optional[str] = None) -> StreamingHttpResponse:
+        """流式导出为NDJSON，每行一个任务对象"""
+        fields = self.fields
+        
+        def content():
+            for row in self.iter_rows(display=False):
+                yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        
+        response = StreamingHttpResponse(content(), content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename or self._filename("ndjson")}"'
+        return response
+    
+    def export_to_xlsx(self, filename: Optional[str] = None) -> FileResponse:
+        """以只写模式导出为XLSX"""
+        if not OPENPYXL_AVAILABLE:
+            raise ImportError("需要安装openpyxl库才能导出Excel格式")
+        
+        def rows():
+            yield self.headers
+            for row in self.iter_rows():
+                # Excel 不支持带时区的时间
+                yield [
+                    timezone.localtime(value).replace(tzinfo=None)
+                    if isinstance(value, datetime) and timezone.is_aware(value) else value
+                    for value in row
+                ]
+        
+        return write_only_xlsx_response([('任务', rows())], filename or self._filename('xlsx'))
+
+
 class ChartExportService:
     """图表导出服务类"""
     
@@ -0,0 +1,59 @@
+"""
+回填每日任务指标汇总
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reports.metrics import get_history_start_date, rollup_daily_task_metrics
+
+
+class Command(BaseCommand):
+    help = '根据任务状态历史重新生成每日任务指标汇总'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='开始日期 (YYYY-MM-DD)，默认从最早的状态历史开始',
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='结束日期 (YYYY-MM-DD)，默认今天',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=30,
+            help='每批处理的天数',
+        )
+
+    def parse_date(self, value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'日期格式错误: {value}')
+
+    def handle(self, *args, **options):
+        start_date = self.parse_date(options['start']) if options['start'] else get_history_start_date()
+        end_date = self.parse_date(options['end']) if options['end'] else timezone.localdate()
+
+        if start_date is None:
+            self.stdout.write('没有任务状态历史，无需回填')
+            return
+        if start_date > end_date:
+            raise CommandError('开始日期不能晚于结束日期')
+
+        chunk_days = max(options['chunk_days'], 1)
+        total = 0
+        current = start_date
+        while current <= end_date:
+            chunk_end = min(current + timedelta(days=chunk_days - 1), end_date)
+            total += rollup_daily_task_metrics(current, chunk_end)
+            current = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'回填完成：{start_date} 至 {end_date}，写入 {total} 行'
+        ))
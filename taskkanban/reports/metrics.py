@@ -0,0 +1,139 @@
+"""
+每日任务指标汇总服务
+由 TaskStatusHistory 生成 DailyTaskMetrics，并为报表提供按天的状态流转统计
+
+汇总表中最新的日期作为水位线。定时任务每次从水位线当天开始重新汇总到今天，
+水位线当天可能只汇总了一部分，因此读取时水位线之前的日期使用汇总表，
+水位线当天及之后的日期直接统计状态历史。
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from celery import shared_task
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyTaskMetrics
+
+logger = logging.getLogger(__name__)
+
+
+def _history_queryset(start_date, end_date):
+    from tasks.workflow_models import TaskStatusHistory
+
+    return TaskStatusHistory.objects.filter(
+        created_at__date__gte=start_date,
+        created_at__date__lte=end_date,
+    ).annotate(day=TruncDate('created_at'))
+
+
+def build_metrics(start_date, end_date):
+    """统计日期范围内的状态流转，返回未保存的 DailyTaskMetrics 列表"""
+    history = _history_queryset(start_date, end_date)
+    metrics = []
+
+    # 看板级汇总
+    for row in history.values('day', 'task__board', 'to_status').annotate(count=Count('id')):
+        metrics.append(DailyTaskMetrics(
+            date=row['day'],
+            board_id=row['task__board'],
+            status=row['to_status'],
+            transitions=row['count'],
+        ))
+
+    # 按受理人汇总（使用任务当前的受理人）
+    for row in history.filter(task__assignees__isnull=False).values(
+        'day', 'task__board', 'task__assignees', 'to_status'
+    ).annotate(count=Count('id')):
+        metrics.append(DailyTaskMetrics(
+            date=row['day'],
+            board_id=row['task__board'],
+            assignee_id=row['task__assignees'],
+            status=row['to_status'],
+            transitions=row['count'],
+        ))
+
+    return metrics
+
+
+def rollup_daily_task_metrics(start_date, end_date):
+    """重新汇总日期范围内的指标，返回写入的行数"""
+    metrics = build_metrics(start_date, end_date)
+    with transaction.atomic():
+        DailyTaskMetrics.objects.filter(date__gte=start_date, date__lte=end_date).delete()
+        DailyTaskMetrics.objects.bulk_create(metrics, batch_size=1000)
+    return len(metrics)
+
+
+def get_watermark():
+    """汇总表中最新的日期，尚未汇总时返回None"""
+    return DailyTaskMetrics.objects.aggregate(Max('date'))['date__max']
+
+
+def get_history_start_date():
+    """最早的状态历史日期"""
+    from tasks.workflow_models import TaskStatusHistory
+
+    first = TaskStatusHistory.objects.aggregate(Min('created_at'))['created_at__min']
+    return timezone.localtime(first).date() if first else None
+
+
+@shared_task
+def update_daily_task_metrics():
+    """增量汇总：从水位线当天汇总到今天"""
+    start_date = get_watermark() or get_history_start_date()
+    if start_date is None:
+        return 0
+
+    try:
+        return rollup_daily_task_metrics(start_date, timezone.localdate())
+    except Exception as e:
+        logger.error(f"Failed to update daily task metrics: {e}")
+        raise
+
+
+def get_daily_transitions(start_date, end_date, status, board=None, team=None, user=None):
+    """按天统计进入指定状态的任务数，返回 {date: count}
+
+    汇总表为空时返回None，由调用方回退到直接统计任务表。
+    """
+    watermark = get_watermark()
+    if watermark is None:
+        return None
+
+    daily = defaultdict(int)
+
+    rollup_end = min(end_date, watermark - timedelta(days=1))
+    if start_date <= rollup_end:
+        metrics = DailyTaskMetrics.objects.filter(
+            date__gte=start_date, date__lte=rollup_end, status=status
+        )
+        if user:
+            metrics = metrics.filter(assignee=user)
+        else:
+            metrics = metrics.filter(assignee__isnull=True)
+        if board:
+            metrics = metrics.filter(board=board)
+        if team:
+            metrics = metrics.filter(board__team=team)
+
+        for date, total in metrics.values('date').annotate(total=Sum('transitions')).values_list('date', 'total'):
+            daily[date] += total
+
+    live_start = max(start_date, watermark)
+    if live_start <= end_date:
+        history = _history_queryset(live_start, end_date).filter(to_status=status)
+        if user:
+            history = history.filter(task__assignees=user)
+        if board:
+            history = history.filter(task__board=board)
+        if team:
+            history = history.filter(task__board__team=team)
+
+        for date, count in history.values('day').annotate(count=Count('id')).values_list('day', 'count'):
+            daily[date] += count
+
+    return dict(daily)
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boards", "0004_gapped_positions"),
+        ("reports", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyTaskMetrics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="日期")),
+                ("status", models.CharField(max_length=15, verbose_name="状态")),
+                (
+                    "transitions",
+                    models.PositiveIntegerField(default=0, verbose_name="进入状态次数"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "assignee",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_task_metrics",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="受理人",
+                    ),
+                ),
+                (
+                    "board",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_metrics",
+                        to="boards.board",
+                        verbose_name="看板",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "每日任务指标",
+                "verbose_name_plural": "每日任务指标",
+                "db_table": "reports_daily_task_metrics",
+                "ordering": ["date"],
+                "indexes": [
+                    models.Index(
+                        fields=["date", "status"], name="reports_dai_date_8cfef7_idx"
+                    ),
+                    models.Index(
+                        fields=["board", "date"], name="reports_dai_board_i_a1519e_idx"
+                    ),
+                    models.Index(
+                        fields=["assignee", "date"],
+                        name="reports_dai_assigne_76af62_idx",
+                    ),
+                ],
+                "unique_together": {("date", "board", "assignee", "status")},
+            },
+        ),
+    ]
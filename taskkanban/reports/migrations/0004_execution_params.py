@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0003_dailytaskmetrics"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reportexecution",
+            name="export_format",
+            field=models.CharField(
+                default="json", max_length=10, verbose_name="导出格式"
+            ),
+        ),
+        migrations.AddField(
+            model_name="reportexecution",
+            name="params",
+            field=models.JSONField(blank=True, default=dict, verbose_name="执行参数"),
+        ),
+        migrations.AddField(
+            model_name="reportexecution",
+            name="params_hash",
+            field=models.CharField(blank=True, max_length=64, verbose_name="参数摘要"),
+        ),
+        migrations.AddIndex(
+            model_name="reportexecution",
+            index=models.Index(
+                fields=["report", "params_hash", "-created_at"],
+                name="reports_exe_report__4d914e_idx",
+            ),
+        ),
+    ]
@@ -116,6 +116,9 @@ class ReportExecution(models.Model):
     
     # 执行信息
     status = models.CharField(_('执行状态'), max_length=15, choices=STATUS_CHOICES, default='pending')
+    export_format = models.CharField(_('导出格式'), max_length=10, default='json')
+    params = models.JSONField(_('执行参数'), default=dict, blank=True)
+    params_hash = models.CharField(_('参数摘要'), max_length=64, blank=True)
     started_at = models.DateTimeField(_('开始时间'), null=True, blank=True)
     completed_at = models.DateTimeField(_('完成时间'), null=True, blank=True)
     
@@ -145,6 +148,10 @@ class ReportExecution(models.Model):
         verbose_name_plural = _('报表执行记录')
         db_table = 'reports_execution'
         ordering = ['-created_at']
+        indexes = [
+            # 相同参数的执行去重
+            models.Index(fields=['report', 'params_hash', '-created_at']),
+        ]
     
     def __str__(self):
         return f"{self.report.name} - {self.get_status_display()}"
@@ -310,3 +317,45 @@ class ReportTemplate(models.Model):
     
     def __str__(self):
         return self.name
+
+
+class DailyTaskMetrics(models.Model):
+    """
+    每日任务指标汇总
+    按 (日期, 看板, 受理人, 状态) 统计当天进入该状态的任务数，由 TaskStatusHistory 汇总生成。
+    受理人为空的行是看板级汇总，不区分受理人，避免多受理人任务被重复计数。
+    """
+    date = models.DateField(_('日期'))
+    board = models.ForeignKey(
+        'boards.Board',
+        on_delete=models.CASCADE,
+        related_name='daily_metrics',
+        verbose_name=_('看板')
+    )
+    assignee = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='daily_task_metrics',
+        null=True,
+        blank=True,
+        verbose_name=_('受理人')
+    )
+    status = models.CharField(_('状态'), max_length=15)
+    transitions = models.PositiveIntegerField(_('进入状态次数'), default=0)
+    
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('每日任务指标')
+        verbose_name_plural = _('每日任务指标')
+        db_table = 'reports_daily_task_metrics'
+        ordering = ['date']
+        unique_together = ('date', 'board', 'assignee', 'status')
+        indexes = [
+            models.Index(fields=['date', 'status']),
+            models.Index(fields=['board', 'date']),
+            models.Index(fields=['assignee', 'date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.board_id} {self.status}: {self.transitions}"
@@ -0,0 +1,23 @@
+"""
+报表数据范围权限
+报表、仪表板部件按看板、团队、用户筛选统计数据，筛选的对象必须是查看者可访问的：
+看板须能查看（boards.permissions 解析的角色），团队须是有效成员；
+查看其他用户的工作量时必须同时限定在可访问的看板或团队内。
+"""
+from django.core.exceptions import PermissionDenied
+
+from boards.permissions import roles_for
+
+
+def check_scope_access(user, board_id=None, team_id=None, user_id=None):
+    """检查用户能否查看该筛选范围的统计数据，无权限时抛出 PermissionDenied"""
+    from teams.models import TeamMembership
+
+    if board_id and roles_for(user, [board_id])[board_id] is None:
+        raise PermissionDenied('无权查看该看板的统计数据')
+
+    if team_id and not TeamMembership.objects.filter(team_id=team_id, user=user, status='active').exists():
+        raise PermissionDenied('无权查看该团队的统计数据')
+
+    if user_id and user_id != user.pk and not (board_id or team_id):
+        raise PermissionDenied('查看其他用户的统计数据时须限定看板或团队')
@@ -3,11 +3,14 @@ Reports应用数据服务
 报表数据分析和统计服务
 """
 from django.db.models import Count, Q, Avg, Sum, F
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from datetime import datetime, timedelta
 from collections import defaultdict, OrderedDict
 from django.contrib.auth import get_user_model
 
+from .metrics import get_daily_transitions
+
 User = get_user_model()
 
 
@@ -37,27 +40,46 @@ class ReportDataService:
         if self.board:
             filters['board'] = self.board
         
-        # 基础统计
-        total_tasks = Task.objects.filter(**filters).count()
-        completed_tasks = Task.objects.filter(**filters, status='done').count()
-        in_progress_tasks = Task.objects.filter(**filters, status='in_progress').count()
-        todo_tasks = Task.objects.filter(**filters, status='todo').count()
+        # 基础统计，一次查询按状态条件计数
+        totals = Task.objects.filter(**filters).aggregate(
+            total_tasks=Count('id'),
+            completed_tasks=Count('id', filter=Q(status='done')),
+            in_progress_tasks=Count('id', filter=Q(status='in_progress')),
+            todo_tasks=Count('id', filter=Q(status='todo')),
+        )
+        total_tasks = totals['total_tasks']
+        completed_tasks = totals['completed_tasks']
+        in_progress_tasks = totals['in_progress_tasks']
+        todo_tasks = totals['todo_tasks']
         
         completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
         
-        # 按日期分组的完成趋势
+        # 按日期分组的完成趋势，优先读取每日指标汇总表，缺少的日期补0
+        daily_completed = get_daily_transitions(
+            self.start_date, self.end_date, 'done',
+            board=self.board, team=self.team, user=self.user
+        )
+        if daily_completed is None:
+            # 尚未汇总时按任务更新时间统计
+            daily_completed = dict(
+                Task.objects.filter(
+                    **filters,
+                    status='done',
+                    updated_at__date__gte=self.start_date,
+                    updated_at__date__lte=self.end_date,
+                ).annotate(
+                    day=TruncDate('updated_at')
+                ).values('day').annotate(
+                    completed=Count('id')
+                ).values_list('day', 'completed')
+            )
+        
         completion_trend = []
         current_date = self.start_date
         while current_date <= self.end_date:
-            day_completed = Task.objects.filter(
-                **filters,
-                status='done',
-                updated_at__date=current_date
-            ).count()
-            
             completion_trend.append({
                 'date': current_date.strftime('%Y-%m-%d'),
-                'completed': day_completed
+                'completed': daily_completed.get(current_date, 0)
             })
             current_date += timedelta(days=1)
         
@@ -131,7 +153,7 @@ class ReportDataService:
     def get_team_performance_stats(self):
         """获取团队绩效统计"""
         from tasks.models import Task
-        from teams.models import Team
+        from teams.models import Team, TeamMembership
         
         # 如果指定了团队，只分析该团队
         if self.team:
@@ -146,35 +168,70 @@ class ReportDataService:
             else:
                 teams = Team.objects.all()[:10]  # 限制数量避免性能问题
         
+        teams = list(teams)
+        team_ids = [team.id for team in teams]
+        date_filters = {
+            'board__team__in': team_ids,
+            'created_at__date__gte': self.start_date,
+            'created_at__date__lte': self.end_date,
+        }
+        
+        # 团队任务统计，一次查询按团队聚合
+        team_totals = {
+            row['board__team']: row
+            for row in Task.objects.filter(**date_filters).values('board__team').annotate(
+                total_tasks=Count('id'),
+                completed_tasks=Count('id', filter=Q(status='done')),
+            )
+        }
+        
+        # 所有团队的活跃成员
+        memberships_by_team = defaultdict(list)
+        for membership in TeamMembership.objects.filter(
+            team_id__in=team_ids, status='active'
+        ).select_related('user'):
+            memberships_by_team[membership.team_id].append(membership)
+        
+        # 成员任务统计，一次查询按团队和受理人聚合
+        member_ids = {
+            membership.user_id
+            for memberships in memberships_by_team.values()
+            for membership in memberships
+        }
+        member_totals = {
+            (row['board__team'], row['assignees']): row
+            for row in Task.objects.filter(
+                **date_filters, assignees__in=member_ids
+            ).values('board__team', 'assignees').annotate(
+                total_tasks=Count('id'),
+                completed_tasks=Count('id', filter=Q(status='done')),
+                in_progress_tasks=Count('id', filter=Q(status='in_progress')),
+            )
+        } if member_ids else {}
+        
         team_stats = []
         for team in teams:
-            # 团队任务统计
-            team_filters = {
-                'board__team': team,
-                'created_at__date__gte': self.start_date,
-                'created_at__date__lte': self.end_date,
-            }
-            
-            total_tasks = Task.objects.filter(**team_filters).count()
-            completed_tasks = Task.objects.filter(**team_filters, status='done').count()
+            totals = team_totals.get(team.id, {})
+            total_tasks = totals.get('total_tasks', 0)
+            completed_tasks = totals.get('completed_tasks', 0)
             
             # 团队成员数量和详情
-            active_memberships = team.memberships.filter(status='active').select_related('user')
-            member_count = active_memberships.count()
+            active_memberships = memberships_by_team[team.id]
+            member_count = len(active_memberships)
             
             # 获取成员详细统计
             members_data = []
             for membership in active_memberships:
                 user = membership.user
                 # 用户任务统计
-                user_filters = {**team_filters, 'assignees': user}
-                user_total = Task.objects.filter(**user_filters).count()
-                user_completed = Task.objects.filter(**user_filters, status='done').count()
-                user_in_progress = Task.objects.filter(**user_filters, status='in_progress').count()
+                user_totals = member_totals.get((team.id, user.id), {})
+                user_total = user_totals.get('total_tasks', 0)
+                user_completed = user_totals.get('completed_tasks', 0)
+                user_in_progress = user_totals.get('in_progress_tasks', 0)
                 
                 # 计算生产力评分
                 productivity_score = (user_completed / user_total * 100) if user_total > 0 else 0
-                  # 确保 display_name 不为空
+                # 确保 display_name 不为空
                 display_name = (
                     getattr(user, 'nickname', None) or 
                     user.get_full_name() or 
@@ -227,18 +284,28 @@ class ReportDataService:
         
         boards = Board.objects.filter(**board_filters).distinct()
         
+        boards = list(boards)
+        
+        # 看板任务统计，一次查询按看板聚合
+        board_totals = {
+            row['board']: row
+            for row in Task.objects.filter(
+                board__in=[board.id for board in boards],
+                created_at__date__gte=self.start_date,
+                created_at__date__lte=self.end_date,
+            ).values('board').annotate(
+                total_tasks=Count('id'),
+                completed_tasks=Count('id', filter=Q(status='done')),
+                in_progress_tasks=Count('id', filter=Q(status='in_progress')),
+            )
+        }
+        
         project_stats = []
         for board in boards:
-            # 看板任务统计
-            task_filters = {
-                'board': board,
-                'created_at__date__gte': self.start_date,
-                'created_at__date__lte': self.end_date,
-            }
-            
-            total_tasks = Task.objects.filter(**task_filters).count()
-            completed_tasks = Task.objects.filter(**task_filters, status='done').count()
-            in_progress_tasks = Task.objects.filter(**task_filters, status='in_progress').count()
+            totals = board_totals.get(board.id, {})
+            total_tasks = totals.get('total_tasks', 0)
+            completed_tasks = totals.get('completed_tasks', 0)
+            in_progress_tasks = totals.get('in_progress_tasks', 0)
             
             # 进度计算
             progress_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
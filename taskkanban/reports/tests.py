@@ -3,9 +3,11 @@
 """
 import json
 from datetime import datetime, timedelta
+from io import StringIO
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from teams.models import Team, TeamMembership
 from boards.models import Board, BoardList, BoardMember
 from tasks.models import Task
@@ -197,3 +199,439 @@ class ReportViewsTestCase(TestCase):
         self.assertEqual(len(formatted['labels']), 3)
         self.assertEqual(len(formatted['datasets']), 1)
         self.assertEqual(len(formatted['datasets'][0]['data']), 3)
+
+
+class ReportDataServiceTestCase(TestCase):
+    """报表数据服务测试用例"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpassword'
+        )
+        self.team = Team.objects.create(name='测试团队', created_by=self.user)
+        for user in (self.user, self.other_user):
+            TeamMembership.objects.create(team=self.team, user=user, role='member', status='active')
+        
+        self.board = Board.objects.create(name='测试看板', owner=self.user, team=self.team)
+        board_list = BoardList.objects.create(name='待办事项', board=self.board, position=1024)
+        for i, status in enumerate(['done', 'done', 'in_progress', 'todo']):
+            task = Task.objects.create(
+                title=f'测试任务 {i+1}',
+                board=self.board,
+                board_list=board_list,
+                status=status,
+                creator=self.user
+            )
+            task.assignees.add(self.user if i < 3 else self.other_user)
+    
+    def get_service(self, days):
+        from reports.services import ReportDataService
+        
+        today = datetime.now().date()
+        return ReportDataService(start_date=today - timedelta(days=days), end_date=today, team=self.team)
+    
+    def test_grouped_stats(self):
+        """测试分组聚合结果"""
+        service = self.get_service(7)
+        
+        task_stats = service.get_task_completion_stats()
+        self.assertEqual(task_stats['total_tasks'], 4)
+        self.assertEqual(task_stats['completed_tasks'], 2)
+        self.assertEqual(len(task_stats['completion_trend']), 8)
+        self.assertEqual(task_stats['completion_trend'][-1]['completed'], 2)
+        
+        team = service.get_team_performance_stats()['team_stats'][0]
+        self.assertEqual((team['total_tasks'], team['completed_tasks'], team['member_count']), (4, 2, 2))
+        members = {member['username']: member for member in team['members']}
+        self.assertEqual(members['testuser']['total_tasks'], 3)
+        self.assertEqual(members['testuser']['completed_tasks'], 2)
+        self.assertEqual(members['otheruser']['total_tasks'], 1)
+        
+        project = service.get_project_progress_stats()['project_stats'][0]
+        self.assertEqual(
+            (project['total_tasks'], project['completed_tasks'], project['in_progress_tasks']),
+            (4, 2, 1)
+        )
+    
+    def test_query_count_independent_of_range(self):
+        """测试查询次数不随日期范围和成员数量增长"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as short_range:
+            self.get_service(7).get_dashboard_summary()
+        
+        User.objects.create_user(username='thirduser', email='third@example.com', password='testpassword')
+        TeamMembership.objects.create(
+            team=self.team, user=User.objects.get(username='thirduser'), status='active'
+        )
+        Board.objects.create(name='第二个看板', owner=self.user, team=self.team)
+        
+        with CaptureQueriesContext(connection) as long_range:
+            self.get_service(90).get_dashboard_summary()
+        
+        self.assertEqual(len(short_range), len(long_range))
+
+
+class DailyTaskMetricsTestCase(TestCase):
+    """每日任务指标汇总测试用例"""
+    
+    def setUp(self):
+        from tasks.workflow_models import TaskStatusHistory
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        self.board_list = BoardList.objects.create(name='待办事项', board=self.board, position=1024)
+        self.today = datetime.now().date()
+        
+        for i in range(3):
+            task = Task.objects.create(
+                title=f'测试任务 {i+1}',
+                board=self.board,
+                board_list=self.board_list,
+                status='done',
+                creator=self.user
+            )
+            task.assignees.add(self.user)
+            history = TaskStatusHistory.objects.create(
+                task=task, from_status='todo', to_status='done', changed_by=self.user
+            )
+            # 前两个任务在三天前完成，之后任务被编辑不影响完成日期
+            if i < 2:
+                TaskStatusHistory.objects.filter(pk=history.pk).update(
+                    created_at=timezone.now() - timedelta(days=3)
+                )
+    
+    def test_backfill_and_trend(self):
+        """测试回填后报表从汇总表读取完成趋势"""
+        from django.core.management import call_command
+        from reports.models import DailyTaskMetrics
+        from reports.services import ReportDataService
+        
+        call_command('backfill_task_metrics', stdout=StringIO())
+        
+        done_three_days_ago = DailyTaskMetrics.objects.get(
+            date=self.today - timedelta(days=3), board=self.board, assignee__isnull=True, status='done'
+        )
+        self.assertEqual(done_three_days_ago.transitions, 2)
+        self.assertTrue(DailyTaskMetrics.objects.filter(assignee=self.user).exists())
+        
+        service = ReportDataService(start_date=self.today - timedelta(days=7), end_date=self.today)
+        trend = {item['date']: item['completed'] for item in service.get_task_completion_stats()['completion_trend']}
+        self.assertEqual(trend[(self.today - timedelta(days=3)).strftime('%Y-%m-%d')], 2)
+        self.assertEqual(trend[self.today.strftime('%Y-%m-%d')], 1)
+    
+    def test_incremental_update(self):
+        """测试增量汇总从水位线当天重新计算"""
+        from reports.metrics import update_daily_task_metrics, get_daily_transitions
+        from tasks.workflow_models import TaskStatusHistory
+        
+        update_daily_task_metrics()
+        task = Task.objects.create(title='新任务', board=self.board, board_list=self.board_list, creator=self.user)
+        TaskStatusHistory.objects.create(task=task, from_status='todo', to_status='done', changed_by=self.user)
+        
+        # 尚未汇总的流转直接从状态历史读取
+        daily = get_daily_transitions(self.today - timedelta(days=7), self.today, 'done', board=self.board)
+        self.assertEqual(daily[self.today], 2)
+        
+        update_daily_task_metrics()
+        daily = get_daily_transitions(self.today - timedelta(days=7), self.today, 'done', user=self.user)
+        self.assertEqual(daily, {self.today - timedelta(days=3): 2, self.today: 1})
+
+
+
+class TaskExportTestCase(TestCase):
+    """任务明细流式导出测试用例"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpassword'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        board_list = BoardList.objects.create(name='待办事项', board=self.board, position=1024)
+        for i in range(3):
+            Task.objects.create(
+                title=f'测试任务 {i+1}', board=self.board, board_list=board_list, creator=self.user
+            )
+        # 无权访问的看板
+        other_board = Board.objects.create(name='其他看板', owner=other_user)
+        Task.objects.create(
+            title='其他任务', board=other_board,
+            board_list=BoardList.objects.create(name='待办事项', board=other_board, position=1024),
+            creator=other_user
+        )
+        
+        self.client = Client()
+        self.client.login(username='testuser', password='testpassword')
+        self.url = reverse('reports:export_tasks')
+    
+    def test_stream_csv(self):
+        """测试CSV流式导出只包含可访问的任务"""
+        response = self.client.get(self.url, {'export_format': 'csv'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8').lstrip('﻿').splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('ID,标题,看板'))
+        self.assertIn('测试任务 1,测试看板,待办事项,待办', lines[1])
+    
+    def test_stream_ndjson(self):
+        """测试NDJSON流式导出每行一个任务"""
+        response = self.client.get(self.url, {'export_format': 'ndjson'})
+        
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['测试任务 1', '测试任务 2', '测试任务 3'])
+        self.assertEqual(rows[0]['status'], 'todo')
+    
+    def test_export_follows_board_access(self):
+        """测试按看板访问权限导出：团队成员可导出团队看板，被移出看板的创建者不能导出"""
+        from teams.models import Team, TeamMembership
+        
+        owner = User.objects.get(username='otheruser')
+        team = Team.objects.create(name='测试团队', created_by=owner)
+        TeamMembership.objects.create(team=team, user=self.user, role='member', status='active')
+        team_board = Board.objects.create(name='团队看板', owner=owner, team=team)
+        Task.objects.create(
+            title='团队任务', board=team_board,
+            board_list=BoardList.objects.create(name='待办事项', board=team_board, position=1024),
+            creator=owner
+        )
+        # 用户创建的任务所在的看板已将其移出
+        Task.objects.create(
+            title='旧看板任务', board=Board.objects.get(name='其他看板'),
+            board_list=BoardList.objects.get(board__name='其他看板'), creator=self.user
+        )
+        
+        response = self.client.get(self.url, {'export_format': 'ndjson'})
+        titles = {json.loads(line)['title'] for line in b''.join(response.streaming_content).decode('utf-8').splitlines()}
+        self.assertIn('团队任务', titles)
+        self.assertNotIn('旧看板任务', titles)
+        self.assertNotIn('其他任务', titles)
+    
+    def test_rows_iterated_in_chunks(self):
+        """测试按分块迭代任务"""
+        from unittest import mock
+        from reports.export_services import TaskExportService
+        
+        service = TaskExportService(Task.objects.filter(board=self.board))
+        with mock.patch.object(TaskExportService, 'CHUNK_SIZE', 2):
+            self.assertEqual(len(list(service.iter_rows())), 3)
+
+
+class ReportExecutionTestCase(TestCase):
+    """报表异步执行测试用例"""
+    
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        board_list = BoardList.objects.create(name='待办事项', board=self.board, position=1024)
+        for i in range(2):
+            Task.objects.create(title=f'测试任务 {i+1}', board=self.board, board_list=board_list, creator=self.user)
+        self.report = Report.objects.create(
+            name='任务报表', report_type='task_completion', created_by=self.user, board=self.board
+        )
+        
+        self.client = Client()
+        self.client.login(username='testuser', password='testpassword')
+    
+    def run_report(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('reports:run', args=[self.report.pk]), data)
+    
+    def test_run_and_download(self):
+        """测试报表在后台生成文件，可按执行ID查询和下载"""
+        response = self.run_report(format='json')
+        self.assertEqual(response.status_code, 202)
+        
+        status_response = self.client.get(response.json()['status_url'])
+        data = status_response.json()
+        self.assertEqual(data['status'], 'completed')
+        self.assertEqual(data['record_count'], 2)
+        self.assertEqual(data['params']['board_id'], self.board.pk)
+        
+        download = self.client.get(response.json()['download_url'])
+        self.assertEqual(download.status_code, 200)
+        content = json.loads(b''.join(download.streaming_content).decode('utf-8'))
+        self.assertEqual(content['title'], '任务报表')
+        self.assertEqual(content['data']['summary']['total_tasks'], 2)
+    
+    def test_identical_runs_deduplicated(self):
+        """测试相同参数的重复运行复用已有执行"""
+        from reports.models import ReportExecution
+        
+        first = self.run_report(format='csv').json()
+        second = self.run_report(format='csv')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['id'], first['id'])
+        
+        other = self.run_report(format='csv', date_range=7).json()
+        self.assertNotEqual(other['id'], first['id'])
+        self.assertEqual(ReportExecution.objects.count(), 2)
+    
+    def test_other_users_cannot_access(self):
+        """测试其他用户不能查看执行结果"""
+        execution_id = self.run_report().json()['id']
+        User.objects.create_user(username='otheruser', email='other@example.com', password='testpassword')
+        self.client.login(username='otheruser', password='testpassword')
+        
+        response = self.client.get(reverse('reports:execution_download', args=[execution_id]))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_overrides_limited_to_accessible_scopes(self):
+        """测试不能通过覆盖参数导出无权访问的看板、团队和用户的统计"""
+        from reports.models import ReportExecution
+        from teams.models import Team
+        
+        stranger = User.objects.create_user(username='stranger', email='stranger@example.com', password='testpassword')
+        private_board = Board.objects.create(name='他人看板', owner=stranger)
+        team = Team.objects.create(name='他人团队', created_by=stranger)
+        
+        self.report.board = None
+        self.report.save()
+        for data in ({'board_id': private_board.pk}, {'team_id': team.pk}, {'assignee_id': stranger.pk}):
+            self.assertEqual(self.run_report(**data).status_code, 403)
+        self.assertFalse(ReportExecution.objects.exists())
+
+
+class DashboardWidgetCacheTestCase(TestCase):
+    """仪表板部件数据缓存测试用例"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from reports.models import Dashboard, DashboardWidget
+        
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        board_list = BoardList.objects.create(name='待办事项', board=self.board, position=1024)
+        Task.objects.create(title='测试任务', board=self.board, board_list=board_list, creator=self.user)
+        
+        self.dashboard = Dashboard.objects.create(name='团队仪表板', owner=self.user, refresh_interval=300)
+        self.widgets = [
+            DashboardWidget.objects.create(
+                dashboard=self.dashboard, title=title, widget_type='stats_card',
+                data_source={'source': source, 'board_id': self.board.pk}
+            )
+            for title, source in [('任务', 'task_stats'), ('负载', 'workload_stats'), ('任务2', 'task_stats')]
+        ]
+    
+    def test_widgets_share_computation_and_cache(self):
+        """测试同一仪表板的部件每种统计只计算一次，不计算未使用的统计，刷新间隔内不再查询"""
+        from unittest import mock
+        from reports.services import ReportDataService
+        from reports.widgets import get_widgets_data
+        
+        def spy(name):
+            return mock.patch.object(
+                ReportDataService, name, autospec=True, side_effect=getattr(ReportDataService, name)
+            )
+        
+        with spy('get_task_completion_stats') as task_stats, spy('get_user_workload_stats') as workload_stats, \
+                spy('get_team_performance_stats') as team_stats:
+            data = get_widgets_data(self.dashboard)
+        
+        self.assertEqual((task_stats.call_count, workload_stats.call_count, team_stats.call_count), (1, 1, 0))
+        self.assertEqual(data[self.widgets[0].pk]['total_tasks'], 1)
+        self.assertEqual(data[self.widgets[0].pk], data[self.widgets[2].pk])
+        
+        widgets = list(self.dashboard.widgets.all())
+        with self.assertNumQueries(0):
+            cached = get_widgets_data(self.dashboard, widgets)
+        self.assertEqual(cached[self.widgets[1].pk], data[self.widgets[1].pk])
+    
+    def test_locked_widget_serves_stale_data(self):
+        """测试其他进程正在计算时返回旧结果，过期后只由获得锁的进程计算"""
+        from django.core.cache import cache
+        from reports import widgets as widget_data
+        
+        widgets = list(self.dashboard.widgets.all())
+        widget_data.get_widgets_data(self.dashboard, widgets)
+        
+        source, filters = widget_data.normalize_source(self.widgets[0].data_source)
+        digest = widget_data.get_digest(source, filters)
+        key = widget_data.DATA_KEY.format(digest=digest)
+        entry = cache.get(key)
+        entry['computed_at'] -= 301
+        entry['data'] = {'total_tasks': 'stale'}
+        cache.set(key, entry)
+        cache.add(widget_data.LOCK_KEY.format(digest=digest), 1)
+        
+        with self.assertNumQueries(0):
+            data = widget_data.get_widgets_data(self.dashboard, widgets)
+        self.assertEqual(data[self.widgets[0].pk], {'total_tasks': 'stale'})
+        
+        cache.delete(widget_data.LOCK_KEY.format(digest=digest))
+        data = widget_data.get_widgets_data(self.dashboard, widgets)
+        self.assertEqual(data[self.widgets[0].pk]['total_tasks'], 1)
+    
+    def test_dashboard_data_view(self):
+        """测试仪表板数据接口只对有权限的用户开放"""
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.get(reverse('reports:dashboard_data', args=[self.dashboard.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['widgets']), 3)
+        
+        User.objects.create_user(username='otheruser', email='other@example.com', password='testpassword')
+        self.client.login(username='otheruser', password='testpassword')
+        response = self.client.get(reverse('reports:dashboard_data', args=[self.dashboard.pk]))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_invalid_and_inaccessible_sources(self):
+        """测试无效参数和所有者无权查看的数据范围返回部件错误"""
+        from reports.models import DashboardWidget
+        from reports.widgets import get_widgets_data
+        
+        other_board = Board.objects.create(
+            name='他人看板', owner=User.objects.create_user(username='stranger', password='testpassword')
+        )
+        widgets = [
+            DashboardWidget.objects.create(
+                dashboard=self.dashboard, title=str(i), widget_type='stats_card', data_source=data_source
+            )
+            for i, data_source in enumerate([
+                {'source': 'task_stats', 'date_range': 'abc'},
+                {'source': 'task_stats', 'board_id': [self.board.pk]},
+                {'source': 'task_stats', 'board_id': other_board.pk},
+            ])
+        ]
+        
+        data = get_widgets_data(self.dashboard, widgets)
+        for widget in widgets:
+            self.assertIn('error', data[widget.pk])
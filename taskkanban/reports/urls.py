@@ -21,10 +21,15 @@ urlpatterns = [
     path('list/', views.ReportListView.as_view(), name='list'),
     path('create/', views.ReportCreateView.as_view(), name='create'),
     path('<int:pk>/', views.ReportDetailView.as_view(), name='detail'),
+    path('<int:pk>/run/', views.ReportRunView.as_view(), name='run'),
+    path('dashboards/<int:pk>/data/', views.DashboardDataView.as_view(), name='dashboard_data'),
+    path('executions/<int:pk>/', views.ReportExecutionView.as_view(), name='execution'),
+    path('executions/<int:pk>/download/', views.ReportExecutionDownloadView.as_view(), name='execution_download'),
       # API接口
     path('api/data/', views.ReportDataAPIView.as_view(), name='api_data'),
     
     # 导出功能
     path('export/', views.ExportReportView.as_view(), name='export'),
     path('export/chart-data/', views.ExportChartDataView.as_view(), name='export_chart_data'),
+    path('export/tasks/', views.TaskExportView.as_view(), name='export_tasks'),
 ]
@@ -5,18 +5,21 @@ Reports应用视图
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import TemplateView, ListView, DetailView, CreateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse
 from django.contrib import messages
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils.translation import gettext as _
 from datetime import datetime, timedelta
 import json
+import os
 
-from .models import Report
+from .models import Dashboard, Report, ReportExecution
 from .forms import ReportFilterForm, ReportCreateForm, ChartConfigForm, ExportForm
 from .services import ReportDataService
 from .chart_services import ChartDataService
-from .export_services import ReportExportService, ChartExportService
+from .export_services import ReportExportService, ChartExportService, TaskExportService
+from .executions import open_result, serialize_execution, start_execution
+from .widgets import get_widgets_data
 
 
 class ReportIndexView(LoginRequiredMixin, TemplateView):
@@ -289,6 +292,65 @@ class ReportDetailView(LoginRequiredMixin, DetailView):
         return Report.objects.filter(created_by=self.request.user)
 
 
+class ReportRunView(LoginRequiredMixin, View):
+    """运行报表，在后台生成导出文件"""
+    
+    def post(self, request, pk):
+        report = get_object_or_404(Report, pk=pk, created_by=request.user)
+        try:
+            execution, created = start_execution(
+                report, request.user, request.POST.get('format', 'json'), request.POST
+            )
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        
+        data = serialize_execution(execution)
+        data['status_url'] = reverse('reports:execution', args=[execution.pk])
+        data['download_url'] = reverse('reports:execution_download', args=[execution.pk])
+        return JsonResponse(data, status=202 if execution.status != 'completed' else 200)
+
+
+class ReportExecutionView(LoginRequiredMixin, View):
+    """报表执行状态"""
+    
+    def get_execution(self, request, pk):
+        return get_object_or_404(ReportExecution, pk=pk, report__created_by=request.user)
+    
+    def get(self, request, pk):
+        return JsonResponse(serialize_execution(self.get_execution(request, pk)))
+
+
+class ReportExecutionDownloadView(ReportExecutionView):
+    """下载报表执行结果"""
+    
+    def get(self, request, pk):
+        execution = self.get_execution(request, pk)
+        result = open_result(execution)
+        if result is None:
+            return JsonResponse({'success': False, 'message': '报表尚未生成完成'}, status=409)
+        return FileResponse(result, as_attachment=True, filename=os.path.basename(execution.file_path))
+
+
+class DashboardDataView(LoginRequiredMixin, View):
+    """仪表板部件数据，在仪表板的刷新间隔内返回缓存结果"""
+    
+    def get(self, request, pk):
+        from django.db.models import Q
+        
+        user = request.user
+        dashboard = get_object_or_404(
+            Dashboard.objects.filter(
+                Q(owner=user) | Q(is_public=True) | Q(shared_users=user) |
+                Q(team__memberships__user=user, team__memberships__status='active')
+            ).distinct().select_related('owner'),
+            pk=pk
+        )
+        return JsonResponse({
+            'refresh_interval': dashboard.refresh_interval,
+            'widgets': get_widgets_data(dashboard),
+        })
+
+
 class ReportDataAPIView(LoginRequiredMixin, TemplateView):
     """报表数据API视图"""
     
@@ -477,6 +539,52 @@ class ExportReportView(LoginRequiredMixin, View):
             return HttpResponse(status=500)
 
 
+class TaskExportView(LoginRequiredMixin, View):
+    """任务明细流式导出视图"""
+    
+    def get_queryset(self):
+        from boards.permissions import get_viewable_board_ids
+        from tasks.models import Task, TaskAssignment
+        
+        user = self.request.user
+        filter_form = ReportFilterForm(self.request.GET, user=user)
+        valid = filter_form.is_valid()
+        
+        # 只导出用户当前可查看的看板中的任务，明确筛选的公开看板也可导出
+        board = filter_form.cleaned_data.get('board') if valid else None
+        queryset = Task.objects.filter(
+            board_id__in=get_viewable_board_ids(user, [board.pk] if board else [])
+        )
+        
+        if valid:
+            start_date, end_date = filter_form.get_date_range()
+            queryset = queryset.filter(created_at__date__gte=start_date, created_at__date__lte=end_date)
+            if filter_form.cleaned_data.get('team'):
+                queryset = queryset.filter(board__team=filter_form.cleaned_data['team'])
+            if filter_form.cleaned_data.get('board'):
+                queryset = queryset.filter(board=filter_form.cleaned_data['board'])
+            if filter_form.cleaned_data.get('user'):
+                queryset = queryset.filter(
+                    pk__in=TaskAssignment.objects.filter(user=filter_form.cleaned_data['user']).values('task')
+                )
+        return queryset
+    
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('export_format', 'csv')
+        export_service = TaskExportService(self.get_queryset())
+        
+        if export_format == 'csv':
+            return export_service.stream_csv()
+        elif export_format == 'ndjson':
+            return export_service.stream_ndjson()
+        elif export_format == 'xlsx':
+            try:
+                return export_service.export_to_xlsx()
+            except ImportError as e:
+                return HttpResponse(str(e), status=501)
+        return HttpResponse(f"不支持的导出格式: {export_format}", status=400)
+
+
 class ExportChartDataView(LoginRequiredMixin, View):
     """导出图表数据视图"""
     
@@ -0,0 +1,213 @@
+"""
+仪表板部件数据缓存
+部件数据按 data_source 的摘要缓存，相同数据源的部件（包括不同仪表板）共用一份结果，
+在所属仪表板的 refresh_interval 内直接返回缓存。
+
+一个仪表板的部件一次 get_many 读取缓存，过期的部件按筛选参数分组，
+同组的每种统计只计算一次，包含摘要时取 get_dashboard_summary 的结果。
+数据源中的看板、团队、用户须在仪表板所有者可查看的范围内。
+重新计算前以 cache.add 获取数据源的锁，只有一个进程计算；
+其他进程有旧结果时返回旧结果，没有时短暂等待计算结果。
+
+data_source 格式：
+    {"source": "summary" | "task_stats" | "workload_stats" | "team_stats" | "project_stats",
+     "date_range": 天数, "board_id": 看板ID, "team_id": 团队ID, "user_id": 用户ID}
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.utils import timezone
+
+from .permissions import check_scope_access
+from .services import ReportDataService
+
+logger = logging.getLogger(__name__)
+
+DATA_KEY = 'reports:widget:{digest}'
+LOCK_KEY = 'reports:widget:lock:{digest}'
+
+# 计算锁的超时时间，进程异常退出时锁自动释放
+LOCK_TIMEOUT = 60
+
+# 没有旧结果时等待其他进程计算的最长时间和轮询间隔
+LOCK_WAIT = 5
+LOCK_POLL_INTERVAL = 0.1
+
+DEFAULT_DATE_RANGE = 30
+
+# 数据源: ReportDataService 方法
+SOURCES = {
+    'task_stats': 'get_task_completion_stats',
+    'workload_stats': 'get_user_workload_stats',
+    'team_stats': 'get_team_performance_stats',
+    'project_stats': 'get_project_progress_stats',
+    'summary': None,
+}
+
+# 影响查询的筛选参数
+FILTER_KEYS = ('date_range', 'board_id', 'team_id', 'user_id')
+
+
+def normalize_source(data_source):
+    """补全默认值，返回 (数据源, 筛选参数)，数据源或筛选参数无效时抛出 ValueError"""
+    data_source = data_source or {}
+    if not isinstance(data_source, dict):
+        raise ValueError('数据源配置必须为对象')
+    source = data_source.get('source', 'summary')
+    if not isinstance(source, str) or source not in SOURCES:
+        raise ValueError(f'不支持的数据源: {source}')
+
+    filters = {'date_range': DEFAULT_DATE_RANGE}
+    for key in FILTER_KEYS:
+        value = data_source.get(key)
+        if value in (None, ''):
+            continue
+        # 布尔值也是 int 的子类，不作为有效ID
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f'{key} 必须为整数')
+        try:
+            filters[key] = int(value)
+        except ValueError:
+            raise ValueError(f'{key} 必须为整数')
+        if filters[key] <= 0:
+            raise ValueError(f'{key} 必须为正整数')
+    return source, tuple(sorted(filters.items()))
+
+
+def check_source_access(user, filters):
+    """检查用户能否查看筛选范围内的数据，无权限时抛出 PermissionDenied"""
+    params = dict(filters)
+    check_scope_access(user, params.get('board_id'), params.get('team_id'), params.get('user_id'))
+
+
+def get_digest(source, filters):
+    payload = json.dumps({'source': source, 'filters': filters}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def compute_group(filters, sources):
+    """同一组筛选参数下计算多个数据源，返回 {数据源: 数据}"""
+    from django.contrib.auth import get_user_model
+    from boards.models import Board
+    from teams.models import Team
+
+    params = dict(filters)
+
+    def get(model, key):
+        return model.objects.filter(pk=params[key]).first() if params.get(key) else None
+
+    end_date = timezone.localdate()
+    service = ReportDataService(
+        start_date=end_date - timedelta(days=params['date_range']),
+        end_date=end_date,
+        user=get(get_user_model(), 'user_id'),
+        team=get(Team, 'team_id'),
+        board=get(Board, 'board_id'),
+    )
+
+    if 'summary' in sources:
+        # 摘要需要全部统计，其他数据源直接取汇总中的结果
+        summary = service.get_dashboard_summary()
+        return {source: summary[source] for source in sources}
+
+    return {source: getattr(service, SOURCES[source])() for source in sources}
+
+
+def _is_fresh(entry, refresh_interval, now):
+    return entry is not None and now - entry['computed_at'] < refresh_interval
+
+
+def _wait_for(key, deadline):
+    """等待其他进程写入计算结果"""
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_widgets_data(dashboard, widgets=None):
+    """获取仪表板各部件的数据，返回 {部件ID: 数据}
+
+    数据源无效或超出仪表板所有者权限的部件返回 {'error': 错误信息}。
+    """
+    if widgets is None:
+        widgets = dashboard.widgets.filter(is_visible=True)
+    refresh_interval = max(dashboard.refresh_interval, 1)
+    now = time.time()
+
+    results = {}
+    digests = {}
+    # 每组筛选参数的权限检查结果，None 表示有权限
+    denied = {}
+    for widget in widgets:
+        try:
+            source, filters = normalize_source(widget.data_source)
+        except ValueError as e:
+            results[widget.pk] = {'error': str(e)}
+            continue
+
+        if filters not in denied:
+            # 数据范围按仪表板所有者的权限检查，共享或公开的仪表板不暴露所有者无权查看的数据
+            try:
+                check_source_access(dashboard.owner, filters)
+                denied[filters] = None
+            except PermissionDenied as e:
+                denied[filters] = str(e)
+        if denied[filters]:
+            results[widget.pk] = {'error': denied[filters]}
+            continue
+        digests[widget.pk] = (get_digest(source, filters), source, filters)
+
+    keys = {digest: DATA_KEY.format(digest=digest) for digest, _, _ in digests.values()}
+    cached = cache.get_many(list(keys.values()))
+    entries = {digest: cached.get(key) for digest, key in keys.items()}
+
+    # 需要由本进程计算的数据源，按筛选参数分组: {filters: {source: digest}}
+    groups = {}
+    waiting = []
+    locked = []
+    for digest, source, filters in set(digests.values()):
+        entry = entries[digest]
+        if _is_fresh(entry, refresh_interval, now):
+            continue
+        if cache.add(LOCK_KEY.format(digest=digest), 1, LOCK_TIMEOUT):
+            locked.append(digest)
+            groups.setdefault(filters, {})[source] = digest
+        elif entry is None:
+            waiting.append(digest)
+        # 其他进程正在计算且有旧结果时返回旧结果
+
+    try:
+        computed = {}
+        for filters, sources in groups.items():
+            for source, data in compute_group(filters, sources).items():
+                computed[sources[source]] = {'data': data, 'computed_at': time.time()}
+        if computed:
+            # 保留到下一个刷新周期结束，供计算期间的其他进程返回旧结果
+            cache.set_many(
+                {keys[digest]: entry for digest, entry in computed.items()},
+                refresh_interval * 2 + LOCK_TIMEOUT
+            )
+            entries.update(computed)
+    finally:
+        cache.delete_many([LOCK_KEY.format(digest=digest) for digest in locked])
+
+    deadline = time.monotonic() + LOCK_WAIT
+    for digest in waiting:
+        entry = _wait_for(keys[digest], deadline)
+        if entry is None:
+            # 等待超时，自行计算
+            _, source, filters = next(value for value in digests.values() if value[0] == digest)
+            entry = {'data': compute_group(filters, {source: digest})[source], 'computed_at': time.time()}
+        entries[digest] = entry
+
+    for widget_id, (digest, _, _) in digests.items():
+        results[widget_id] = entries[digest]['data']
+    return results
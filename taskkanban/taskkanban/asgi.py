@@ -11,14 +11,20 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from channels.security.websocket import AllowedHostsOriginValidator
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskkanban.settings')
 
+# 先初始化Django，再导入依赖模型的路由
+django_asgi_app = get_asgi_application()
+
+from boards.routing import websocket_urlpatterns as board_websocket_urlpatterns  # noqa: E402
+
 application = ProtocolTypeRouter({
-    'http': get_asgi_application(),
-    # 'websocket': AuthMiddlewareStack(
-    #     URLRouter([
-    #         # 后续添加WebSocket路由
-    #     ])
-    # ),
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        AuthMiddlewareStack(
+            URLRouter(board_websocket_urlpatterns)
+        )
+    ),
 })
@@ -62,6 +62,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.humanize',
     'django.contrib.sites',
+    'django.contrib.postgres',
       # 第三方应用
     'django_bootstrap5',
     'crispy_forms',
@@ -99,6 +100,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'boards.middleware.ActivityActorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -318,6 +320,17 @@ SERVER_EMAIL = DEFAULT_FROM_EMAIL
 # 邮件通知相关配置
 SITE_NAME = env('SITE_NAME', default='企业级任务看板')
 SITE_URL = env('SITE_URL', default='http://localhost:8000')
+# 退订链接使用签名令牌，不为每封邮件写入令牌记录
+NOTIFICATION_SIGNED_UNSUBSCRIBE = env.bool('NOTIFICATION_SIGNED_UNSUBSCRIBE', default=True)
+
+# 任务全文检索的文本搜索配置（PostgreSQL），中文内容默认按 simple 分词
+SEARCH_CONFIG = env('SEARCH_CONFIG', default='simple')
+
+# 看板 slug 的音译函数（点分路径），未设置时如安装了 pypinyin 则使用拼音
+SLUG_TRANSLITERATOR = env('SLUG_TRANSLITERATOR', default='')
+
+# 看板活动记录的保留天数，更早的记录每天清理
+BOARD_ACTIVITY_RETENTION_DAYS = env.int('BOARD_ACTIVITY_RETENTION_DAYS', default=180)
 
 # Celery配置 (异步任务)
 CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379/0')
@@ -347,6 +360,21 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'notifications.services.cleanup_old_notifications',
         'schedule': 604800.0,  # 每周执行一次
     },
+    'update-daily-task-metrics': {
+        'task': 'reports.metrics.update_daily_task_metrics',
+        'schedule': 3600.0,  # 每小时执行一次
+        'options': {'expires': 1800}
+    },
+    'run-scheduled-workflow-rules': {
+        'task': 'tasks.workflow_scheduler.run_scheduled_rules',
+        'schedule': 60.0,  # 每分钟执行一次
+        'options': {'expires': 50}
+    },
+    'purge-old-board-activities': {
+        'task': 'boards.activity.purge_old_activities',
+        'schedule': 86400.0,  # 每天执行一次
+        'options': {'expires': 3600}
+    },
 }
 
 # 日志配置
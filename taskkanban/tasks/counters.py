@@ -0,0 +1,61 @@
+"""
+任务计数字段维护
+评论、附件、子任务、受理人数量冗余保存在 Task 上，卡片渲染时无需额外查询
+
+计数在写入关联数据的同一事务内更新（见 tasks.signals）：
+新增、删除用 F() 增减，无法确定增量的变更（多对多移除、批量插入、子任务状态变化）
+用子查询重新统计。计数出现偏差时可运行 recount_task_counters 命令修复。
+"""
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+COUNTER_FIELDS = (
+    'comment_count',
+    'attachment_count',
+    'subtask_count',
+    'completed_subtask_count',
+    'assignee_count',
+)
+
+
+def _count_subquery(model, fk_field, condition=None):
+    queryset = model.objects.filter(**{fk_field: OuterRef('pk')})
+    if condition is not None:
+        queryset = queryset.filter(condition)
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(fk_field).annotate(total=Count('pk')).values('total')[:1]
+        ),
+        0
+    )
+
+
+def get_counter_expressions():
+    """各计数字段的统计表达式"""
+    from .models import SubTask, TaskAssignment, TaskAttachment, TaskComment
+
+    return {
+        'comment_count': _count_subquery(TaskComment, 'task'),
+        'attachment_count': _count_subquery(TaskAttachment, 'task'),
+        'subtask_count': _count_subquery(SubTask, 'parent_task'),
+        'completed_subtask_count': _count_subquery(SubTask, 'parent_task', Q(status='done')),
+        'assignee_count': _count_subquery(TaskAssignment, 'task'),
+    }
+
+
+def recount_task_counters(task_ids=None, fields=COUNTER_FIELDS):
+    """重新统计任务计数，task_ids 为 None 时统计所有任务，返回更新的任务数"""
+    from .models import Task
+
+    expressions = get_counter_expressions()
+    queryset = Task.objects.all()
+    if task_ids is not None:
+        queryset = queryset.filter(pk__in=task_ids)
+    return queryset.update(**{field: expressions[field] for field in fields})
+
+
+def increment_counter(task_id, field, delta=1):
+    """增减单个任务的计数，结果不小于0"""
+    from .models import Task
+
+    Task.objects.filter(pk=task_id).update(**{field: Greatest(F(field) + delta, 0)})
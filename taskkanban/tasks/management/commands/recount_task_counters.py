@@ -0,0 +1,29 @@
+"""
+重新统计任务计数字段
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.models import Board
+from tasks.counters import recount_task_counters
+
+
+class Command(BaseCommand):
+    help = '重新统计任务的评论、附件、子任务、受理人数量'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--board',
+            type=str,
+            help='只处理指定slug的看板',
+        )
+
+    def handle(self, *args, **options):
+        task_ids = None
+        if options['board']:
+            board = Board.objects.filter(slug=options['board']).first()
+            if board is None:
+                raise CommandError(f"看板不存在: {options['board']}")
+            task_ids = board.tasks.values_list('id', flat=True)
+
+        updated = recount_task_counters(task_ids)
+        self.stdout.write(self.style.SUCCESS(f'重新统计完成：更新 {updated} 个任务'))
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, fk_field, condition=None):
+    queryset = model.objects.filter(**{fk_field: OuterRef('pk')})
+    if condition is not None:
+        queryset = queryset.filter(condition)
+    return Coalesce(
+        Subquery(queryset.order_by().values(fk_field).annotate(total=Count('pk')).values('total')[:1]),
+        0
+    )
+
+
+def populate_counters(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskComment = apps.get_model('tasks', 'TaskComment')
+    TaskAttachment = apps.get_model('tasks', 'TaskAttachment')
+    SubTask = apps.get_model('tasks', 'SubTask')
+    TaskAssignment = apps.get_model('tasks', 'TaskAssignment')
+
+    Task.objects.update(
+        comment_count=count_subquery(TaskComment, 'task'),
+        attachment_count=count_subquery(TaskAttachment, 'task'),
+        subtask_count=count_subquery(SubTask, 'parent_task'),
+        completed_subtask_count=count_subquery(SubTask, 'parent_task', Q(status='done')),
+        assignee_count=count_subquery(TaskAssignment, 'task'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0003_workflowrule_workflowruleexecution_workflowstatus_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="assignee_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="分配人数"
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="attachment_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="附件数量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="comment_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="评论数量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="completed_subtask_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="已完成子任务数量"
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="subtask_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="子任务数量"
+            ),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:35
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# 全文检索和三元组索引只在 PostgreSQL 上创建，不记录在模型 Meta 中
+SEARCH_INDEXES = [
+    GinIndex(fields=['search_vector'], name='tasks_task_search_gin'),
+    GinIndex(fields=['title'], name='tasks_task_title_trgm', opclasses=['gin_trgm_ops']),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Task = apps.get_model('tasks', 'Task')
+    for index in SEARCH_INDEXES:
+        schema_editor.add_index(Task, index)
+
+    config = getattr(settings, 'SEARCH_CONFIG', 'simple')
+    Task.objects.update(search_vector=(
+        SearchVector('title', weight='A', config=config) +
+        SearchVector('description', weight='B', config=config)
+    ))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Task = apps.get_model('tasks', 'Task')
+    for index in SEARCH_INDEXES:
+        schema_editor.remove_index(Task, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0004_task_counters"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="task",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name="检索向量"
+            ),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boards", "0006_updated_at_index"),
+        ("tasks", "0005_task_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["updated_at", "id"], name="tasks_task_updated_da7eaf_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# 迁移时的调度规则副本，不依赖 tasks.workflow_scheduler 的当前实现
+SCHEDULED_TRIGGERS = ("time_scheduled", "due_date_near", "overdue")
+DUE_CHECK_INTERVAL = timedelta(minutes=15)
+MAX_LOOKAHEAD_DAYS = 366 * 4
+
+
+def next_fire_time(expression, after):
+    from celery.schedules import ParseException, crontab
+
+    parts = (expression or "").split()
+    if len(parts) != 5:
+        return None
+    minute, hour, day_of_month, month_of_year, day_of_week = parts
+    try:
+        schedule = crontab(
+            minute=minute,
+            hour=hour,
+            day_of_month=day_of_month,
+            month_of_year=month_of_year,
+            day_of_week=day_of_week,
+        )
+    except (ParseException, ValueError):
+        return None
+
+    start = timezone.localtime(after).replace(second=0, microsecond=0) + timedelta(minutes=1)
+    for offset in range(MAX_LOOKAHEAD_DAYS):
+        day = start.date() + timedelta(days=offset)
+        if (day.month not in schedule.month_of_year
+                or day.day not in schedule.day_of_month
+                or day.isoweekday() % 7 not in schedule.day_of_week):
+            continue
+        for hour in sorted(schedule.hour):
+            for minute in sorted(schedule.minute):
+                candidate = timezone.make_aware(datetime.combine(day, time(hour, minute)))
+                if candidate >= start:
+                    return candidate
+    return None
+
+
+def populate_next_run(apps, schema_editor):
+    WorkflowRule = apps.get_model("tasks", "WorkflowRule")
+    now = timezone.now()
+    for rule in WorkflowRule.objects.filter(is_active=True, trigger_type__in=SCHEDULED_TRIGGERS):
+        if rule.schedule_cron:
+            rule.next_run_at = next_fire_time(rule.schedule_cron, now)
+        elif rule.trigger_type != "time_scheduled":
+            rule.next_run_at = now + DUE_CHECK_INTERVAL
+        else:
+            continue
+        rule.save(update_fields=["next_run_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("boards", "0006_updated_at_index"),
+        ("tasks", "0006_updated_at_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workflowrule",
+            name="next_run_at",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="下次执行时间"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["board", "due_date"], name="tasks_task_board_i_82453c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workflowrule",
+            index=models.Index(
+                fields=["is_active", "next_run_at"],
+                name="tasks_workf_is_acti_0263f6_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workflowruleexecution",
+            index=models.Index(
+                fields=["rule", "task"], name="tasks_workf_rule_id_3f8f8d_idx"
+            ),
+        ),
+        migrations.RunPython(populate_next_run, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.core.validators import MinLengthValidator, MaxValueValidator, MinValueValidator
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 import uuid
 
+from .counters import COUNTER_FIELDS
+
 # 导入工作流相关模型
 from .workflow_models import (
     WorkflowStatus, WorkflowTransition, TaskStatusHistory, 
@@ -135,6 +138,16 @@ class Task(models.Model):
         verbose_name=_('完成人')
     )
     
+    # 统计计数（由 tasks.signals 维护）
+    assignee_count = models.PositiveIntegerField(_('分配人数'), default=0, editable=False)
+    comment_count = models.PositiveIntegerField(_('评论数量'), default=0, editable=False)
+    attachment_count = models.PositiveIntegerField(_('附件数量'), default=0, editable=False)
+    subtask_count = models.PositiveIntegerField(_('子任务数量'), default=0, editable=False)
+    completed_subtask_count = models.PositiveIntegerField(_('已完成子任务数量'), default=0, editable=False)
+    
+    # 全文检索向量（仅 PostgreSQL，由 tasks.signals 更新，索引见迁移 0005）
+    search_vector = SearchVectorField(_('检索向量'), null=True, editable=False)
+    
     # 系统字段
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
     updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
@@ -148,12 +161,41 @@ class Task(models.Model):
             models.Index(fields=['board', 'board_list', 'position']),
             models.Index(fields=['creator', '-created_at']),
             models.Index(fields=['due_date']),
+            # 截止日期规则按看板查询
+            models.Index(fields=['board', 'due_date']),
             models.Index(fields=['status', '-updated_at']),
+            # API 游标分页
+            models.Index(fields=['updated_at', 'id']),
         ]
     
+    # 由信号维护的字段
+    DERIVED_FIELDS = COUNTER_FIELDS + ('search_vector',)
+
+    # 影响看板计数的字段，保存时与加载时的值比较（见 boards.signals）
+    COUNTED_FIELDS = ('board_id', 'board_list_id', 'status', 'is_archived')
+
     def __str__(self):
         return self.title
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted_state = instance.get_counted_state()
+        instance._search_state = instance.get_search_state()
+        return instance
+
+    def get_search_state(self):
+        """当前影响检索向量的字段值，有字段未加载时返回None"""
+        if self.get_deferred_fields().intersection(('title', 'description')):
+            return None
+        return (self.title, self.description)
+
+    def get_counted_state(self):
+        """当前影响看板计数的字段值，有字段未加载时返回None"""
+        if self.get_deferred_fields().intersection(self.COUNTED_FIELDS):
+            return None
+        return tuple(getattr(self, field) for field in self.COUNTED_FIELDS)
+
     def save(self, *args, **kwargs):
         # 自动设置完成时间和完成人
         if self.status == 'done' and not self.completed_at:
@@ -163,7 +205,24 @@ class Task(models.Model):
             self.completed_at = None
             self.completed_by = None
         
-        super().save(*args, **kwargs)
+        # 计数字段和检索向量只由信号更新，保存任务时不写回内存中可能过期的值
+        if not self._state.adding and kwargs.get('update_fields') is None and not args:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        
+        if self._state.adding or self.pk is None:
+            super().save(*args, **kwargs)
+            return
+        
+        with transaction.atomic(using=kwargs.get('using')):
+            # 锁定任务行并以数据库中的当前状态作为计数增量的起点，
+            # 并发保存同一任务时后保存的一方看到前者的结果，不会重复增减计数
+            self._counted_state = type(self).objects.select_for_update().filter(
+                pk=self.pk
+            ).values_list(*self.COUNTED_FIELDS).first()
+            super().save(*args, **kwargs)
     
     @property
     def is_overdue(self):
@@ -179,31 +238,6 @@ class Task(models.Model):
             delta = self.due_date - timezone.now()
             return delta.days
         return None
-    
-    @property
-    def assignee_count(self):
-        """分配人数"""
-        return self.assignees.count()
-    
-    @property
-    def comment_count(self):
-        """评论数量"""
-        return self.comments.count()
-    
-    @property
-    def attachment_count(self):
-        """附件数量"""
-        return self.attachments.count()
-    
-    @property
-    def subtask_count(self):
-        """子任务数量"""
-        return self.subtasks.count()
-    
-    @property
-    def completed_subtask_count(self):
-        """已完成子任务数量"""
-        return self.subtasks.filter(status='done').count()
 
 
 class TaskAssignment(models.Model):
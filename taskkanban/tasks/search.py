@@ -0,0 +1,121 @@
+"""
+任务搜索服务
+按数据库选择搜索后端，返回按相关度排序的任务
+
+PostgreSQL 使用 Task.search_vector 全文检索（GIN 索引），并以标题的 pg_trgm
+三元组索引支持模糊匹配和子串匹配；search_vector 在任务保存后由 tasks.signals 更新。
+子串匹配使用 ILIKE 而不是 icontains，icontains 生成的 UPPER(title) LIKE 无法使用标题上的三元组索引。
+其他数据库（如测试使用的 SQLite）退回到逐词 icontains 匹配，按命中字段加权排序。
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Case, F, IntegerField, Lookup, Q, Value, When
+from django.db.models.functions import Greatest
+
+# 标题权重高于描述
+TITLE_WEIGHT = 'A'
+DESCRIPTION_WEIGHT = 'B'
+
+
+def get_search_config():
+    """全文检索使用的文本搜索配置"""
+    return getattr(settings, 'SEARCH_CONFIG', 'simple')
+
+
+class ILike(Lookup):
+    """PostgreSQL ILIKE，可使用 gin_trgm_ops 索引"""
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', lhs_params + rhs_params
+
+
+def like_contains(value):
+    """转义 LIKE 通配符，返回子串匹配模式"""
+    return '%' + re.sub(r'([%_\\])', r'\\\1', value) + '%'
+
+
+class SimpleSearchBackend:
+    """通用搜索后端：每个词须出现在标题或描述中，标题命中计2分，描述命中计1分"""
+
+    def search(self, queryset, query):
+        terms = query.split()
+        if not terms:
+            return queryset
+
+        rank = Value(0)
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+            rank = rank + Case(
+                When(title__icontains=term, then=Value(2)), default=Value(0), output_field=IntegerField()
+            ) + Case(
+                When(description__icontains=term, then=Value(1)), default=Value(0), output_field=IntegerField()
+            )
+        return queryset.annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+
+    def update_vectors(self, task_ids):
+        """通用后端不使用检索向量"""
+
+
+class PostgresSearchBackend:
+    """PostgreSQL 全文检索与三元组模糊匹配"""
+
+    def get_vector(self):
+        from django.contrib.postgres.search import SearchVector
+
+        config = get_search_config()
+        return (
+            SearchVector('title', weight=TITLE_WEIGHT, config=config) +
+            SearchVector('description', weight=DESCRIPTION_WEIGHT, config=config)
+        )
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+
+        query = query.strip()
+        if not query:
+            return queryset
+
+        search_query = SearchQuery(query, config=get_search_config(), search_type='websearch')
+        return queryset.filter(
+            Q(search_vector=search_query) |
+            Q(title__trigram_similar=query) |
+            Q(ILike(F('title'), like_contains(query)))
+        ).annotate(
+            search_rank=Greatest(
+                SearchRank(F('search_vector'), search_query),
+                TrigramSimilarity('title', query)
+            )
+        ).order_by('-search_rank', '-created_at')
+
+    def update_vectors(self, task_ids):
+        """重新计算任务的检索向量"""
+        from .models import Task
+
+        Task.objects.filter(pk__in=task_ids).update(search_vector=self.get_vector())
+
+
+def get_search_backend(using=None):
+    """按数据库类型获取搜索后端"""
+    from .models import Task
+
+    using = using or router.db_for_read(Task)
+    if connections[using].vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
+
+
+def search_tasks(queryset, query):
+    """在任务查询集中搜索，结果带 search_rank 注解并按相关度排序"""
+    return get_search_backend(queryset.db).search(queryset, query)
+
+
+def update_search_vectors(task_ids):
+    """任务标题或描述变更后更新检索向量"""
+    from .models import Task
+
+    get_search_backend(router.db_for_write(Task)).update_vectors(task_ids)
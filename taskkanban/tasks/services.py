@@ -0,0 +1,237 @@
+"""
+Tasks应用服务
+任务批量操作等业务逻辑
+"""
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from boards.activity import record_activities
+from boards.changes import record_changes
+from boards.counters import recount_board_counters
+from boards.permissions import BOARD_EDIT_ROLES, roles_for
+from boards.realtime import publish_cards_updated
+from boards.snapshots import bump_board_version_on_commit
+
+from . import workflow_engine
+from .counters import recount_task_counters
+from .models import Task, TaskAssignment
+from .workflow_models import TaskStatusHistory
+
+
+class TaskBatchService:
+    """
+    任务批量操作服务
+
+    一次查询解析所有任务是否存在，看板角色由权限服务批量解析，
+    之后每种操作都以单条 UPDATE ... WHERE id IN 或批量插入完成，
+    查询次数与任务数量无关。
+    """
+
+    # 单个任务的处理结果
+    RESULT_UPDATED = 'updated'
+    RESULT_SKIPPED = 'skipped'
+    RESULT_NOT_FOUND = 'not_found'
+    RESULT_FORBIDDEN = 'forbidden'
+    RESULT_INVALID_BOARD = 'invalid_board'
+
+    def __init__(self, user, task_ids):
+        self.user = user
+        self.results = {}
+        # 可编辑任务: {task_id: board_id}
+        self.tasks = {}
+        self._resolve(task_ids)
+
+    def _resolve(self, task_ids):
+        """解析任务ID和权限"""
+        ids = []
+        for task_id in task_ids:
+            try:
+                ids.append(int(task_id))
+            except (TypeError, ValueError):
+                self.results[str(task_id)] = self.RESULT_NOT_FOUND
+
+        existing = {
+            task_id: (board_id, creator_id)
+            for task_id, board_id, creator_id in Task.objects.filter(
+                id__in=ids
+            ).values_list('id', 'board_id', 'creator_id')
+        }
+        editable = self.get_editable_ids(existing)
+
+        for task_id in ids:
+            if task_id not in existing:
+                self.results[task_id] = self.RESULT_NOT_FOUND
+            elif task_id not in editable:
+                self.results[task_id] = self.RESULT_FORBIDDEN
+            else:
+                # 先占位以保持请求顺序，执行操作后更新
+                self.results[task_id] = self.RESULT_SKIPPED
+                self.tasks[task_id] = existing[task_id][0]
+
+    def get_editable_ids(self, existing):
+        """用户可编辑的任务：创建者、看板所有者或管理员，以及被分配人"""
+        roles = roles_for(self.user, {board_id for board_id, _ in existing.values()})
+        editable = {
+            task_id
+            for task_id, (board_id, creator_id) in existing.items()
+            if creator_id == self.user.id or roles[board_id] in BOARD_EDIT_ROLES
+        }
+
+        remaining = set(existing) - editable
+        if remaining:
+            editable.update(TaskAssignment.objects.filter(
+                task_id__in=remaining, user=self.user
+            ).values_list('task_id', flat=True))
+        return editable
+
+    @property
+    def task_ids(self):
+        return list(self.tasks)
+
+    @property
+    def count(self):
+        return sum(1 for result in self.results.values() if result == self.RESULT_UPDATED)
+
+    def get_results(self):
+        """按请求顺序返回每个任务的处理结果"""
+        return [{'id': task_id, 'result': result} for task_id, result in self.results.items()]
+
+    def _mark_updated(self, task_ids):
+        for task_id in task_ids:
+            self.results[task_id] = self.RESULT_UPDATED
+
+    def _group_by_board(self, task_ids):
+        """按看板分组任务ID"""
+        task_ids_by_board = {}
+        for task_id in task_ids:
+            task_ids_by_board.setdefault(self.tasks[task_id], []).append(task_id)
+        return task_ids_by_board
+
+    def _after_update(self, task_ids, **changes):
+        """批量更新不会触发模型信号，这里统一处理快照、变更日志、活动记录和实时推送"""
+        if 'is_archived' in changes:
+            action, verb = 'archive_task', '归档'
+        elif 'list_id' in changes:
+            action, verb = 'move_task', '移动'
+        else:
+            action, verb = 'update_task', '更新'
+
+        for board_id, board_task_ids in self._group_by_board(task_ids).items():
+            bump_board_version_on_commit(board_id)
+            record_changes(board_id, 'task', board_task_ids, 'updated')
+            record_activities(
+                board_id, action, 'task',
+                [(task_id, f'批量{verb}了任务 #{task_id}') for task_id in board_task_ids],
+                user_id=self.user.id, metadata=changes
+            )
+            publish_cards_updated(board_id, board_task_ids, **changes)
+
+        self._mark_updated(task_ids)
+
+    def _update(self, task_ids, **fields):
+        if task_ids:
+            Task.objects.filter(id__in=task_ids).update(updated_at=timezone.now(), **fields)
+
+    def _recount_boards(self, task_ids):
+        """归档、状态、列表变化影响看板计数，批量更新不触发信号，重新统计涉及的看板"""
+        if task_ids:
+            recount_board_counters(list(self._group_by_board(task_ids)))
+
+    def archive(self):
+        """软删除"""
+        self._update(self.task_ids, is_archived=True)
+        self._recount_boards(self.task_ids)
+        self._after_update(self.task_ids, is_archived=True)
+
+    def change_status(self, new_status):
+        """变更状态，同时维护完成时间（与 Task.save 的规则一致），并记录状态历史"""
+        now = timezone.now()
+        changed = list(
+            Task.objects.filter(id__in=self.task_ids).exclude(status=new_status).values_list('id', 'status')
+        )
+        TaskStatusHistory.objects.bulk_create([
+            TaskStatusHistory(
+                task_id=task_id,
+                from_status=old_status,
+                to_status=new_status,
+                changed_by=self.user
+            )
+            for task_id, old_status in changed
+        ])
+        if new_status == 'done':
+            self._update(
+                self.task_ids,
+                status=new_status,
+                completed_at=Coalesce('completed_at', now),
+                progress=100
+            )
+        else:
+            self._update(
+                self.task_ids,
+                status=new_status,
+                completed_at=None,
+                completed_by=None
+            )
+        self._recount_boards(self.task_ids)
+        self._after_update(self.task_ids, status=new_status)
+        workflow_engine.dispatch([
+            workflow_engine.TaskEvent('status_change', task_id, self.tasks[task_id], from_status=old_status)
+            for task_id, old_status in changed
+        ])
+
+    def change_priority(self, new_priority):
+        """变更优先级"""
+        self._update(self.task_ids, priority=new_priority)
+        self._after_update(self.task_ids, priority=new_priority)
+
+    def assign(self, assignee):
+        """分配给指定用户，assignee 为 None 时清空分配"""
+        task_ids = self.task_ids
+        if assignee:
+            TaskAssignment.objects.bulk_create(
+                [
+                    TaskAssignment(task_id=task_id, user=assignee, assigned_by=self.user)
+                    for task_id in task_ids
+                ],
+                ignore_conflicts=True
+            )
+            for board_id, board_task_ids in self._group_by_board(task_ids).items():
+                record_changes(board_id, 'assignment', board_task_ids, 'created', user_id=assignee.id)
+            # 批量插入不触发信号，已存在的分配会被忽略，重新统计受理人数
+            recount_task_counters(task_ids, fields=['assignee_count'])
+        else:
+            # 逐行删除会为每条分配触发信号，这里直接删除，按看板记录被移除的分配后统一重新统计
+            assignments = TaskAssignment.objects.filter(task_id__in=task_ids)
+            removed = list(assignments.values_list('task_id', 'user_id'))
+            if removed:
+                assignments._raw_delete(assignments.db)
+                removed_by_board = {}
+                for task_id, user_id in removed:
+                    removed_by_board.setdefault(self.tasks[task_id], []).append((task_id, user_id))
+                for board_id, pairs in removed_by_board.items():
+                    record_changes(
+                        board_id, 'assignment', [task_id for task_id, _ in pairs], 'deleted',
+                        user_ids=[user_id for _, user_id in pairs]
+                    )
+                recount_task_counters(task_ids, fields=['assignee_count'])
+
+        self._update(task_ids)
+        self._after_update(task_ids, assignee_id=assignee.id if assignee else None)
+        if assignee:
+            workflow_engine.dispatch([
+                workflow_engine.TaskEvent('task_assigned', task_id, self.tasks[task_id], assignee_id=assignee.id)
+                for task_id in task_ids
+            ])
+
+    def move_to_list(self, board_list):
+        """移动到目标列表，只处理与目标列表同看板的任务"""
+        task_ids = []
+        for task_id, board_id in self.tasks.items():
+            if board_id == board_list.board_id:
+                task_ids.append(task_id)
+            else:
+                self.results[task_id] = self.RESULT_INVALID_BOARD
+
+        self._update(task_ids, board_list=board_list)
+        self._recount_boards(task_ids)
+        self._after_update(task_ids, list_id=board_list.id)
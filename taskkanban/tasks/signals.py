@@ -0,0 +1,170 @@
+"""
+Tasks应用信号处理
+关联数据变更时维护任务上的计数字段，任务保存后更新检索向量，
+任务创建、状态变更和分配时触发工作流规则，规则变更时使规则索引失效
+"""
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+
+from boards.models import Board
+
+from . import workflow_engine
+from .counters import increment_counter, recount_task_counters
+from .models import SubTask, Task, TaskAssignment, TaskAttachment, TaskComment
+from .search import update_search_vectors
+from .workflow_models import WorkflowRule
+
+# 影响检索向量的字段
+SEARCH_FIELDS = {'title', 'description'}
+
+
+@receiver(post_save, sender=TaskComment)
+@receiver(post_save, sender=TaskAttachment)
+def related_created(sender, instance, created, **kwargs):
+    """新增评论、附件"""
+    if created:
+        field = 'comment_count' if sender is TaskComment else 'attachment_count'
+        increment_counter(instance.task_id, field)
+
+
+@receiver(post_delete, sender=TaskComment)
+@receiver(post_delete, sender=TaskAttachment)
+def related_deleted(sender, instance, **kwargs):
+    """删除评论、附件"""
+    field = 'comment_count' if sender is TaskComment else 'attachment_count'
+    increment_counter(instance.task_id, field, -1)
+
+
+@receiver(post_save, sender=SubTask)
+def subtask_saved(sender, instance, created, **kwargs):
+    """新增或更新子任务"""
+    if created:
+        increment_counter(instance.parent_task_id, 'subtask_count')
+        if instance.status == 'done':
+            increment_counter(instance.parent_task_id, 'completed_subtask_count')
+    else:
+        # 状态可能变化，重新统计已完成数量
+        recount_task_counters([instance.parent_task_id], fields=['completed_subtask_count'])
+
+
+@receiver(post_delete, sender=SubTask)
+def subtask_deleted(sender, instance, **kwargs):
+    """删除子任务"""
+    increment_counter(instance.parent_task_id, 'subtask_count', -1)
+    if instance.status == 'done':
+        increment_counter(instance.parent_task_id, 'completed_subtask_count', -1)
+
+
+@receiver(post_save, sender=TaskAssignment)
+def assignment_saved(sender, instance, created, **kwargs):
+    """直接创建分配关系"""
+    if created:
+        increment_counter(instance.task_id, 'assignee_count')
+        # 已加载的任务直接取看板ID，否则只查询 board_id，不加载整个任务
+        if TaskAssignment.task.is_cached(instance):
+            board_id = instance.task.board_id
+        else:
+            board_id = Task.objects.filter(pk=instance.task_id).values_list('board_id', flat=True).first()
+        workflow_engine.dispatch([workflow_engine.TaskEvent(
+            'task_assigned', instance.task_id, board_id, assignee_id=instance.user_id
+        )])
+
+
+@receiver(post_delete, sender=TaskAssignment)
+def assignment_deleted(sender, instance, **kwargs):
+    """直接删除分配关系"""
+    increment_counter(instance.task_id, 'assignee_count', -1)
+
+
+@receiver(m2m_changed, sender=Task.assignees.through)
+def assignees_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """通过 task.assignees 或 user.assigned_tasks 增删分配关系
+
+    remove 的 pk_set 包含未分配的用户，这里统一重新统计。
+    """
+    if reverse and action == 'pre_clear':
+        # 从用户一侧 clear() 时 post_clear 不带 pk_set，先记下涉及的任务
+        instance._cleared_task_ids = list(
+            TaskAssignment.objects.filter(user=instance).values_list('task_id', flat=True)
+        )
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        task_ids = [instance.pk]
+    elif action == 'post_clear':
+        task_ids = getattr(instance, '_cleared_task_ids', [])
+    else:
+        task_ids = pk_set or []
+
+    if task_ids:
+        recount_task_counters(task_ids, fields=['assignee_count'])
+
+    if action == 'post_add' and pk_set:
+        # m2m 的 add() 批量插入，不触发分配关系的 post_save
+        if reverse:
+            events = [
+                workflow_engine.TaskEvent('task_assigned', task_id, board_id, assignee_id=instance.pk)
+                for task_id, board_id in Task.objects.filter(pk__in=pk_set).values_list('id', 'board_id')
+            ]
+        else:
+            events = [
+                workflow_engine.TaskEvent('task_assigned', instance.pk, instance.board_id, assignee_id=user_id)
+                for user_id in pk_set
+            ]
+        workflow_engine.dispatch(events)
+
+
+@receiver(post_save, sender=Task)
+def task_search_vector_saved(sender, instance, created, update_fields=None, **kwargs):
+    """任务新建或标题、描述与加载时不同时更新检索向量
+
+    Task.save 总是在 update_fields 中列出所有字段，因此比较加载时的值而不是字段列表。
+    """
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+
+    search_state = instance.get_search_state()
+    if created or search_state is None or search_state != getattr(instance, '_search_state', None):
+        update_search_vectors([instance.pk])
+    instance._search_state = search_state
+
+
+# 状态字段在 Task.COUNTED_FIELDS 中的位置
+STATUS_INDEX = Task.COUNTED_FIELDS.index('status')
+
+
+@receiver(pre_save, sender=Task)
+def task_status_before_save(sender, instance, **kwargs):
+    """记下加载时的状态，其他 post_save 处理器可能更新加载时的字段值"""
+    counted_state = getattr(instance, '_counted_state', None)
+    instance._loaded_status = counted_state[STATUS_INDEX] if counted_state else None
+
+
+@receiver(post_save, sender=Task)
+def task_workflow_rules(sender, instance, created, **kwargs):
+    """任务创建或状态变更时触发工作流规则"""
+    if created:
+        workflow_engine.dispatch_event('task_created', instance)
+        return
+
+    from_status = getattr(instance, '_loaded_status', None)
+    if from_status is not None and from_status != instance.status:
+        workflow_engine.dispatch_event('status_change', instance, from_status=from_status)
+
+
+@receiver(post_save, sender=WorkflowRule)
+@receiver(post_delete, sender=WorkflowRule)
+def workflow_rule_changed(sender, instance, **kwargs):
+    """规则变更后重建看板的规则索引"""
+    workflow_engine.invalidate_rules(instance.board_id)
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_delete, sender=Board)
+def board_rules_changed(sender, instance, created=False, **kwargs):
+    """新建或删除看板时清除该ID的规则索引，数据库可能复用看板ID"""
+    if created or kwargs.get('signal') is post_delete:
+        workflow_engine.invalidate_rules(instance.pk)
@@ -2,12 +2,16 @@
 Tasks应用测试
 任务管理相关测试
 """
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+import json
 
-from .models import Task, TaskComment, TaskAttachment
+from .models import Task, TaskAssignment, TaskComment, TaskAttachment
 from boards.models import Board, BoardList, BoardLabel
 from teams.models import Team, TeamMembership
 
@@ -104,7 +108,59 @@ class TaskViewTest(TestCase):
         
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '测试任务')
-    
+
+    def test_task_list_search_ranked(self):
+        """测试任务搜索按相关度排序，标题命中优先于描述命中"""
+        in_description = Task.objects.create(
+            title='整理文档', description='修复登录页面样式',
+            board=self.board, board_list=self.board_list, creator=self.user
+        )
+        in_title = Task.objects.create(
+            title='修复登录问题', description='用户反馈',
+            board=self.board, board_list=self.board_list, creator=self.user
+        )
+        Task.objects.create(
+            title='修复导出', board=self.board, board_list=self.board_list, creator=self.user
+        )
+
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('tasks:list'), {'q': '修复 登录'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['tasks']), [in_title, in_description])
+
+    def test_search_vector_updated_only_when_text_changes(self):
+        """测试只有标题或描述变化时才更新检索向量"""
+        from unittest import mock
+        
+        task = Task.objects.get(pk=self.task.pk)
+        with mock.patch('tasks.signals.update_search_vectors') as update:
+            task.status = 'in_progress'
+            task.progress = 50
+            task.save()
+            update.assert_not_called()
+            
+            task.title = '测试任务-已修改'
+            task.save()
+            update.assert_called_once_with([task.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', '三元组索引只在 PostgreSQL 上创建')
+    def test_substring_search_uses_ilike(self):
+        """测试 PostgreSQL 上子串匹配使用可走三元组索引的 ILIKE，并转义通配符"""
+        from .search import search_tasks
+        
+        Task.objects.create(
+            title='发布 100% 完成', board=self.board, board_list=self.board_list, creator=self.user
+        )
+        Task.objects.create(
+            title='发布 1000 完成', board=self.board, board_list=self.board_list, creator=self.user
+        )
+        queryset = search_tasks(Task.objects.all(), '100%')
+        
+        self.assertIn('ILIKE', str(queryset.query))
+        self.assertNotIn('UPPER("tasks_task"."title"', str(queryset.query))
+        self.assertIn('发布 100% 完成', [task.title for task in queryset])
+
     def test_task_detail_view(self):
         """测试任务详情页面"""
         self.client.login(username='testuser', password='testpass123')
@@ -112,3 +168,514 @@ class TaskViewTest(TestCase):
         
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.task.title)
+
+
+class TaskBatchOperationTest(TestCase):
+    """任务批量操作测试"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(
+            name='测试看板',
+            owner=self.user,
+            template='kanban'
+        )
+        self.board_list = BoardList.objects.create(name='待办', board=self.board, position=1)
+        self.done_list = BoardList.objects.create(name='已完成', board=self.board, position=2)
+        self.tasks = [
+            Task.objects.create(
+                title=f'任务{i}',
+                board=self.board,
+                board_list=self.board_list,
+                creator=self.user
+            )
+            for i in range(5)
+        ]
+        self.url = reverse('tasks:batch_operation')
+        self.client.login(username='testuser', password='testpass123')
+    
+    def post(self, data):
+        return self.client.post(self.url, json.dumps(data), content_type='application/json')
+    
+    def test_change_status_constant_queries(self):
+        """测试批量变更状态的查询次数与任务数量无关"""
+        task_ids = [task.id for task in self.tasks]
+        # 会话、用户、任务存在性、权限、状态历史、UPDATE、看板计数以及事务保存点
+        with self.assertNumQueries(11):
+            response = self.post({'action': 'change_status', 'task_ids': task_ids, 'new_status': 'done'})
+        
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['count'], 5)
+        for task in Task.objects.filter(id__in=task_ids):
+            self.assertEqual(task.status, 'done')
+            self.assertIsNotNone(task.completed_at)
+    
+    def test_per_id_results(self):
+        """测试返回每个任务的处理结果"""
+        other_board = Board.objects.create(name='其他看板', owner=self.other_user)
+        other_list = BoardList.objects.create(name='待办', board=other_board, position=1)
+        other_task = Task.objects.create(
+            title='其他任务',
+            board=other_board,
+            board_list=other_list,
+            creator=self.other_user
+        )
+        
+        response = self.post({
+            'action': 'change_priority',
+            'task_ids': [self.tasks[0].id, other_task.id, 999999],
+            'new_priority': 'urgent'
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'id': self.tasks[0].id, 'result': 'updated'},
+            {'id': other_task.id, 'result': 'forbidden'},
+            {'id': 999999, 'result': 'not_found'},
+        ])
+        other_task.refresh_from_db()
+        self.assertEqual(other_task.priority, 'normal')
+    
+    def test_no_permission(self):
+        """测试无权限用户"""
+        self.client.login(username='otheruser', password='testpass123')
+        response = self.post({
+            'action': 'change_status',
+            'task_ids': [self.tasks[0].id],
+            'new_status': 'done'
+        })
+        
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('permission', response.json()['error'].lower())
+    
+    def test_unassign_constant_queries(self):
+        """测试批量清空分配的查询次数与任务数量和分配数量无关"""
+        from boards.models import BoardChange
+        
+        task_ids = [task.id for task in self.tasks]
+        assignees = [self.user, self.other_user, User.objects.create_user(username='third', password='testpass123')]
+        for task in self.tasks:
+            task.assignees.add(*assignees)
+        
+        # 会话、用户、任务存在性、权限、读取分配、删除、受理人数、UPDATE以及事务保存点
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(10):
+                response = self.post({'action': 'assign', 'task_ids': task_ids, 'assignee_id': None})
+        
+        self.assertEqual(response.json()['count'], 5)
+        self.assertFalse(TaskAssignment.objects.filter(task_id__in=task_ids).exists())
+        self.assertEqual(set(Task.objects.filter(id__in=task_ids).values_list('assignee_count', flat=True)), {0})
+        self.assertEqual(
+            BoardChange.objects.filter(entity_type='assignment', action='deleted').count(), 15
+        )
+        self.assertEqual(
+            set(BoardChange.objects.filter(
+                entity_type='assignment', action='deleted', entity_id=task_ids[0]
+            ).values_list('user_id', flat=True)),
+            {user.id for user in assignees}
+        )
+    
+    def test_assign_and_move(self):
+        """测试批量分配和移动"""
+        task_ids = [task.id for task in self.tasks]
+        self.tasks[0].assignees.add(self.other_user)
+        
+        response = self.post({'action': 'assign', 'task_ids': task_ids, 'assignee_id': self.other_user.id})
+        self.assertEqual(response.json()['count'], 5)
+        self.assertEqual(self.other_user.assigned_tasks.count(), 5)
+        
+        response = self.post({'action': 'move_to_list', 'task_ids': task_ids, 'new_list_id': self.done_list.id})
+        self.assertEqual(response.json()['count'], 5)
+        self.assertEqual(self.done_list.tasks.count(), 5)
+
+
+class TaskSortTest(TestCase):
+    """任务拖拽排序测试"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        self.board_list = BoardList.objects.create(name='待办', board=self.board, position=1024)
+        self.other_list = BoardList.objects.create(name='进行中', board=self.board, position=2048)
+        self.tasks = [
+            Task.objects.create(
+                title=f'任务{i}',
+                board=self.board,
+                board_list=self.board_list,
+                creator=self.user,
+                position=(i + 1) * 1024
+            )
+            for i in range(3)
+        ]
+        self.url = reverse('tasks:sort')
+        self.client.login(username='testuser', password='testpass123')
+    
+    def sort(self, task, board_list, index):
+        return self.client.post(self.url, json.dumps({
+            'task_id': task.id,
+            'new_list_id': board_list.id,
+            'new_position': index
+        }), content_type='application/json')
+    
+    def get_order(self, board_list):
+        return list(board_list.tasks.order_by('position').values_list('id', flat=True))
+    
+    def test_move_only_updates_moved_task(self):
+        """测试拖拽只修改被移动任务的位置"""
+        first, second, third = self.tasks
+        response = self.sort(third, self.board_list, 1)
+        
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(self.get_order(self.board_list), [first.id, third.id, second.id])
+        third.refresh_from_db()
+        self.assertEqual(third.position, 1536)
+        self.assertEqual(
+            list(Task.objects.filter(id__in=[first.id, second.id]).values_list('position', flat=True)),
+            [1024, 2048]
+        )
+    
+    def test_archived_siblings_are_not_counted(self):
+        """测试拖拽位置只按看板上可见的未归档任务计算"""
+        first, archived, third = self.tasks
+        Task.objects.filter(id=archived.id).update(is_archived=True)
+        
+        response = self.sort(first, self.board_list, 1)
+        
+        self.assertTrue(response.json()['success'])
+        first.refresh_from_db()
+        self.assertEqual(first.position, 4096)
+        self.assertEqual(
+            list(self.board_list.tasks.filter(is_archived=False).order_by('position').values_list('id', flat=True)),
+            [third.id, first.id]
+        )
+    
+    def test_move_across_lists(self):
+        """测试跨列表移动"""
+        response = self.sort(self.tasks[0], self.other_list, 0)
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(self.get_order(self.other_list), [self.tasks[0].id])
+        self.assertEqual(self.get_order(self.board_list), [self.tasks[1].id, self.tasks[2].id])
+    
+    def test_rebalance_when_no_gap(self):
+        """测试相邻位置没有间隔时重排列表"""
+        Task.objects.filter(id=self.tasks[0].id).update(position=1)
+        Task.objects.filter(id=self.tasks[1].id).update(position=2)
+        
+        response = self.sort(self.tasks[2], self.board_list, 1)
+        
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(
+            self.get_order(self.board_list),
+            [self.tasks[0].id, self.tasks[2].id, self.tasks[1].id]
+        )
+        self.assertEqual(
+            list(self.board_list.tasks.order_by('position').values_list('position', flat=True)),
+            [1024, 1536, 2048]
+        )
+
+
+class TaskCounterTest(TestCase):
+    """任务计数字段测试"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        self.board_list = BoardList.objects.create(name='待办', board=self.board, position=1024)
+        self.task = Task.objects.create(
+            title='测试任务',
+            board=self.board,
+            board_list=self.board_list,
+            creator=self.user
+        )
+    
+    def get_counts(self):
+        task = Task.objects.get(pk=self.task.pk)
+        return (
+            task.comment_count, task.subtask_count,
+            task.completed_subtask_count, task.assignee_count
+        )
+    
+    def test_counters_follow_writes(self):
+        """测试关联数据增删时计数同步更新"""
+        from .models import SubTask
+        
+        comment = TaskComment.objects.create(task=self.task, user=self.user, content='评论')
+        TaskComment.objects.create(task=self.task, user=self.user, content='评论2')
+        subtask = SubTask.objects.create(parent_task=self.task, title='子任务')
+        SubTask.objects.create(parent_task=self.task, title='已完成子任务', status='done')
+        self.task.assignees.add(self.user, self.other_user)
+        self.assertEqual(self.get_counts(), (2, 2, 1, 2))
+        
+        comment.delete()
+        subtask.status = 'done'
+        subtask.save()
+        self.task.assignees.remove(self.other_user)
+        self.assertEqual(self.get_counts(), (1, 2, 2, 1))
+        
+        subtask.delete()
+        self.other_user.assigned_tasks.add(self.task)
+        self.user.assigned_tasks.clear()
+        self.assertEqual(self.get_counts(), (1, 1, 1, 1))
+    
+    def test_stale_instance_does_not_overwrite_counters(self):
+        """测试保存过期的任务实例不会覆盖计数"""
+        TaskComment.objects.create(task=self.task, user=self.user, content='评论')
+        
+        self.task.title = '新标题'
+        self.task.save()
+        
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual(task.title, '新标题')
+        self.assertEqual(task.comment_count, 1)
+    
+    def test_recount_command(self):
+        """测试修复命令重新统计计数"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        TaskComment.objects.create(task=self.task, user=self.user, content='评论')
+        Task.objects.filter(pk=self.task.pk).update(comment_count=10, assignee_count=3)
+        
+        call_command('recount_task_counters', stdout=StringIO())
+        self.assertEqual(self.get_counts(), (1, 0, 0, 0))
+
+
+class WorkflowRuleEngineTest(TestCase):
+    """工作流规则引擎测试"""
+    
+    def setUp(self):
+        from .workflow_models import WorkflowRule
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        self.todo_list = BoardList.objects.create(name='待办', board=self.board, position=1024)
+        self.done_list = BoardList.objects.create(name='完成', board=self.board, position=2048)
+        self.rule = WorkflowRule.objects.create(
+            name='完成后移动',
+            board=self.board,
+            trigger_type='status_change',
+            trigger_conditions={'to_status': 'done'},
+            action_type='move_to_list',
+            action_parameters={'list_id': self.done_list.id},
+            created_by=self.user
+        )
+        self.task = Task.objects.create(
+            title='测试任务',
+            board=self.board,
+            board_list=self.todo_list,
+            creator=self.user
+        )
+    
+    def test_status_change_rule(self):
+        """测试状态变更触发规则，不满足条件时不执行"""
+        self.task.status = 'in_progress'
+        self.task.save()
+        self.assertEqual(Task.objects.get(pk=self.task.pk).board_list, self.todo_list)
+        
+        self.task.status = 'done'
+        self.task.save()
+        self.assertEqual(Task.objects.get(pk=self.task.pk).board_list, self.done_list)
+        
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.execution_count, 1)
+        self.assertIsNotNone(self.rule.last_executed)
+        execution = self.rule.executions.get()
+        self.assertTrue(execution.success)
+        self.assertEqual(execution.task, self.task)
+    
+    def test_batch_status_change_and_max_executions(self):
+        """测试批量变更状态一次执行规则，并遵守最大执行次数"""
+        from .services import TaskBatchService
+        
+        self.rule.max_executions = 2
+        self.rule.save()
+        tasks = [self.task] + [
+            Task.objects.create(title=f'任务{i}', board=self.board, board_list=self.todo_list, creator=self.user)
+            for i in range(2)
+        ]
+        
+        TaskBatchService(self.user, [task.pk for task in tasks]).change_status('done')
+        
+        moved = Task.objects.filter(board_list=self.done_list).count()
+        self.assertEqual(moved, 2)
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.execution_count, 2)
+    
+    def test_rule_changes_invalidate_index(self):
+        """测试规则修改后立即生效，规则动作不再触发其他规则"""
+        from .workflow_models import WorkflowRule
+        
+        self.rule.action_type = 'change_status'
+        self.rule.trigger_conditions = {'from_status': 'todo'}
+        self.rule.action_parameters = {'status': 'review'}
+        self.rule.save()
+        # 动作产生的状态变更不应触发该规则
+        WorkflowRule.objects.create(
+            name='评审时提升优先级',
+            board=self.board,
+            trigger_type='status_change',
+            trigger_conditions={'to_status': 'review'},
+            action_type='set_priority',
+            action_parameters={'priority': 'high'},
+            created_by=self.user
+        )
+        
+        self.task.status = 'in_progress'
+        self.task.save()
+        
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual(task.status, 'review')
+        self.assertEqual(task.priority, 'normal')
+    
+    def test_failed_action_recorded(self):
+        """测试动作失败时记录错误，不影响任务保存"""
+        from .workflow_models import WorkflowRule
+        
+        WorkflowRule.objects.create(
+            name='创建时通知',
+            board=self.board,
+            trigger_type='task_created',
+            action_type='send_notification',
+            action_parameters={},
+            created_by=self.user
+        )
+        
+        task = Task.objects.create(title='新任务', board=self.board, board_list=self.todo_list, creator=self.user)
+        
+        execution = task.rule_executions.get()
+        self.assertFalse(execution.success)
+        self.assertIn('title', execution.error_message)
+
+
+class WorkflowSchedulerTest(TestCase):
+    """工作流定时规则调度测试"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(name='测试看板', owner=self.user)
+        self.board_list = BoardList.objects.create(name='待办', board=self.board, position=1024)
+    
+    def create_rule(self, **kwargs):
+        from .workflow_models import WorkflowRule
+        
+        return WorkflowRule.objects.create(
+            name='定时规则',
+            board=self.board,
+            action_type='set_priority',
+            action_parameters={'priority': 'urgent'},
+            created_by=self.user,
+            **kwargs
+        )
+    
+    def test_next_fire_time(self):
+        """测试计算Cron表达式的下次触发时间"""
+        from datetime import datetime
+        from .workflow_scheduler import next_fire_time
+        
+        # 2026-10-16 为周五
+        after = timezone.make_aware(datetime(2026, 10, 16, 9, 30))
+        self.assertEqual(
+            next_fire_time('0 9 * * 1-5', after),
+            timezone.make_aware(datetime(2026, 10, 19, 9, 0))
+        )
+        self.assertEqual(
+            next_fire_time('*/15 * * * *', after),
+            timezone.make_aware(datetime(2026, 10, 16, 9, 45))
+        )
+        self.assertIsNone(next_fire_time('0 0 30 2 *', after))
+        
+        with self.assertRaises(ValueError):
+            next_fire_time('0 25 * * *', after)
+    
+    def test_invalid_cron_rejected(self):
+        """测试无效的Cron表达式不能通过校验"""
+        from django.core.exceptions import ValidationError
+        
+        rule = self.create_rule(trigger_type='time_scheduled', schedule_cron='bad')
+        self.assertIsNone(rule.next_run_at)
+        with self.assertRaises(ValidationError):
+            rule.full_clean()
+    
+    def test_overdue_rule_runs_once_per_task(self):
+        """测试逾期规则批量处理到期任务，同一任务只执行一次"""
+        from datetime import timedelta
+        from .workflow_models import WorkflowRule
+        from .workflow_scheduler import run_scheduled_rules
+        
+        now = timezone.now()
+        overdue = Task.objects.create(
+            title='逾期任务', board=self.board, board_list=self.board_list,
+            creator=self.user, due_date=now - timedelta(days=1)
+        )
+        Task.objects.create(
+            title='未到期任务', board=self.board, board_list=self.board_list,
+            creator=self.user, due_date=now + timedelta(days=3)
+        )
+        rule = self.create_rule(trigger_type='overdue')
+        self.assertIsNotNone(rule.next_run_at)
+        
+        WorkflowRule.objects.filter(pk=rule.pk).update(next_run_at=now)
+        self.assertEqual(run_scheduled_rules(), 1)
+        self.assertEqual(Task.objects.get(pk=overdue.pk).priority, 'urgent')
+        
+        rule.refresh_from_db()
+        self.assertGreater(rule.next_run_at, now)
+        
+        # 未到下次执行时间不执行；到期后已处理的任务不再执行
+        self.assertEqual(run_scheduled_rules(), 0)
+        WorkflowRule.objects.filter(pk=rule.pk).update(next_run_at=now)
+        self.assertEqual(run_scheduled_rules(), 0)
+        self.assertEqual(rule.executions.count(), 1)
+    
+    def test_time_scheduled_rule_conditions(self):
+        """测试定时规则按条件选择任务"""
+        from .workflow_models import WorkflowRule
+        from .workflow_scheduler import run_scheduled_rules
+        
+        blocked = Task.objects.create(
+            title='阻塞任务', board=self.board, board_list=self.board_list,
+            creator=self.user, status='blocked'
+        )
+        Task.objects.create(title='待办任务', board=self.board, board_list=self.board_list, creator=self.user)
+        rule = self.create_rule(
+            trigger_type='time_scheduled', schedule_cron='0 9 * * *',
+            trigger_conditions={'status': 'blocked'}
+        )
+        
+        WorkflowRule.objects.filter(pk=rule.pk).update(next_run_at=timezone.now())
+        self.assertEqual(run_scheduled_rules(), 1)
+        self.assertEqual(Task.objects.get(pk=blocked.pk).priority, 'urgent')
+        
+        rule.refresh_from_db()
+        self.assertEqual((timezone.localtime(rule.next_run_at).hour, rule.next_run_at.minute), (9, 0))
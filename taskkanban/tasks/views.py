@@ -10,7 +10,7 @@ from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from django.db.models import Q, Count, Prefetch, F
+from django.db.models import Q, Count, Prefetch
 from django.http import JsonResponse, HttpResponseForbidden
 from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
@@ -19,11 +19,19 @@ from django.core.exceptions import PermissionDenied
 import json
 
 from .models import Task, TaskComment, TaskAttachment
+from .workflow_models import TaskStatusHistory
+from .services import TaskBatchService
+from .search import search_tasks
 from .forms import (
     TaskCreateForm, TaskUpdateForm, TaskCommentForm, 
     TaskLabelForm, TaskAttachmentForm, TaskSearchForm
 )
 from boards.models import Board, BoardList, BoardLabel
+from boards.ordering import place_task
+from boards.permissions import can_view_task, can_edit_task
+from boards.realtime import (
+    publish_card_moved, publish_card_status, publish_card_labels
+)
 
 User = get_user_model()
 
@@ -33,56 +41,11 @@ class TaskAccessMixin:
     
     def has_task_access(self, task, user):
         """检查用户是否有任务访问权限"""
-        # 任务创建者
-        if task.creator == user:
-            return True
-        
-        # 任务分配给用户
-        if task.assignees.filter(id=user.id).exists():
-            return True
-          # 看板成员
-        board = task.board
-        if board.owner == user:
-            return True
-              # 团队成员权限
-        if board.team:
-            team_membership = board.team.memberships.filter(user=user, status='active').first()
-            if team_membership:
-                return True
-        
-        # 看板成员权限
-        board_membership = board.members.filter(user=user, is_active=True).first()
-        if board_membership:
-            return True
-              # 公开看板的读取权限
-        if board.visibility == 'public':
-            return True
-            
-        return False
+        return can_view_task(user, task)
 
     def has_task_edit_access(self, task, user):
         """检查用户是否有任务编辑权限"""
-        # 任务创建者
-        if task.creator == user:
-            return True
-        
-        # 看板创建者
-        board = task.board
-        if board.owner == user:
-            return True
-            
-        # 团队管理员
-        if board.team:
-            team_membership = board.team.memberships.filter(user=user, role__in=['admin', 'owner'], status='active').first()
-            if team_membership:
-                return True
-        
-        # 看板管理员
-        board_membership = board.members.filter(user=user, role='admin', is_active=True).first()
-        if board_membership:
-            return True
-            
-        return False
+        return can_edit_task(user, task)
 
 
 class TaskListView(LoginRequiredMixin, ListView):
@@ -106,10 +69,7 @@ class TaskListView(LoginRequiredMixin, ListView):
         if search_form.is_valid():
             q = search_form.cleaned_data.get('q')
             if q:
-                queryset = queryset.filter(
-                    Q(title__icontains=q) | 
-                    Q(description__icontains=q)
-                )
+                queryset = search_tasks(queryset, q)
             
             status = search_form.cleaned_data.get('status')
             if status:
@@ -226,14 +186,7 @@ class TaskDetailView(LoginRequiredMixin, TaskAccessMixin, DetailView):
         context['attachment_form'] = TaskAttachmentForm()
         
         # 权限检查
-        context['can_edit'] = (
-            task.creator == self.request.user or 
-            task.board.owner == self.request.user or
-            task.board.members.filter(
-                user=self.request.user, 
-                role__in=['admin', 'owner']
-            ).exists()
-        )
+        context['can_edit'] = can_edit_task(self.request.user, task)
         
         # 活动记录（评论和系统活动）
         context['activities'] = task.comments.all().order_by('-created_at')
@@ -287,8 +240,18 @@ class TaskStatusUpdateView(LoginRequiredMixin, TaskAccessMixin, View):
         
         new_status = request.POST.get('status')
         if new_status in dict(Task.STATUS_CHOICES):
-            task.status = new_status
-            task.save()
+            old_status = task.status
+            with transaction.atomic():
+                task.status = new_status
+                task.save()
+                if old_status != new_status:
+                    TaskStatusHistory.objects.create(
+                        task=task,
+                        from_status=old_status,
+                        to_status=new_status,
+                        changed_by=request.user
+                    )
+            publish_card_status(task)
             
             return JsonResponse({
                 'success': True,
@@ -349,9 +312,10 @@ class TaskMoveView(LoginRequiredMixin, TaskAccessMixin, View):
         
         try:
             new_list = BoardList.objects.get(id=new_list_id, board=task.board)
-            task.board_list = new_list
-            task.position = int(new_position)
-            task.save()
+            with transaction.atomic():
+                place_task(task, new_list, new_position)
+                task.save()
+            publish_card_moved(task)
             
             return JsonResponse({
                 'success': True,
@@ -399,88 +363,54 @@ class TaskBatchOperationView(LoginRequiredMixin, View):
                 'error': 'No operation specified'
             }, status=400)
         
-        # 验证任务权限
-        tasks = []
-        for task_id in task_ids:
-            try:
-                task = Task.objects.get(id=task_id)
-                if not self.has_task_edit_access(task, request.user):
-                    return JsonResponse({
-                        'success': False,
-                        'error': f'No permission to edit task {task_id}'
-                    }, status=403)
-                tasks.append(task)
-            except Task.DoesNotExist:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Task {task_id} not found'
-                }, status=404)
+        # 一次性解析任务和权限
+        service = TaskBatchService(request.user, task_ids)
+        if not service.tasks:
+            not_found = all(
+                result == TaskBatchService.RESULT_NOT_FOUND for result in service.results.values()
+            )
+            return JsonResponse({
+                'success': False,
+                'error': 'Tasks not found' if not_found else 'No permission to edit selected tasks',
+                'results': service.get_results()
+            }, status=404 if not_found else 403)
+        
+        def get_param(name):
+            if request.content_type == 'application/json':
+                return data.get(name)
+            return request.POST.get(name)
         
         # 执行批量操作
         try:
             with transaction.atomic():
                 if operation == 'delete':
-                    count = len(tasks)
-                    for task in tasks:
-                        task.is_archived = True  # 软删除
-                        task.save(update_fields=['is_archived', 'updated_at'])
-                    return JsonResponse({
-                        'success': True,
-                        'message': f'Successfully deleted {count} tasks'
-                    })
+                    service.archive()
+                    message = f'Successfully deleted {service.count} tasks'
                 
                 elif operation == 'change_status':
-                    if request.content_type == 'application/json':
-                        new_status = data.get('new_status')
-                    else:
-                        new_status = request.POST.get('new_status')
-                    
+                    new_status = get_param('new_status')
                     if new_status not in dict(Task.STATUS_CHOICES):
                         return JsonResponse({
                             'success': False,
                             'error': 'Invalid status'
                         }, status=400)
                     
-                    count = 0
-                    for task in tasks:
-                        task.status = new_status
-                        task.save(update_fields=['status', 'updated_at'])
-                        count += 1
-                    
-                    return JsonResponse({
-                        'success': True,
-                        'message': f'Successfully updated {count} tasks'
-                    })
+                    service.change_status(new_status)
+                    message = f'Successfully updated {service.count} tasks'
                 
                 elif operation == 'change_priority':
-                    if request.content_type == 'application/json':
-                        new_priority = data.get('new_priority')
-                    else:
-                        new_priority = request.POST.get('new_priority')
-                        
+                    new_priority = get_param('new_priority')
                     if new_priority not in dict(Task.PRIORITY_CHOICES):
                         return JsonResponse({
                             'success': False,
                             'error': 'Invalid priority'
                         }, status=400)
                     
-                    count = 0
-                    for task in tasks:
-                        task.priority = new_priority
-                        task.save(update_fields=['priority', 'updated_at'])
-                        count += 1
-                    
-                    return JsonResponse({
-                        'success': True,
-                        'message': f'Successfully updated {count} tasks'
-                    })
+                    service.change_priority(new_priority)
+                    message = f'Successfully updated {service.count} tasks'
                 
                 elif operation == 'assign':
-                    if request.content_type == 'application/json':
-                        assignee_id = data.get('assignee_id')
-                    else:
-                        assignee_id = request.POST.get('assignee_id')
-                    
+                    assignee_id = get_param('assignee_id')
                     if assignee_id:
                         try:
                             assignee = User.objects.get(id=assignee_id)
@@ -492,25 +422,11 @@ class TaskBatchOperationView(LoginRequiredMixin, View):
                     else:
                         assignee = None
                     
-                    count = 0
-                    for task in tasks:
-                        if assignee:
-                            task.assignees.add(assignee)
-                        else:
-                            task.assignees.clear()
-                        count += 1
-                    
-                    return JsonResponse({
-                        'success': True,
-                        'message': f'Successfully assigned {count} tasks'
-                    })
+                    service.assign(assignee)
+                    message = f'Successfully assigned {service.count} tasks'
                 
                 elif operation == 'move_to_list':
-                    if request.content_type == 'application/json':
-                        new_list_id = data.get('new_list_id')
-                    else:
-                        new_list_id = request.POST.get('new_list_id')
-                    
+                    new_list_id = get_param('new_list_id')
                     if not new_list_id:
                         return JsonResponse({
                             'success': False,
@@ -525,31 +441,9 @@ class TaskBatchOperationView(LoginRequiredMixin, View):
                             'error': 'Target list not found'
                         }, status=404)
                     
-                    # 验证所有任务都属于同一个看板
-                    board = tasks[0].board
-                    if not all(task.board == board for task in tasks):
-                        return JsonResponse({
-                            'success': False,
-                            'error': 'All tasks must belong to the same board'
-                        }, status=400)
-                    
-                    # 验证目标列表属于同一个看板  
-                    if new_list.board != board:
-                        return JsonResponse({
-                            'success': False,
-                            'error': 'Target list must belong to the same board'
-                        }, status=400)
-                    
-                    count = 0
-                    for task in tasks:
-                        task.board_list = new_list
-                        task.save(update_fields=['board_list', 'updated_at'])
-                        count += 1
-                    
-                    return JsonResponse({
-                        'success': True,
-                        'message': f'Successfully moved {count} tasks'
-                    })
+                    # 只移动与目标列表属于同一看板的任务
+                    service.move_to_list(new_list)
+                    message = f'Successfully moved {service.count} tasks'
                 
                 else:
                     return JsonResponse({
@@ -562,30 +456,16 @@ class TaskBatchOperationView(LoginRequiredMixin, View):
                 'success': False,
                 'error': str(e)
             }, status=500)
-    
-    def has_task_edit_access(self, task, user):
-        """检查用户是否有编辑任务的权限"""
-        # 任务创建者
-        if task.creator == user:
-            return True
-        
-        # 任务被分配人
-        if task.assignees.filter(id=user.id).exists():
-            return True
-            
-        # 看板所有者
-        if task.board.owner == user:
-            return True
-        
-        # 看板管理员
-        board_membership = task.board.members.filter(user=user, role='admin', is_active=True).first()
-        if board_membership:
-            return True
-            
-        return False
+        
+        return JsonResponse({
+            'success': service.count > 0,
+            'message': message,
+            'count': service.count,
+            'results': service.get_results()
+        })
 
 
-class TaskSortView(LoginRequiredMixin, View):
+class TaskSortView(LoginRequiredMixin, TaskAccessMixin, View):
     """任务拖拽排序API"""
     
     def post(self, request):
@@ -595,7 +475,6 @@ class TaskSortView(LoginRequiredMixin, View):
             task_id = data.get('task_id')
             new_list_id = data.get('new_list_id')
             new_position = data.get('new_position', 0)
-            old_list_id = data.get('old_list_id')
             
             # 获取任务
             task = get_object_or_404(Task, id=task_id)
@@ -616,47 +495,18 @@ class TaskSortView(LoginRequiredMixin, View):
                 }, status=400)
             
             with transaction.atomic():
-                old_list = task.board_list
-                
-                # 如果是跨列表移动
-                if new_list_id != old_list_id:
-                    # 更新原列表中其他任务的位置
-                    old_list.tasks.filter(
-                        position__gt=task.position
-                    ).update(position=F('position') - 1)
-                    
-                    # 更新目标列表中任务的位置
-                    new_list.tasks.filter(
-                        position__gte=new_position
-                    ).update(position=F('position') + 1)
-                    
-                    # 更新任务的列表和位置
-                    task.board_list = new_list
-                    task.position = new_position
-                else:
-                    # 同一列表内排序
-                    if new_position > task.position:
-                        # 向下移动
-                        new_list.tasks.filter(
-                            position__gt=task.position,
-                            position__lte=new_position
-                        ).update(position=F('position') - 1)
-                    else:
-                        # 向上移动
-                        new_list.tasks.filter(
-                            position__gte=new_position,
-                            position__lt=task.position
-                        ).update(position=F('position') + 1)
-                    
-                    task.position = new_position
+                # 按相邻任务计算新位置，只更新被移动的任务
+                place_task(task, new_list, new_position)
                 
                 task.save()
+                publish_card_moved(task)
                 
                 return JsonResponse({
                     'success': True,
                     'task_id': task_id,
                     'new_list_id': new_list_id,
-                    'new_position': new_position
+                    'new_position': new_position,
+                    'position': task.position
                 })
         
         except json.JSONDecodeError:
@@ -669,29 +519,6 @@ class TaskSortView(LoginRequiredMixin, View):
                 'success': False,
                 'error': str(e)
             }, status=500)
-    
-    def has_task_edit_access(self, task, user):
-        """检查用户是否有任务编辑权限"""
-        # 任务创建者
-        if task.creator == user:
-            return True
-          # 看板创建者
-        board = task.board
-        if board.owner == user:
-            return True
-            
-        # 团队管理员
-        if board.team:
-            team_membership = board.team.memberships.filter(user=user, role__in=['admin', 'owner'], status='active').first()
-            if team_membership:
-                return True
-        
-        # 看板管理员
-        board_membership = board.members.filter(user=user, role='admin', is_active=True).first()
-        if board_membership:
-            return True
-            
-        return False
 
 
 class TaskLabelUpdateView(LoginRequiredMixin, TaskAccessMixin, View):
@@ -723,12 +550,15 @@ class TaskLabelUpdateView(LoginRequiredMixin, TaskAccessMixin, View):
             else:
                 return JsonResponse({'error': 'Invalid action'}, status=400)
             
+            labels = list(task.labels.all())
+            publish_card_labels(task, [l.id for l in labels])
+            
             return JsonResponse({
                 'success': True,
                 'message': message,
                 'labels': [
                     {'id': l.id, 'name': l.name, 'color': l.color}
-                    for l in task.labels.all()
+                    for l in labels
                 ]
             })
             
@@ -736,30 +566,6 @@ class TaskLabelUpdateView(LoginRequiredMixin, TaskAccessMixin, View):
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
-    
-    def has_task_edit_access(self, task, user):
-        """检查用户是否有任务编辑权限"""
-        # 任务创建者
-        if task.creator == user:
-            return True
-        
-        # 看板创建者
-        board = task.board
-        if board.owner == user:
-            return True
-            
-        # 团队管理员
-        if board.team:
-            team_membership = board.team.memberships.filter(user=user, role__in=['admin', 'owner'], status='active').first()
-            if team_membership:
-                return True
-        
-        # 看板管理员
-        board_membership = board.members.filter(user=user, role='admin', is_active=True).first()
-        if board_membership:
-            return True
-            
-        return False
 
 
 class TaskStatusHistoryView(LoginRequiredMixin, TaskAccessMixin, DetailView):
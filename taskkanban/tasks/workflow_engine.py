@@ -0,0 +1,378 @@
+"""
+工作流规则引擎
+将看板的有效规则编译后按触发类型建立进程内索引，任务变更事件只匹配对应触发类型的规则，
+命中同一规则的任务合并为一次批量动作，每次执行记录到 WorkflowRuleExecution
+
+索引以看板规则版本号为键，规则或看板保存、删除时递增版本号使各进程的索引失效
+（见 tasks.signals）。规则动作引起的任务变更不会再次触发规则，避免规则之间循环触发。
+
+触发条件 trigger_conditions 为 {字段: 值或值列表}，所有字段都满足时命中，支持的字段见
+CONDITION_FIELDS；定时和截止日期规则由 workflow_scheduler 执行。
+动作参数 action_parameters 按动作类型：
+    change_status: {"status": "done"}
+    assign_user: {"user_id": 1}
+    move_to_list: {"list_id": 1}
+    set_priority: {"priority": "high"}
+    add_label: {"label_id": 1}
+    send_notification: {"recipients": "assignees" | "creator" | [用户ID], "title": "...", "message": "..."}
+    create_subtask: {"title": "..."}
+"""
+import contextvars
+import logging
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .workflow_models import WorkflowRule, WorkflowRuleExecution
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'workflow:rules:version:{board_id}'
+
+# 进程内索引: {board_id: (version, {trigger_type: [CompiledRule]})}
+_rule_index = {}
+
+# 正在执行规则动作，期间产生的事件不再触发规则
+_applying = contextvars.ContextVar('workflow_rules_applying', default=False)
+
+# 任务事件中用于匹配条件的字段
+TASK_VALUE_FIELDS = ('id', 'board_id', 'board_list_id', 'status', 'priority', 'creator_id')
+
+CONDITION_FIELDS = {
+    'status': lambda event: event.values['status'],
+    'from_status': lambda event: event.from_status,
+    'to_status': lambda event: event.values['status'],
+    'priority': lambda event: event.values['priority'],
+    'board_list': lambda event: event.values['board_list_id'],
+    'creator': lambda event: event.values['creator_id'],
+    'assignee': lambda event: event.assignee_id,
+}
+
+# 由定时任务处理、不参与条件匹配的参数
+SCHEDULE_PARAMETERS = {'hours'}
+
+
+class RuleCompileError(ValueError):
+    """规则配置无效"""
+
+
+class TaskEvent:
+    """任务变更事件
+
+    values 为任务字段值（见 TASK_VALUE_FIELDS），未提供时由引擎批量查询。
+    """
+
+    def __init__(self, trigger_type, task_id, board_id, values=None, from_status=None, assignee_id=None):
+        self.trigger_type = trigger_type
+        self.task_id = task_id
+        self.board_id = board_id
+        self.values = values
+        self.from_status = from_status
+        self.assignee_id = assignee_id
+
+    @classmethod
+    def for_task(cls, trigger_type, task, **kwargs):
+        values = {field: getattr(task, 'pk' if field == 'id' else field) for field in TASK_VALUE_FIELDS}
+        return cls(trigger_type, task.pk, task.board_id, values=values, **kwargs)
+
+
+class CompiledRule:
+    """编译后的规则"""
+
+    def __init__(self, rule):
+        self.id = rule.id
+        self.name = rule.name
+        self.board_id = rule.board_id
+        self.trigger_type = rule.trigger_type
+        self.action_type = rule.action_type
+        self.parameters = rule.action_parameters or {}
+        self.created_by_id = rule.created_by_id
+        self.max_executions = rule.max_executions
+        self.conditions = self.compile_conditions(rule.trigger_conditions or {})
+
+        if rule.action_type not in ACTIONS:
+            raise RuleCompileError(f'未知的动作类型: {rule.action_type}')
+
+    @staticmethod
+    def compile_conditions(conditions):
+        if not isinstance(conditions, dict):
+            raise RuleCompileError('触发条件必须为对象')
+
+        compiled = []
+        for field, expected in conditions.items():
+            if field in SCHEDULE_PARAMETERS:
+                continue
+            if field not in CONDITION_FIELDS:
+                raise RuleCompileError(f'不支持的条件字段: {field}')
+            allowed = set(expected) if isinstance(expected, (list, tuple)) else {expected}
+            compiled.append((CONDITION_FIELDS[field], allowed))
+        return compiled
+
+    def matches(self, event):
+        return all(getter(event) in allowed for getter, allowed in self.conditions)
+
+
+def _initial_version():
+    return int(time.time() * 1000)
+
+
+def _get_version(board_id):
+    key = VERSION_KEY.format(board_id=board_id)
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate_rules(board_id):
+    """看板规则变更后使各进程的规则索引失效"""
+    key = VERSION_KEY.format(board_id=board_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), timeout=None)
+    _rule_index.pop(board_id, None)
+
+
+def _build_index(board_id):
+    index = {}
+    for rule in WorkflowRule.objects.filter(board_id=board_id, is_active=True).order_by('-priority', 'id'):
+        try:
+            compiled = CompiledRule(rule)
+        except RuleCompileError as e:
+            logger.warning(f"Skipping invalid workflow rule {rule.id}: {e}")
+            continue
+        index.setdefault(rule.trigger_type, []).append(compiled)
+    return index
+
+
+def get_board_rules(board_id, trigger_type):
+    """看板中指定触发类型的有效规则，按优先级排序"""
+    version = _get_version(board_id)
+    entry = _rule_index.get(board_id)
+    if entry is None or entry[0] != version:
+        entry = (version, _build_index(board_id))
+        _rule_index[board_id] = entry
+    return entry[1].get(trigger_type, [])
+
+
+def dispatch(events):
+    """处理任务事件，返回执行记录数"""
+    if _applying.get() or not events:
+        return 0
+
+    # 只保留所在看板有对应触发类型规则的事件
+    pending = []
+    for event in events:
+        rules = get_board_rules(event.board_id, event.trigger_type)
+        if rules:
+            pending.append((event, rules))
+    if not pending:
+        return 0
+
+    _load_values([event for event, _ in pending if event.values is None])
+
+    matched = {}
+    for event, rules in pending:
+        if event.values is None:
+            # 任务已删除
+            continue
+        for rule in rules:
+            if rule.matches(event):
+                matched.setdefault(rule.id, (rule, {}))[1].setdefault(event.task_id, event)
+
+    count = 0
+    for rule, task_events in matched.values():
+        count += apply_rule(rule, list(task_events))
+    return count
+
+
+def dispatch_event(trigger_type, task, **kwargs):
+    """处理单个任务的事件"""
+    return dispatch([TaskEvent.for_task(trigger_type, task, **kwargs)])
+
+
+def _load_values(events):
+    if not events:
+        return
+    from .models import Task
+
+    rows = {
+        row['id']: row
+        for row in Task.objects.filter(id__in={event.task_id for event in events}).values(*TASK_VALUE_FIELDS)
+    }
+    for event in events:
+        event.values = rows.get(event.task_id)
+
+
+def _limit_executions(rule, task_ids):
+    """有最大执行次数的规则只执行剩余次数"""
+    if not rule.max_executions:
+        return task_ids
+    executed = WorkflowRule.objects.filter(pk=rule.id).values_list('execution_count', flat=True).first() or 0
+    return task_ids[:max(rule.max_executions - executed, 0)]
+
+
+def apply_rule(rule, task_ids):
+    """对命中规则的任务批量执行动作，返回执行记录数"""
+    task_ids = _limit_executions(rule, task_ids)
+    if not task_ids:
+        return 0
+
+    token = _applying.set(True)
+    try:
+        with transaction.atomic():
+            results = ACTIONS[rule.action_type](rule, task_ids)
+    except Exception as e:
+        logger.warning(f"Workflow rule {rule.id} failed: {e}")
+        results = {task_id: (False, str(e)) for task_id in task_ids}
+    finally:
+        _applying.reset(token)
+
+    details = {'action_type': rule.action_type, 'parameters': rule.parameters}
+    WorkflowRuleExecution.objects.bulk_create([
+        WorkflowRuleExecution(
+            rule_id=rule.id,
+            task_id=task_id,
+            success=success,
+            error_message=error,
+            execution_details=details,
+        )
+        for task_id, (success, error) in results.items()
+    ])
+
+    executed = sum(1 for success, _ in results.values() if success)
+    WorkflowRule.objects.filter(pk=rule.id).update(
+        execution_count=F('execution_count') + executed,
+        last_executed=timezone.now()
+    )
+    return len(results)
+
+
+# 动作：接收编译后的规则和任务ID列表，返回 {task_id: (是否成功, 错误信息)}
+
+def _get_parameter(rule, name):
+    value = rule.parameters.get(name)
+    if value in (None, ''):
+        raise RuleCompileError(f'缺少动作参数: {name}')
+    return value
+
+
+def _run_batch(rule, task_ids, operation, *args):
+    """以规则创建人的身份执行批量操作，沿用其任务编辑权限"""
+    from .services import TaskBatchService
+
+    user = get_user_model().objects.get(pk=rule.created_by_id)
+    service = TaskBatchService(user, task_ids)
+    getattr(service, operation)(*args)
+    return {
+        task_id: (result == service.RESULT_UPDATED, '' if result == service.RESULT_UPDATED else result)
+        for task_id, result in service.results.items()
+    }
+
+
+def change_status(rule, task_ids):
+    from .models import Task
+
+    status = _get_parameter(rule, 'status')
+    if status not in dict(Task.STATUS_CHOICES):
+        raise RuleCompileError(f'无效的状态: {status}')
+    return _run_batch(rule, task_ids, 'change_status', status)
+
+
+def set_priority(rule, task_ids):
+    from .models import Task
+
+    priority = _get_parameter(rule, 'priority')
+    if priority not in dict(Task.PRIORITY_CHOICES):
+        raise RuleCompileError(f'无效的优先级: {priority}')
+    return _run_batch(rule, task_ids, 'change_priority', priority)
+
+
+def assign_user(rule, task_ids):
+    user = get_user_model().objects.get(pk=_get_parameter(rule, 'user_id'))
+    return _run_batch(rule, task_ids, 'assign', user)
+
+
+def move_to_list(rule, task_ids):
+    from boards.models import BoardList
+
+    board_list = BoardList.objects.get(pk=_get_parameter(rule, 'list_id'), board_id=rule.board_id)
+    return _run_batch(rule, task_ids, 'move_to_list', board_list)
+
+
+def add_label(rule, task_ids):
+    from boards.changes import record_changes
+    from boards.models import BoardLabel
+    from boards.snapshots import bump_board_version_on_commit
+    from .models import Task
+
+    label = BoardLabel.objects.get(pk=_get_parameter(rule, 'label_id'), board_id=rule.board_id)
+    LabelThrough = Task.labels.through
+    LabelThrough.objects.bulk_create(
+        [LabelThrough(task_id=task_id, boardlabel_id=label.id) for task_id in task_ids],
+        ignore_conflicts=True
+    )
+    bump_board_version_on_commit(rule.board_id)
+    record_changes(rule.board_id, 'task', task_ids, 'updated')
+    return {task_id: (True, '') for task_id in task_ids}
+
+
+def send_notification(rule, task_ids):
+    from common.models import Notification
+    from .models import Task, TaskAssignment
+
+    title = _get_parameter(rule, 'title')
+    message = rule.parameters.get('message', '')
+    recipients = rule.parameters.get('recipients', 'assignees')
+
+    if recipients == 'assignees':
+        pairs = TaskAssignment.objects.filter(task_id__in=task_ids).values_list('task_id', 'user_id')
+    elif recipients == 'creator':
+        pairs = Task.objects.filter(id__in=task_ids).values_list('id', 'creator_id')
+    elif isinstance(recipients, list):
+        pairs = [(task_id, user_id) for task_id in task_ids for user_id in recipients]
+    else:
+        raise RuleCompileError(f'无效的通知对象: {recipients}')
+
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=user_id,
+            notification_type='system',
+            title=title,
+            message=message,
+            content_type='task',
+            object_id=task_id,
+        )
+        for task_id, user_id in pairs
+    ])
+    return {task_id: (True, '') for task_id in task_ids}
+
+
+def create_subtask(rule, task_ids):
+    from .counters import recount_task_counters
+    from .models import SubTask
+
+    title = _get_parameter(rule, 'title')
+    SubTask.objects.bulk_create([SubTask(parent_task_id=task_id, title=title) for task_id in task_ids])
+    # 批量插入不触发信号
+    recount_task_counters(task_ids, fields=['subtask_count', 'completed_subtask_count'])
+    return {task_id: (True, '') for task_id in task_ids}
+
+
+ACTIONS = {
+    'change_status': change_status,
+    'assign_user': assign_user,
+    'move_to_list': move_to_list,
+    'set_priority': set_priority,
+    'add_label': add_label,
+    'send_notification': send_notification,
+    'create_subtask': create_subtask,
+}
+
@@ -3,10 +3,10 @@
 包含工作流状态、转换规则、状态历史、自动化规则等
 """
 
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
-from django.utils import timezone
 
 User = get_user_model()
 
@@ -210,6 +210,7 @@ class WorkflowRule(models.Model):
     # 时间设置
     schedule_cron = models.CharField(_('定时规则(Cron)'), max_length=100, blank=True)
     last_executed = models.DateTimeField(_('上次执行时间'), null=True, blank=True)
+    next_run_at = models.DateTimeField(_('下次执行时间'), null=True, blank=True, editable=False)
     
     # 创建信息
     created_by = models.ForeignKey(
@@ -225,10 +226,36 @@ class WorkflowRule(models.Model):
         verbose_name = _('工作流规则')
         verbose_name_plural = _('工作流规则')
         ordering = ['-priority', 'name']
+        indexes = [
+            # 定时规则调度
+            models.Index(fields=['is_active', 'next_run_at']),
+        ]
     
     def __str__(self):
         return f"{self.board.name} - {self.name}"
     
+    def clean(self):
+        from .workflow_scheduler import parse_cron
+        
+        if self.schedule_cron:
+            try:
+                parse_cron(self.schedule_cron)
+            except ValueError as e:
+                raise ValidationError({'schedule_cron': str(e)})
+        elif self.trigger_type == 'time_scheduled':
+            raise ValidationError({'schedule_cron': _('定时触发的规则需要设置Cron表达式')})
+    
+    def save(self, *args, **kwargs):
+        # 触发类型、Cron 或启用状态可能变化，重新计算下次执行时间
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'trigger_type', 'schedule_cron', 'is_active'}.intersection(update_fields):
+            from .workflow_scheduler import get_next_run
+            
+            self.next_run_at = get_next_run(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'next_run_at'}
+        super().save(*args, **kwargs)
+    
     def can_execute(self):
         """检查规则是否可以执行"""
         if not self.is_active:
@@ -240,18 +267,21 @@ class WorkflowRule(models.Model):
         return True
     
     def execute(self, context=None):
-        """执行规则"""
+        """对 context 中的任务执行规则动作
+
+        context 为 {'task': 任务} 或 {'task_ids': [任务ID]}，由规则引擎批量执行并记录执行结果。
+        """
         if not self.can_execute():
             return False
-        
-        # 这里将实现具体的规则执行逻辑
-        # 根据action_type和action_parameters执行相应的动作
-        
-        self.execution_count += 1
-        self.last_executed = timezone.now()
-        self.save(update_fields=['execution_count', 'last_executed'])
-        
-        return True
+
+        from .workflow_engine import CompiledRule, apply_rule
+
+        context = context or {}
+        task_ids = list(context.get('task_ids') or [])
+        if context.get('task') is not None:
+            task_ids.append(context['task'].pk)
+
+        return apply_rule(CompiledRule(self), task_ids) > 0
 
 
 class WorkflowRuleExecution(models.Model):
@@ -283,6 +313,10 @@ class WorkflowRuleExecution(models.Model):
         verbose_name = _('规则执行记录')
         verbose_name_plural = _('规则执行记录')
         ordering = ['-executed_at']
+        indexes = [
+            # 截止日期规则排除已执行的任务
+            models.Index(fields=['rule', 'task']),
+        ]
     
     def __str__(self):
         status = '✓' if self.success else '✗'
@@ -0,0 +1,171 @@
+"""
+工作流定时规则调度
+定时（time_scheduled）、临近截止（due_date_near）和逾期（overdue）规则保存时计算下次执行时间
+next_run_at，Celery beat 每分钟调用 run_scheduled_rules，一次索引查询取出到期规则，
+每条规则以集合查询选出命中的任务后分批交给规则引擎执行。
+
+schedule_cron 为五段 Cron 表达式（分 时 日 月 周，按 TIME_ZONE 解释），由 Celery 的 crontab 解析；
+截止日期规则未设置时每 DUE_CHECK_INTERVAL 检查一次，同一任务对同一规则只执行一次。
+"""
+import logging
+from datetime import datetime, time as dt_time, timedelta
+
+from celery import shared_task
+from celery.schedules import ParseException, crontab
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .workflow_engine import CompiledRule, RuleCompileError, apply_rule
+from .workflow_models import WorkflowRule, WorkflowRuleExecution
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED_TRIGGERS = ('time_scheduled', 'due_date_near', 'overdue')
+
+# 截止日期规则未设置 Cron 时的检查间隔
+DUE_CHECK_INTERVAL = timedelta(minutes=15)
+
+# 临近截止的默认提前小时数
+DEFAULT_DUE_HOURS = 24
+
+# 每批交给规则引擎的任务数
+BATCH_SIZE = 500
+
+# 查找下次执行时间的最大天数，如 2月30日 这类永远不会触发的表达式
+MAX_LOOKAHEAD_DAYS = 366 * 4
+
+# 条件字段对应的任务查询
+CONDITION_LOOKUPS = {
+    'status': 'status__in',
+    'to_status': 'status__in',
+    'priority': 'priority__in',
+    'board_list': 'board_list_id__in',
+    'creator': 'creator_id__in',
+    'assignee': 'assignments__user_id__in',
+}
+
+
+def parse_cron(expression):
+    """解析五段 Cron 表达式，无效时抛出 ValueError"""
+    parts = (expression or '').split()
+    if len(parts) != 5:
+        raise ValueError(f'Cron 表达式应为5段: {expression!r}')
+    minute, hour, day_of_month, month_of_year, day_of_week = parts
+    try:
+        return crontab(
+            minute=minute,
+            hour=hour,
+            day_of_month=day_of_month,
+            month_of_year=month_of_year,
+            day_of_week=day_of_week,
+        )
+    except (ParseException, ValueError) as e:
+        raise ValueError(f'无效的 Cron 表达式 {expression!r}: {e}')
+
+
+def next_fire_time(expression, after):
+    """Cron 表达式在 after 之后的下一个触发时间，不会触发时返回None
+
+    逐日匹配月、日、周，命中的日期内按小时、分钟升序取第一个时间点，
+    与 Celery crontab 一致，日和周同时指定时需要同时满足。
+    """
+    schedule = parse_cron(expression)
+    start = timezone.localtime(after).replace(second=0, microsecond=0) + timedelta(minutes=1)
+    hours = sorted(schedule.hour)
+    minutes = sorted(schedule.minute)
+
+    for offset in range(MAX_LOOKAHEAD_DAYS):
+        day = start.date() + timedelta(days=offset)
+        if (day.month not in schedule.month_of_year
+                or day.day not in schedule.day_of_month
+                or day.isoweekday() % 7 not in schedule.day_of_week):
+            continue
+        for hour in hours:
+            for minute in minutes:
+                candidate = timezone.make_aware(datetime.combine(day, dt_time(hour, minute)))
+                if candidate >= start:
+                    return candidate
+    return None
+
+
+def get_next_run(rule, after=None):
+    """规则在 after 之后的下次执行时间，非定时规则或无法执行时返回None"""
+    if not rule.is_active or rule.trigger_type not in SCHEDULED_TRIGGERS:
+        return None
+
+    after = after or timezone.now()
+    if rule.schedule_cron:
+        try:
+            return next_fire_time(rule.schedule_cron, after)
+        except ValueError as e:
+            logger.warning(f"Workflow rule {rule.pk} has an invalid schedule: {e}")
+            return None
+    if rule.trigger_type == 'time_scheduled':
+        return None
+    return after + DUE_CHECK_INTERVAL
+
+
+def get_rule_tasks(rule, now):
+    """规则命中的任务，返回任务查询集"""
+    from .models import Task
+
+    conditions = rule.trigger_conditions or {}
+    tasks = Task.objects.filter(board_id=rule.board_id, is_archived=False)
+    for field, expected in conditions.items():
+        if field == 'hours':
+            continue
+        if field not in CONDITION_LOOKUPS:
+            raise RuleCompileError(f'定时规则不支持的条件字段: {field}')
+        values = expected if isinstance(expected, (list, tuple)) else [expected]
+        tasks = tasks.filter(**{CONDITION_LOOKUPS[field]: values})
+
+    if rule.trigger_type == 'time_scheduled':
+        return tasks
+
+    tasks = tasks.exclude(status='done')
+    if rule.trigger_type == 'overdue':
+        tasks = tasks.filter(due_date__lt=now)
+    else:
+        hours = conditions.get('hours', DEFAULT_DUE_HOURS)
+        tasks = tasks.filter(due_date__gte=now, due_date__lte=now + timedelta(hours=hours))
+
+    # 截止日期规则对同一任务只执行一次
+    return tasks.exclude(Exists(
+        WorkflowRuleExecution.objects.filter(rule_id=rule.pk, task_id=OuterRef('pk'))
+    ))
+
+
+def run_rule(rule, now=None):
+    """执行一条定时规则，返回执行记录数"""
+    now = now or timezone.now()
+    try:
+        compiled = CompiledRule(rule)
+        task_ids = list(get_rule_tasks(rule, now).values_list('id', flat=True).distinct())
+    except RuleCompileError as e:
+        logger.warning(f"Skipping invalid workflow rule {rule.pk}: {e}")
+        return 0
+
+    count = 0
+    for start in range(0, len(task_ids), BATCH_SIZE):
+        count += apply_rule(compiled, task_ids[start:start + BATCH_SIZE])
+    return count
+
+
+@shared_task
+def run_scheduled_rules():
+    """执行到期的定时规则，返回执行记录数"""
+    now = timezone.now()
+    count = 0
+    due_rules = WorkflowRule.objects.filter(
+        is_active=True, next_run_at__lte=now
+    ).order_by('next_run_at')
+
+    for rule in due_rules:
+        # 先推进下次执行时间，条件更新成功才执行，多个 worker 同时调度时只有一个执行
+        claimed = WorkflowRule.objects.filter(pk=rule.pk, next_run_at=rule.next_run_at).update(
+            next_run_at=get_next_run(rule, now)
+        )
+        if not claimed or not rule.can_execute():
+            continue
+        count += run_rule(rule, now)
+    return count
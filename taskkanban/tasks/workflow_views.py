@@ -24,6 +24,10 @@ from .workflow_models import (
 from .models import Task
 from boards.models import Board, BoardList
 from boards.views import BoardAccessMixin
+from boards.permissions import (
+    ROLE_OWNER, ROLE_ADMIN, ROLE_MEMBER, get_board_role, can_view_task, can_edit_task
+)
+from boards.realtime import publish_card_status, publish_card_moved
 
 
 class WorkflowStatusListView(LoginRequiredMixin, BoardAccessMixin, ListView):
@@ -138,6 +142,11 @@ class TaskStatusChangeView(LoginRequiredMixin, View):
                 # 执行转换后的自动化动作
                 if transition:
                     self.execute_transition_actions(transition, task, request.user)
+                
+                # 事务提交后推送实时事件
+                publish_card_status(task)
+                if transition and transition.auto_move_to_list:
+                    publish_card_moved(task)
         
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
@@ -151,30 +160,8 @@ class TaskStatusChangeView(LoginRequiredMixin, View):
         })
     
     def has_task_edit_access(self, task, user):
-        """检查用户是否有任务编辑权限"""
-        # 任务创建者
-        if task.creator == user:
-            return True
-        
-        # 任务受理人
-        if task.assignees.filter(id=user.id).exists():
-            return True
-        
-        # 看板权限检查
-        board = task.board
-        if board.owner == user:
-            return True
-        
-        # 看板成员权限
-        from boards.models import BoardMember
-        if BoardMember.objects.filter(
-            board=board, 
-            user=user, 
-            role__in=['admin', 'owner', 'member']
-        ).exists():
-            return True
-        
-        return False
+        """检查用户是否有任务状态变更权限，看板普通成员也可以流转任务状态"""
+        return can_edit_task(user, task, roles=(ROLE_OWNER, ROLE_ADMIN, ROLE_MEMBER))
     
     def can_use_transition(self, transition, task, user):
         """检查用户是否可以使用指定的转换"""
@@ -192,17 +179,8 @@ class TaskStatusChangeView(LoginRequiredMixin, View):
     
     def get_user_roles(self, user, board):
         """获取用户在看板中的角色"""
-        roles = []
-        
-        if board.owner == user:
-            roles.append('owner')
-        
-        from boards.models import BoardMember
-        member = BoardMember.objects.filter(board=board, user=user).first()
-        if member:
-            roles.append(member.role)
-        
-        return roles
+        role = get_board_role(user, board)
+        return [role] if role else []
     
     def execute_transition_actions(self, transition, task, user):
         """执行转换的自动化动作"""
@@ -263,27 +241,7 @@ class TaskStatusHistoryView(LoginRequiredMixin, View):
     
     def has_task_view_access(self, task, user):
         """检查用户是否有任务查看权限"""
-        # 基本上与编辑权限相同，但更宽松
-        board = task.board
-        
-        # 公开看板
-        if board.visibility == 'public':
-            return True
-        
-        # 看板所有者
-        if board.owner == user:
-            return True
-        
-        # 看板成员
-        from boards.models import BoardMember
-        if BoardMember.objects.filter(board=board, user=user).exists():
-            return True
-        
-        # 团队成员
-        if board.team and board.team.memberships.filter(user=user).exists():
-            return True
-        
-        return False
+        return can_view_task(user, task)
 
 
 class WorkflowTransitionListView(LoginRequiredMixin, BoardAccessMixin, ListView):